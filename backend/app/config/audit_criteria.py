@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import List
 import yaml
+import hashlib
 import os
 import logging
 
@@ -15,6 +16,11 @@ class AuditCriteria(BaseModel):
     check_items: List[CheckItem] = Field(description="List of items to check in the documents")
     system_prompt: str = Field(description="System prompt for the AI auditor")
 
+    @property
+    def version(self) -> str:
+        """Content hash of the criteria; cached audit responses are only reused for the same version."""
+        return hashlib.sha256(self.model_dump_json().encode('utf-8')).hexdigest()[:16]
+
 def load_audit_criteria() -> AuditCriteria:
     """
     Loads audit criteria from audit_criteria.yaml located in the same directory.
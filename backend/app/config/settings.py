@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List, Literal
+from typing import List, Literal, Optional
 
 class Settings(BaseSettings):
     # API
@@ -18,6 +18,20 @@ class Settings(BaseSettings):
     nextcloud_username: str
     nextcloud_password: str
     nextcloud_base_path: str = "/Datenschutzportal"
+    nextcloud_timeout: float = 30.0
+    nextcloud_connect_timeout: float = 10.0
+    nextcloud_max_connections: int = 20  # per host, shared across all requests
+    nextcloud_max_keepalive_connections: int = 10
+    nextcloud_keepalive_expiry: float = 30.0
+    nextcloud_chunked_upload: bool = True  # Nextcloud chunked upload (v2) for large files
+    nextcloud_chunk_size: int = 10485760  # 10 MB, Nextcloud requires >= 5 MB except for the last chunk
+    nextcloud_stream_buffer_size: int = 1048576  # 1 MB read buffer per streamed upload
+    nextcloud_folder_cache_ttl: int = 600  # seconds a known-existing folder is trusted without a request
+    nextcloud_metadata_cache_size: int = 256  # projects whose metadata.json is cached with its ETag
+    nextcloud_probe_interval: float = 30.0  # seconds between background connectivity probes
+    nextcloud_degraded_latency: float = 2.0  # probes slower than this (seconds) mark Nextcloud as degraded
+    nextcloud_breaker_failure_threshold: int = 3
+    nextcloud_breaker_reset_timeout: float = 30.0
     
     # SMTP
     smtp_host: str
@@ -39,13 +53,79 @@ class Settings(BaseSettings):
     # File Upload
     max_file_size: int = 52428800  # 50 MB
     allowed_file_types: List[str] = [".pdf", ".doc", ".docx", ".zip", ".odt", ".ods", ".odp", ".png", ".jpg", ".jpeg", ".xlsx", ".xls"]
+    upload_concurrency: int = 4  # parallel file uploads to Nextcloud per submission
+
+    # Local staging of uploaded files for the background audit
+    staging_dir: Optional[str] = None  # defaults to <tempdir>/datenschutzportal_staging
+    staging_max_bytes: int = 1073741824  # 1 GB
+    staging_ttl: int = 3600  # seconds
+
+    # Resumable upload sessions
+    upload_session_dir: Optional[str] = None  # defaults to <tempdir>/datenschutzportal_sessions
+    upload_session_max_bytes: int = 5368709120  # 5 GB reserved by all open sessions together
+    upload_session_ttl: int = 86400  # seconds a session may stay idle before it expires
+
+    # Document text extraction
+    extraction_workers: Optional[int] = None  # worker processes, defaults to the number of CPUs
+    extraction_timeout: float = 120.0  # seconds per file before the worker is killed
+    extraction_memory_limit_mb: int = 1024  # address space limit per worker process, 0 disables it
+    extraction_sheet_max_rows: int = 5000  # non-empty rows per spreadsheet sheet
+    extraction_sheet_max_cells: int = 200000  # cells read per spreadsheet sheet
+    extraction_zip_max_members: int = 200  # files per ZIP archive
+    extraction_zip_max_uncompressed: int = 524288000  # 500 MB uncompressed per ZIP archive
+    extraction_zip_max_ratio: int = 100  # max uncompressed/compressed size per member (zip bombs)
+    extraction_spool_max_memory: int = 4194304  # uploads up to 4 MB are extracted from memory, larger ones spooled to disk
+    extraction_char_budget: int = 100000  # document characters per AI prompt (~25k tokens), shared by all files;
+    # not applied to chunked audits (audit_chunked), which read every document completely
+    ocr_enabled: bool = False  # OCR for images and scanned PDF pages, needs tesseract installed
+    ocr_languages: str = "deu+eng"
+    ocr_workers: int = 2  # separate process pool, tesseract is CPU heavy
+    ocr_timeout: float = 60.0  # seconds per page
+    ocr_max_pages: int = 20  # scanned pages recognized per PDF
+    extraction_cache_path: Optional[str] = None  # SQLite file, defaults to <data_dir>/extraction_cache.sqlite3
+    extraction_cache_ttl: int = 2592000  # seconds, 30 days
+    extraction_cache_max_bytes: int = 536870912  # 512 MB of extracted text on disk
+    extraction_cache_memory_chars: int = 33554432  # characters kept in memory
     
+    # Background audit job queue
+    audit_workers: int = 2  # audits processed concurrently by this process, 0 only enqueues
+    audit_job_max_attempts: int = 3
+    audit_job_retry_backoff: float = 30.0  # seconds before the first retry, doubled per attempt
+    audit_job_retry_backoff_max: float = 900.0
+    audit_job_lease: float = 120.0  # seconds a claimed job stays reserved without a heartbeat
+    audit_job_poll_interval: float = 5.0  # seconds between queue polls of an idle worker
+
     # AI Audit
     ai_api_base_url: str = "https://api.openai.com/v1"
     ai_api_key: str
     ai_model_name: str = "gpt-4-turbo-preview"
     ai_proxy: str = None
+    ai_timeout: float = 300.0  # seconds per AI request (long concept generations)
+    ai_connect_timeout: float = 10.0
+    ai_max_connections: int = 20  # pooled connections to the AI endpoint, shared by all agents
+    ai_max_keepalive_connections: int = 10
+    ai_keepalive_expiry: float = 60.0  # seconds an idle connection is kept
+    ai_warmup: bool = True  # open a connection to the AI endpoint at startup
+    llm_requests_per_minute: int = 500  # client-side limits, set to the provider quota; 0 disables
+    llm_tokens_per_minute: int = 200000
+    llm_output_token_estimate: int = 1500  # tokens reserved per request for the answer
+    llm_interactive_max_wait: float = 60.0  # seconds a /privacy-concept request may wait for quota
+    llm_background_max_wait: float = 900.0  # seconds an audit request may wait before the attempt fails
+    llm_rate_limit_backoff: float = 20.0  # pause after a 429 without Retry-After
+    audit_chunked: bool = True  # map-reduce over chunks of all documents instead of one budgeted prompt
+    audit_chunk_tokens: int = 6000  # estimated tokens of document text per map call
+    audit_map_concurrency: int = 4  # map calls in flight per audit
+    audit_retrieval: bool = True  # chunked audit: send only the BM25 top passages per check item
+    audit_retrieval_top_k: int = 5  # passages per check item
+    audit_passage_tokens: int = 250  # estimated tokens per passage
+    llm_cache_enabled: bool = True  # reuse AI responses to byte-identical prompts
+    llm_cache_path: Optional[str] = None  # SQLite file, defaults to <data_dir>/llm_cache.sqlite3
+    llm_cache_ttl: int = 604800  # seconds, 7 days
+    llm_cache_max_bytes: int = 104857600  # 100 MB
     
+    # Local data
+    data_dir: str = "./data"  # persistent files such as the extraction and AI response caches
+
     # Database
     database_url: str = "sqlite+aiosqlite:///./app.db"
 
@@ -1,8 +1,15 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.routes import upload, projects, health, privacy_concept
+from app.routes import upload, upload_sessions, projects, health, privacy_concept, audit
 from app.database import init_models
+from app.services.webdav import close_http_client
+from app.services.nextcloud import NextcloudService
+from app.services.nextcloud_monitor import nextcloud_monitor
+from app.services.upload_sessions import upload_session_store
+from app.services.extraction import extraction_engine, extraction_cache, current_extractor_keys
+from app.services.agents import agent_registry
+from app.services.audit_queue import audit_workers
 import logging
 import sys
 from contextlib import asynccontextmanager
@@ -27,8 +34,25 @@ async def lifespan(app: FastAPI):
         logger.info("Database initialized.")
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
+
+    # Pre-warm the folder cache so uploads skip the base path round-trips
+    if await NextcloudService().create_folder(settings.nextcloud_base_path):
+        logger.info(f"Nextcloud base path ready: {settings.nextcloud_base_path}")
+    else:
+        logger.warning(f"Could not ensure Nextcloud base path {settings.nextcloud_base_path} at startup")
+    upload_session_store.cleanup_expired()
+    extraction_cache.purge_stale(current_extractor_keys())
+    nextcloud_monitor.start()
+    await agent_registry.start()
+    # Queued audits, including those interrupted by a restart, are picked up by the workers
+    audit_workers.start(upload.run_audit_job, on_failure=upload.audit_job_failed)
     yield
     # Shutdown
+    await audit_workers.stop()
+    await nextcloud_monitor.stop()
+    await close_http_client()
+    await agent_registry.close()
+    extraction_engine.shutdown()
 
 app = FastAPI(
     title="Datenschutzportal API",
@@ -50,7 +74,9 @@ app.add_middleware(
 
 # Routes
 app.include_router(upload.router, prefix="/api", tags=["upload"])
+app.include_router(upload_sessions.router, prefix="/api", tags=["upload"])
 app.include_router(projects.router, prefix="/api", tags=["projects"])
+app.include_router(audit.router, prefix="/api", tags=["audit"])
 app.include_router(health.router, prefix="/api", tags=["health"])
 app.include_router(privacy_concept.router, prefix="/api/privacy-concept", tags=["privacy-concept"])
 
@@ -0,0 +1,28 @@
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional, Dict
+from datetime import datetime
+
+class AuditJobSummary(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    project_id: str
+    project_title: str
+    state: str
+    attempts: int
+    max_attempts: int
+    run_after: datetime
+    lease_owner: Optional[str] = None
+    last_error: Optional[str] = None
+    audit_status: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class AuditJobListResponse(BaseModel):
+    items: List[AuditJobSummary]
+    # Number of jobs per state, over the whole queue
+    counts: Dict[str, int]
+    # Jobs currently processed by this process's workers
+    running: int
+    workers: int
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, JSON
+from sqlalchemy import Column, String, Text, DateTime, JSON, Boolean, Index, Integer, BigInteger
 from sqlalchemy.sql import func
 from app.database import Base
 import uuid
@@ -21,3 +21,79 @@ class PrivacyConceptDB(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class ProjectDB(Base):
+    __tablename__ = "projects"
+
+    # Same as the Nextcloud folder name
+    id = Column(String, primary_key=True)
+    title = Column(String, nullable=False)
+    institution = Column(String, nullable=False, index=True)
+    project_type = Column(String, nullable=False, index=True)
+    email = Column(String, nullable=False, index=True)
+    uploader_name = Column(String, nullable=True)
+    is_prospective_study = Column(Boolean, nullable=False, default=False)
+
+    # List of {"filename", "category", "path", ...} as written to metadata.json
+    files = Column(JSON, nullable=False, default=list)
+    # Full metadata.json content, served by /upload/status without touching Nextcloud
+    details = Column(JSON, nullable=False)
+
+    # pending -> PASS / NEEDS_IMPROVEMENT / FAIL / ERROR
+    audit_status = Column(String, nullable=False, default="pending", index=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        # Keyset pagination: ORDER BY created_at DESC, id DESC
+        Index("ix_projects_created_at_id", "created_at", "id"),
+        Index("ix_projects_institution_created_at", "institution", "created_at"),
+    )
+
+class DocumentDB(Base):
+    """Content fingerprint of every stored document, used to deduplicate resubmissions."""
+    __tablename__ = "documents"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    sha256 = Column(String(64), nullable=False, index=True)
+    project_id = Column(String, nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    remote_path = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=True)
+    etag = Column(String, nullable=True)  # of the stored copy; deduplication only copies it while unchanged
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+class AuditJobDB(Base):
+    """Background audit of a submission, processed by the audit worker pool (services/audit_queue.py)."""
+    __tablename__ = "audit_jobs"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    project_id = Column(String, nullable=False, index=True)
+    project_title = Column(String, nullable=False)
+    email = Column(String, nullable=False)
+    file_names = Column(JSON, nullable=False, default=list)
+    # filename -> SHA-256, to use the staged copies
+    file_hashes = Column(JSON, nullable=False, default=dict)
+
+    # queued -> downloading -> extracting -> auditing -> reporting -> notifying -> done
+    # A failed attempt goes back to queued (retry with backoff) or, after the last attempt, to failed
+    state = Column(String, nullable=False, default="queued", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime(timezone=True), nullable=False)
+    # Worker currently holding the job; an expired lease (crashed process) makes the job claimable again
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    # Overall status of the finished audit (PASS / NEEDS_IMPROVEMENT / FAIL)
+    audit_status = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Claim query: WHERE state = 'queued' AND run_after <= now ORDER BY run_after
+        Index("ix_audit_jobs_state_run_after", "state", "run_after"),
+    )
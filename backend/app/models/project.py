@@ -1,5 +1,20 @@
 from pydantic import BaseModel
+from typing import List, Optional, Dict, Any
+from datetime import datetime
 
-class Project(BaseModel):
-    # Placeholder for project model
-    pass
+class ProjectSummary(BaseModel):
+    project_id: str
+    project_title: str
+    institution: str
+    project_type: str
+    uploader_name: Optional[str] = None
+    email: str
+    is_prospective_study: bool
+    files: List[Dict[str, Any]]
+    audit_status: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+class ProjectListResponse(BaseModel):
+    items: List[ProjectSummary]
+    next_cursor: Optional[str] = None
@@ -41,3 +41,28 @@ class UploadResponse(BaseModel):
     timestamp: datetime
     files_uploaded: int
     message: str
+    deduplicated_files: List[str] = []
+
+class UploadSessionFile(BaseModel):
+    filename: str
+    size: int = Field(..., ge=0)
+    category: str = "sonstiges"
+
+class UploadSessionCreate(BaseModel):
+    email: str
+    uploader_name: Optional[str] = None
+    project_title: str
+    institution: str
+    is_prospective_study: bool = False
+    project_details: Optional[str] = None
+    project_type: str = "new"
+    files: List[UploadSessionFile] = Field(..., min_length=1)
+
+class UploadSessionFileStatus(UploadSessionFile):
+    offset: int
+
+class UploadSessionStatus(BaseModel):
+    session_id: str
+    expires_at: datetime
+    files: List[UploadSessionFileStatus]
+    complete: bool
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.database import get_db
+from app.models.audit_job import AuditJobSummary, AuditJobListResponse
+from app.services.audit_queue import AuditJobQueue, JOB_STATES, audit_workers
+from app.utils.auth import verify_token
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/audit/jobs", response_model=AuditJobListResponse, dependencies=[Depends(verify_token)])
+async def list_audit_jobs(
+    state: Optional[str] = None,
+    project_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Audit jobs, newest first, with the number of jobs per state.
+    """
+    if state and state not in JOB_STATES:
+        raise HTTPException(status_code=400, detail=f"Unknown state: {state}")
+    queue = AuditJobQueue(db)
+    jobs = await queue.list_jobs(state=state, project_id=project_id, limit=limit)
+    return AuditJobListResponse(
+        items=[AuditJobSummary.model_validate(job) for job in jobs],
+        counts=await queue.counts(),
+        running=len(audit_workers.running),
+        workers=audit_workers.workers,
+    )
+
+@router.get("/audit/jobs/{job_id}", response_model=AuditJobSummary, dependencies=[Depends(verify_token)])
+async def get_audit_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    job = await AuditJobQueue(db).get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Audit job not found")
+    return AuditJobSummary.model_validate(job)
@@ -1,7 +1,25 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from app.services.nextcloud_monitor import nextcloud_monitor
+from app.services.extraction import extraction_cache
+from app.services.llm_cache import llm_cache
+from app.services.llm_throttle import llm_scheduler
+from app.utils.auth import verify_token
 
 router = APIRouter()
 
 @router.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "nextcloud_latency_ms": nextcloud_monitor.last_latency_ms,
+    }
+
+@router.get("/health/details", dependencies=[Depends(verify_token)])
+async def health_details():
+    return {
+        "status": "ok",
+        "nextcloud": nextcloud_monitor.snapshot(),
+        "extraction_cache": extraction_cache.stats(),
+        "llm_cache": llm_cache.stats() if llm_cache is not None else None,
+        "llm_scheduler": llm_scheduler.stats(),
+    }
@@ -1,18 +1,18 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks, Depends
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks, Depends, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 import tempfile
 import os
-import shutil
+import json
 import logging
-import pypdf
 
 from app.services.privacy_concept import PrivacyConceptService
+from app.services.extraction import ingest_upload, IngestError
+from app.services.llm_throttle import LLMThrottleTimeout
 from app.models.privacy_concept import ExtractedStudyData, ConceptGenerationRequest, ExportRequest, ConceptResponse, SaveConceptRequest, SaveConceptResponse
 from app.database import get_db
 from app.utils.rate_limit import RateLimiter
-from app.config import settings
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -24,19 +24,10 @@ generate_limiter = RateLimiter(requests_per_minute=10)
 def get_service(db: AsyncSession = Depends(get_db)) -> PrivacyConceptService:
     return PrivacyConceptService(db)
 
-def validate_file(file: UploadFile):
-    """
-    Validates file size, extension, and checks for PDF encryption.
-    """
-    # Check file size (approximate, since we read the spool)
-    # Ideally, check Content-Length header or read chunks
-    # Here we rely on reading into temp file and checking size
-    
-    ext = os.path.splitext(file.filename)[1].lower()
-    if ext not in settings.allowed_file_types:
-        raise HTTPException(status_code=400, detail=f"File type {ext} not allowed.")
-
-    return True
+def throttled(e: LLMThrottleTimeout) -> HTTPException:
+    # The AI quota is used up for now; the client may retry shortly
+    logger.warning(f"AI request throttled: {e}")
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
 
 @router.post("/save", response_model=SaveConceptResponse)
 async def save_concept(
@@ -58,78 +49,90 @@ async def save_concept(
 async def extract_data(
     files: List[UploadFile] = File(default=[]),
     manual_text: Optional[str] = Form(None),
+    refresh: bool = False,
     service: PrivacyConceptService = Depends(get_service)
 ):
-    temp_files = []
+    documents = []
     try:
-        # Validate and save uploads
+        # Each upload is read once: validated, hashed and kept in memory or spooled for extraction
         for file in files:
-            validate_file(file)
-            
-            suffix = os.path.splitext(file.filename)[1]
-            if not suffix:
-                suffix = ".tmp"
-            
-            tmp_path = os.path.join(tempfile.gettempdir(), f"upload_{os.urandom(8).hex()}{suffix}")
-            
-            # Write to disk to check size and content
-            with open(tmp_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            # Check size
-            file_size = os.path.getsize(tmp_path)
-            if file_size > settings.max_file_size:
-                os.remove(tmp_path)
-                raise HTTPException(status_code=400, detail=f"File {file.filename} exceeds size limit.")
-            
-            # Check if PDF is encrypted
-            if suffix.lower() == '.pdf':
-                try:
-                    with open(tmp_path, 'rb') as f:
-                        reader = pypdf.PdfReader(f)
-                        if reader.is_encrypted:
-                            os.remove(tmp_path)
-                            raise HTTPException(status_code=400, detail=f"File {file.filename} is encrypted. Please provide an unencrypted PDF.")
-                except Exception as e:
-                    # If pypdf fails to read, it might be a corrupted file
-                    if os.path.exists(tmp_path):
-                         os.remove(tmp_path)
-                    logger.warning(f"Failed to read PDF {file.filename}: {e}")
-                    raise HTTPException(status_code=400, detail=f"File {file.filename} appears to be corrupted or invalid.")
+            documents.append(await ingest_upload(file))
 
-            temp_files.append(tmp_path)
-        
-        if not temp_files and not manual_text:
+        if not documents and not manual_text:
              raise HTTPException(status_code=400, detail="No files or text provided")
 
-        result = await service.extract_data(temp_files, manual_text)
+        # ?refresh=true asks the model again instead of returning a cached response
+        result = await service.extract_data(documents, manual_text, refresh=refresh)
         return result
+    except IngestError as e:
+        logger.warning(f"Rejected upload for extraction: {e}")
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except LLMThrottleTimeout as e:
+        raise throttled(e)
     except HTTPException as he:
         raise he
     except Exception as e:
         logger.error(f"Extraction error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        # Cleanup temp files
-        for path in temp_files:
-            try:
-                if os.path.exists(path):
-                    os.remove(path)
-            except:
-                pass
+        for document in documents:
+            document.cleanup()
 
 @router.post("/generate", response_model=ConceptResponse, dependencies=[Depends(generate_limiter)])
 async def generate_concept(
     request: ConceptGenerationRequest,
+    refresh: bool = False,
     service: PrivacyConceptService = Depends(get_service)
 ):
     try:
-        markdown = await service.generate_concept(request.data)
+        markdown = await service.generate_concept(request.data, refresh=refresh)
         return ConceptResponse(concept_markdown=markdown)
+    except LLMThrottleTimeout as e:
+        raise throttled(e)
     except Exception as e:
         logger.error(f"Generation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/generate/stream", dependencies=[Depends(generate_limiter)])
+async def generate_concept_stream(
+    request: ConceptGenerationRequest,
+    http_request: Request,
+    refresh: bool = False,
+    service: PrivacyConceptService = Depends(get_service)
+):
+    """
+    Server-Sent Events variant of /generate: "delta" events carry markdown as the model writes it,
+    the final "done" event the complete document (for /save and /export), "error" a failure.
+    """
+    async def events():
+        # Sent immediately, so the client and proxies see the response start
+        yield ": stream opened\n\n"
+        parts = []
+        stream = service.stream_concept(request.data, refresh=refresh)
+        try:
+            async for delta in stream:
+                if await http_request.is_disconnected():
+                    logger.info("Client disconnected, concept generation cancelled")
+                    return
+                parts.append(delta)
+                yield sse_event("delta", {"text": delta})
+            yield sse_event("done", {"concept_markdown": "".join(parts)})
+        except Exception as e:
+            logger.error(f"Generation error: {e}")
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            # Stops the model request if the loop ended early
+            await stream.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.post("/export")
 async def export_concept(
     request: ExportRequest, 
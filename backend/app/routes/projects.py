@@ -1,7 +1,36 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.database import get_db
+from app.models.project import ProjectListResponse
+from app.services.project_index import ProjectIndexService, to_summary
+from app.utils.auth import verify_token
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.get("/")
-async def list_projects():
-    return []
+@router.get("/", response_model=ProjectListResponse, dependencies=[Depends(verify_token)])
+async def list_projects(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    institution: Optional[str] = None,
+    project_type: Optional[str] = None,
+    audit_status: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    List submitted projects, newest first. Pass `next_cursor` as `cursor` to get the next page.
+    """
+    try:
+        projects, next_cursor = await ProjectIndexService(db).list_projects(
+            limit=limit,
+            cursor=cursor,
+            institution=institution,
+            project_type=project_type,
+            audit_status=audit_status
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ProjectListResponse(items=[to_summary(p) for p in projects], next_cursor=next_cursor)
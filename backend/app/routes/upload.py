@@ -1,8 +1,18 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, BackgroundTasks
-from typing import List
-from app.services.nextcloud import NextcloudService
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Dict, Any, Optional, Awaitable, Callable, Tuple
+from app.services.nextcloud import NextcloudService, metadata_cache
 from app.services.email_service import EmailService
 from app.services.ai_audit import AIAuditService
+from app.services.nextcloud_monitor import nextcloud_monitor
+from app.services.staging import staging_area
+from app.services.project_index import ProjectIndexService
+from app.services.audit_queue import (
+    AuditJobQueue, Progress, audit_workers, DOWNLOADING, EXTRACTING, REPORTING, NOTIFYING
+)
+from app.models.db_models import AuditJobDB, DocumentDB
+from app.database import get_db, SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.upload import UploadResponse
 from app.config import settings
 from app.utils.auth import verify_token
@@ -13,6 +23,7 @@ import re
 import logging
 import tempfile
 import shutil
+import asyncio
 
 logger = logging.getLogger(__name__)
 
@@ -21,27 +32,138 @@ nextcloud = NextcloudService()
 email_service = EmailService()
 ai_service = AIAuditService()
 
-async def perform_audit_and_notify(
+async def upload_files_concurrently(
+    files: List[UploadFile],
+    project_path: str,
+    categories_map: Dict[str, str],
+    find_document: Optional[Callable[[str], Awaitable[Optional[DocumentDB]]]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Upload all files of a submission in parallel, at most settings.upload_concurrency at a time.
+    Each file is hashed and staged locally (for the background audit) in the same pass that
+    streams it to Nextcloud, and the ETag of the stored copy is taken from the upload response.
+    With find_document (SHA-256 -> stored copy), each file is fingerprinted before its transfer
+    instead, and copied server-side if an identical copy is stored that still has its recorded ETag.
+    Fails fast: on the first failed upload the remaining uploads are cancelled and every
+    file whose upload had started is deleted again.
+    """
+    semaphore = asyncio.Semaphore(max(1, settings.upload_concurrency))
+    started = []
+
+    async def transfer(file: UploadFile, file_path: str, stage: bool) -> Tuple[Optional[str], Optional[str]]:
+        """PUT a file, with `stage` hashing and staging it in the same pass. Returns (SHA-256, ETag)."""
+        stream = await run_in_threadpool(staging_area.open) if stage else None
+        on_chunk = (lambda data: run_in_threadpool(stream.write, data)) if stream else None
+        try:
+            uploaded, etag = await nextcloud.upload_file(file, file_path, on_chunk=on_chunk)
+            if not uploaded:
+                logger.error(f"Failed to upload file: {file.filename} to {file_path}")
+                raise HTTPException(status_code=500, detail=f"Failed to upload file: {file.filename}")
+        except BaseException:
+            if stream:
+                await run_in_threadpool(stream.discard)
+            raise
+        return (await run_in_threadpool(stream.commit) if stream else None), etag
+
+    async def upload_one(idx: int, file: UploadFile) -> Dict[str, Any]:
+        category = categories_map.get(file.filename, "sonstiges")
+        # Upload directly to project folder, no category subfolders
+        file_path = f"{project_path}/{file.filename}"
+
+        async with semaphore:
+            sha256 = source = None
+            if find_document is not None:
+                await file.seek(0)
+                sha256 = await run_in_threadpool(staging_area.stage, file.file)
+                source = await find_document(sha256)
+            started.append(file_path)
+            deduplicated_from = etag = None
+            if source is not None and source.remote_path != file_path:
+                copied, etag = await nextcloud.copy_file(source.remote_path, file_path, etag=source.etag)
+                if copied:
+                    logger.info(f"Deduplicated {file.filename}: identical to {source.remote_path}")
+                    deduplicated_from = source.remote_path
+            if deduplicated_from is None:
+                logger.debug(f"Uploading file {idx}/{len(files)}: {file.filename} to category: {category}")
+                streamed_sha256, etag = await transfer(file, file_path, stage=sha256 is None)
+                sha256 = sha256 or streamed_sha256
+        logger.debug(f"Successfully uploaded file: {file.filename}")
+        return {
+            "filename": file.filename,
+            "category": category,
+            "path": file_path,
+            "size": file.size,
+            "sha256": sha256,
+            "etag": etag,
+            "deduplicated_from": deduplicated_from
+        }
+
+    tasks = [asyncio.create_task(upload_one(idx, file)) for idx, file in enumerate(files, 1)]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+        return [task.result() for task in tasks]
+    except BaseException:
+        # Fail fast: stop remaining uploads and remove everything this submission may have written
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logger.warning(f"Upload to {project_path} failed, removing partially uploaded files")
+        await asyncio.gather(
+            *(nextcloud.delete_file(path) for path in started),
+            return_exceptions=True
+        )
+        raise
+
+async def update_audit_status(project_id: str, audit_status: str):
+    """
+    Record the audit outcome in the project index (best effort, the report is in Nextcloud).
+    """
+    try:
+        async with SessionLocal() as db:
+            await ProjectIndexService(db).update_audit_status(project_id, audit_status)
+    except Exception as e:
+        logger.error(f"Failed to update audit status for {project_id}: {e}")
+
+async def run_audit(
     project_id: str,
     project_title: str,
     email: str,
-    file_names: List[str]
-):
+    file_names: List[str],
+    file_hashes: Optional[Dict[str, str]] = None,
+    progress: Optional[Progress] = None
+) -> str:
     """
-    Background task to perform AI audit and notify the team.
+    Perform the AI audit of a submission, store the report and notify the team.
+    Files are taken from the local staging area if possible (file_hashes maps
+    filename -> SHA-256) and only downloaded from Nextcloud on a cache miss.
+    `progress(state)` is awaited when a new stage begins. Raises on failure (the job queue retries);
+    returns the overall audit status.
     """
+    async def stage(state: str):
+        if progress is not None:
+            await progress(state)
+
     logger.info(f"Starting background audit for project {project_id}")
     temp_dir = tempfile.mkdtemp()
     try:
-        # Download files
+        # Collect files: local staging area first, Nextcloud download on a miss
+        await stage(DOWNLOADING)
+        file_hashes = file_hashes or {}
         local_file_paths = []
         for filename in file_names:
-            remote_path = f"{settings.nextcloud_base_path}/{project_id}/{filename}"
             local_path = os.path.join(temp_dir, filename)
-            
+            digest = file_hashes.get(filename)
+            if digest and staging_area.link(digest, local_path):
+                logger.debug(f"Using staged copy of {filename} for audit")
+                local_file_paths.append(local_path)
+                continue
+
+            remote_path = f"{settings.nextcloud_base_path}/{project_id}/{filename}"
             try:
-                # We access the webdav client directly for download
-                nextcloud.client.download_sync(remote_path=remote_path, local_path=local_path)
+                await nextcloud.download_file(remote_path, local_path)
                 local_file_paths.append(local_path)
             except Exception as e:
                 logger.error(f"Failed to download {filename} for audit: {e}")
@@ -50,9 +172,13 @@ async def perform_audit_and_notify(
             raise Exception("No files could be downloaded for audit")
 
         # Perform Audit
-        audit_result = await ai_service.perform_audit(project_id, local_file_paths)
+        await stage(EXTRACTING)
+        audit_result = await ai_service.perform_audit(
+            project_id, local_file_paths, file_hashes, on_stage=stage, raise_errors=True
+        )
         
         # Generate Report
+        await stage(REPORTING)
         report_filename = "AUDIT_REPORT.md"
         report_path = os.path.join(temp_dir, report_filename)
         await ai_service.generate_report(audit_result, report_path)
@@ -63,9 +189,14 @@ async def perform_audit_and_notify(
             report_content = f.read()
         
         remote_report_path = f"{settings.nextcloud_base_path}/{project_id}/{report_filename}"
-        await nextcloud.upload_content(report_content, remote_report_path)
+        if not await nextcloud.upload_content(report_content, remote_report_path):
+            raise Exception(f"Failed to upload the audit report to {remote_report_path}")
         
+        await update_audit_status(project_id, audit_result.overall_status)
+        metadata_cache.invalidate(project_id)
+
         # Send Team Notification
+        await stage(NOTIFYING)
         await email_service.send_team_notification(
             project_id=project_id,
             project_title=project_title,
@@ -74,28 +205,274 @@ async def perform_audit_and_notify(
             audit_summary=audit_result.summary,
             audit_status=audit_result.overall_status
         )
-        
-    except Exception as e:
-        logger.error(f"Error in background audit task: {e}", exc_info=True)
-        # Notify team about the error
-        try:
-            await email_service.send_team_notification(
-                project_id=project_id,
-                project_title=project_title,
-                uploader_email=email,
-                file_names=file_names,
-                audit_summary=f"Automatischer Audit fehlgeschlagen: {str(e)}",
-                audit_status="ERROR"
-            )
-        except Exception as notify_error:
-            logger.error(f"Failed to send error notification: {notify_error}")
-            pass
+        return audit_result.overall_status
             
     finally:
         # Cleanup
         if os.path.exists(temp_dir):
             shutil.rmtree(temp_dir)
 
+async def report_audit_failure(project_id: str, project_title: str, email: str, file_names: List[str], error: str):
+    """Mark the project as ERROR and notify the team about the failed audit."""
+    await update_audit_status(project_id, "ERROR")
+    try:
+        await email_service.send_team_notification(
+            project_id=project_id,
+            project_title=project_title,
+            uploader_email=email,
+            file_names=file_names,
+            audit_summary=f"Automatischer Audit fehlgeschlagen: {error}",
+            audit_status="ERROR"
+        )
+    except Exception as notify_error:
+        logger.error(f"Failed to send error notification: {notify_error}")
+
+async def perform_audit_and_notify(
+    project_id: str,
+    project_title: str,
+    email: str,
+    file_names: List[str],
+    file_hashes: Optional[Dict[str, str]] = None
+):
+    """
+    Background task variant without retries, used if the audit job cannot be queued.
+    """
+    try:
+        await run_audit(project_id, project_title, email, file_names, file_hashes)
+    except Exception as e:
+        logger.error(f"Error in background audit task: {e}", exc_info=True)
+        await report_audit_failure(project_id, project_title, email, file_names, str(e))
+
+async def run_audit_job(job: AuditJobDB, progress: Progress) -> str:
+    """Audit worker pool handler: one attempt of a queued audit job."""
+    return await run_audit(job.project_id, job.project_title, job.email, job.file_names, job.file_hashes, progress)
+
+async def audit_job_failed(job: AuditJobDB, error: str):
+    """Audit worker pool handler: the job failed after its last attempt."""
+    await report_audit_failure(job.project_id, job.project_title, job.email, job.file_names, error)
+
+def make_project_id(project_title: str, project_type: str) -> str:
+    """
+    Build the project id (= Nextcloud folder name) from the title, type and current date.
+    """
+    # Sanitize project title for folder name
+    # Replace non-alphanumeric characters (except spaces, dashes, underscores) with underscore
+    safe_title = re.sub(r'[^a-zA-Z0-9 \-_]', '_', project_title)
+    # Replace spaces with underscores
+    safe_title = safe_title.replace(' ', '_')
+    # Remove multiple underscores
+    safe_title = re.sub(r'_+', '_', safe_title)
+    # Trim underscores
+    safe_title = safe_title.strip('_')
+    
+    date_str = datetime.now().strftime('%Y-%m-%d')
+    
+    if project_type == 'existing':
+        folder_name = f"RE_{safe_title}_{date_str}"
+    else:
+        folder_name = f"{safe_title}_{date_str}"
+        
+    # Use folder_name as project_id for consistency with storage
+    return folder_name
+
+def validate_upload_file(filename: str, size: int):
+    """
+    Check name, size and extension of an uploaded file, raising HTTPException if not allowed.
+    The name becomes part of Nextcloud and local paths, so it must not contain path separators.
+    """
+    if filename in ("", ".", "..") or "\\" in filename or os.path.basename(filename) != filename:
+        logger.error(f"Rejected file name: {filename!r}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file name: {filename}"
+        )
+
+    if size > settings.max_file_size:
+        logger.error(f"File {filename} exceeds maximum size: {size} > {settings.max_file_size}")
+        raise HTTPException(
+            status_code=413,
+            detail=f"File {filename} exceeds maximum size of 50 MB"
+        )
+    
+    file_ext = os.path.splitext(filename)[1].lower()
+    if file_ext not in settings.allowed_file_types:
+        logger.error(f"File {filename} has disallowed extension: {file_ext}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"File type {file_ext} not allowed"
+        )
+
+async def process_submission(
+    background_tasks: BackgroundTasks,
+    db: AsyncSession,
+    email: str,
+    uploader_name: Optional[str],
+    project_title: str,
+    institution: str,
+    is_prospective_study: bool,
+    project_details: Optional[str],
+    files: List[UploadFile],
+    categories_map: Dict[str, str],
+    project_type: str
+) -> UploadResponse:
+    """
+    Store validated files of a submission in Nextcloud: project folder, files, metadata.json,
+    README.md, project index, confirmation email and background audit.
+    Shared by the single-request upload and the resumable upload sessions.
+    """
+    project_id = make_project_id(project_title, project_type)
+    logger.debug(f"Generated project_id: {project_id}")
+    
+    # Create project folder structure
+    project_path = f"{settings.nextcloud_base_path}/{project_id}"
+    logger.info(f"Creating project folder: {project_path}")
+    
+    # Fail fast if Nextcloud is known to be down (state is kept by the background monitor)
+    if not nextcloud_monitor.is_available():
+        logger.error(f"Nextcloud circuit breaker open: {nextcloud_monitor.last_error}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Nextcloud is currently unavailable. Please try again later. Error: {nextcloud_monitor.last_error}"
+        )
+    
+    if not await nextcloud.create_folder(project_path):
+        logger.error(f"Failed to create project folder: {project_path}")
+        nextcloud_monitor.record_failure(f"Failed to create project folder {project_path}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to create project folder in Nextcloud at path: {project_path}. Please check Nextcloud permissions and ensure the base path exists."
+        )
+    nextcloud_monitor.record_success()
+    
+    # Resubmissions mostly repeat documents stored earlier. Their files are fingerprinted before
+    # the transfer, so identical ones can be copied server-side; all others are hashed while they stream.
+    lookup_lock = asyncio.Lock()  # the request's session must not run concurrent queries
+
+    async def find_document(sha256: str) -> Optional[DocumentDB]:
+        async with lookup_lock:
+            try:
+                return (await ProjectIndexService(db).find_documents([sha256])).get(sha256)
+            except Exception as e:
+                logger.warning(f"Document fingerprint lookup failed, uploading the file: {e}")
+                return None
+
+    # Upload files directly to project folder (no subfolders), in parallel
+    logger.info(f"Starting upload of {len(files)} files...")
+    uploaded_files = await upload_files_concurrently(
+        files, project_path, categories_map,
+        find_document=find_document if project_type == "existing" else None
+    )
+    deduplicated_files = [f["filename"] for f in uploaded_files if f["deduplicated_from"]]
+    
+    logger.info(f"Successfully uploaded {len(uploaded_files)} files")
+    
+    # Create metadata file
+    logger.debug("Creating metadata file...")
+    metadata = {
+        "project_id": project_id,
+        "email": email,
+        "uploader_name": uploader_name,
+        "project_title": project_title,
+        "project_details": project_details,
+        "institution": institution,
+        "is_prospective_study": is_prospective_study,
+        "upload_timestamp": datetime.now().isoformat(),
+        "files": uploaded_files,
+        "project_type": project_type
+    }
+    
+    metadata_path = f"{project_path}/metadata.json"
+
+    # Create README.md
+    logger.debug("Creating README.md...")
+    readme_content = f"""# {project_title}
+
+**Projekt-ID:** {project_id}
+**Datum:** {datetime.now().strftime('%d.%m.%Y %H:%M')}
+**Typ:** {'Nachreichung' if project_type == 'existing' else 'Neueinreichung'}
+
+## Kontaktinformationen
+- **Name:** {uploader_name if uploader_name else 'Nicht angegeben'}
+- **E-Mail:** {email}
+- **Institution:** {institution}
+
+## Projektdetails
+{project_details if project_details else 'Keine weiteren Details angegeben.'}
+
+## Hochgeladene Dateien
+"""
+    
+    for file_info in uploaded_files:
+        readme_content += f"- **{file_info['category']}:** {file_info['filename']}"
+        if file_info["deduplicated_from"]:
+            readme_content += f" _(unverändert, identisch mit `{file_info['deduplicated_from']}`)_"
+        readme_content += "\n"
+
+    readme_path = f"{project_path}/README.md"
+
+    # Upload metadata and README in parallel
+    metadata_ok, readme_ok = await asyncio.gather(
+        nextcloud.upload_metadata(metadata, metadata_path),
+        nextcloud.upload_content(readme_content, readme_path)
+    )
+    if not metadata_ok:
+        logger.error(f"Failed to upload metadata to {metadata_path}")
+        raise HTTPException(status_code=500, detail="Failed to upload metadata")
+    if not readme_ok:
+        logger.error(f"Failed to upload README.md to {readme_path}")
+        raise HTTPException(status_code=500, detail="Failed to upload README.md")
+
+    # Record the submission in the project index (one transaction).
+    # Nextcloud stays the source of truth, so an index failure does not fail the upload.
+    try:
+        await ProjectIndexService(db).record_upload(metadata)
+    except Exception as e:
+        logger.error(f"Failed to record project {project_id} in index: {e}", exc_info=True)
+    
+    # Send confirmation email to user
+    logger.info(f"Sending confirmation email to {email}...")
+    try:
+        await email_service.send_confirmation_email(
+            to_email=email,
+            project_id=project_id,
+            project_title=project_title,
+            uploader_name=uploader_name,
+            files=uploaded_files,
+            project_type=project_type
+        )
+        logger.info("Confirmation email sent successfully")
+    except Exception as e:
+        logger.error(f"Failed to send confirmation email: {e}", exc_info=True)
+        # Don't fail the upload if email fails
+    
+    # Queue the audit and team notification for the audit worker pool
+    file_names = [f["filename"] for f in uploaded_files]
+    file_hashes = {f["filename"]: f["sha256"] for f in uploaded_files if f["sha256"]}
+    try:
+        job = await AuditJobQueue(db).enqueue(project_id, project_title, email, file_names, file_hashes)
+        audit_workers.notify()
+        logger.info(f"Upload completed successfully for project: {project_id}. Audit job {job.id} queued.")
+    except Exception as e:
+        # Without the queue, fall back to an in-process background task (no retries)
+        logger.error(f"Failed to queue audit job for {project_id}, running it as background task: {e}", exc_info=True)
+        background_tasks.add_task(
+            perform_audit_and_notify,
+            project_id=project_id,
+            project_title=project_title,
+            email=email,
+            file_names=file_names,
+            file_hashes=file_hashes
+        )
+    return UploadResponse(
+        success=True,
+        project_id=project_id,
+        timestamp=datetime.now(),
+        files_uploaded=len(uploaded_files),
+        message="Documents uploaded successfully. Audit and team notification will follow.",
+        deduplicated_files=deduplicated_files
+    )
+
+
 @router.post("/upload", response_model=UploadResponse, dependencies=[Depends(verify_token)])
 async def upload_documents(
     background_tasks: BackgroundTasks,
@@ -107,7 +484,8 @@ async def upload_documents(
     project_details: str = Form(None),
     files: List[UploadFile] = File(...),
     file_categories: str = Form(None),
-    project_type: str = Form("new")
+    project_type: str = Form("new"),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Upload data protection documents to Nextcloud
@@ -116,27 +494,6 @@ async def upload_documents(
     logger.debug(f"Upload details - Institution: {institution}, Project type: {project_type}, Prospective: {is_prospective_study}")
     
     try:
-        # Sanitize project title for folder name
-        # Replace non-alphanumeric characters (except spaces, dashes, underscores) with underscore
-        safe_title = re.sub(r'[^a-zA-Z0-9 \-_]', '_', project_title)
-        # Replace spaces with underscores
-        safe_title = safe_title.replace(' ', '_')
-        # Remove multiple underscores
-        safe_title = re.sub(r'_+', '_', safe_title)
-        # Trim underscores
-        safe_title = safe_title.strip('_')
-        
-        date_str = datetime.now().strftime('%Y-%m-%d')
-        
-        if project_type == 'existing':
-            folder_name = f"RE_{safe_title}_{date_str}"
-        else:
-            folder_name = f"{safe_title}_{date_str}"
-            
-        # Use folder_name as project_id for consistency with storage
-        project_id = folder_name
-        logger.debug(f"Generated project_id: {project_id}")
-        
         # Parse categories if provided
         categories_map = {}
         if file_categories:
@@ -151,144 +508,22 @@ async def upload_documents(
         logger.debug("Validating files...")
         for file in files:
             logger.debug(f"Validating file: {file.filename}, size: {file.size} bytes, content_type: {file.content_type}")
-            if file.size > settings.max_file_size:
-                logger.error(f"File {file.filename} exceeds maximum size: {file.size} > {settings.max_file_size}")
-                raise HTTPException(
-                    status_code=413,
-                    detail=f"File {file.filename} exceeds maximum size of 50 MB"
-                )
-            
-            file_ext = os.path.splitext(file.filename)[1].lower()
-            if file_ext not in settings.allowed_file_types:
-                logger.error(f"File {file.filename} has disallowed extension: {file_ext}")
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"File type {file_ext} not allowed"
-                )
+            validate_upload_file(file.filename, file.size)
         
         logger.info("File validation passed")
         
-        # Create project folder structure
-        project_path = f"{settings.nextcloud_base_path}/{project_id}"
-        logger.info(f"Creating project folder: {project_path}")
-        
-        # Test connection before attempting folder creation
-        connection_ok, connection_msg = nextcloud.test_connection()
-        if not connection_ok:
-            logger.error(f"Nextcloud connection failed: {connection_msg}")
-            raise HTTPException(
-                status_code=503,
-                detail=f"Nextcloud connection failed. Please check Nextcloud configuration and credentials. Error: {connection_msg}"
-            )
-        
-        if not nextcloud.create_folder(project_path):
-            logger.error(f"Failed to create project folder: {project_path}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to create project folder in Nextcloud at path: {project_path}. Please check Nextcloud permissions and ensure the base path exists."
-            )
-        
-        # Upload files directly to project folder (no subfolders)
-        uploaded_files = []
-        logger.info(f"Starting upload of {len(files)} files...")
-        for idx, file in enumerate(files, 1):
-            category = categories_map.get(file.filename, "sonstiges")
-            logger.debug(f"Uploading file {idx}/{len(files)}: {file.filename} to category: {category}")
-            
-            # Upload directly to project folder, no category subfolders
-            file_path = f"{project_path}/{file.filename}"
-            if not await nextcloud.upload_file(file, file_path):
-                logger.error(f"Failed to upload file: {file.filename} to {file_path}")
-                raise HTTPException(status_code=500, detail=f"Failed to upload file: {file.filename}")
-            
-            logger.debug(f"Successfully uploaded file: {file.filename}")
-            uploaded_files.append({
-                "filename": file.filename,
-                "category": category,
-                "path": file_path
-            })
-        
-        logger.info(f"Successfully uploaded {len(uploaded_files)} files")
-        
-        # Create metadata file
-        logger.debug("Creating metadata file...")
-        metadata = {
-            "project_id": project_id,
-            "email": email,
-            "uploader_name": uploader_name,
-            "project_title": project_title,
-            "project_details": project_details,
-            "institution": institution,
-            "is_prospective_study": is_prospective_study,
-            "upload_timestamp": datetime.now().isoformat(),
-            "files": uploaded_files,
-            "project_type": project_type
-        }
-        
-        metadata_path = f"{project_path}/metadata.json"
-        if not await nextcloud.upload_metadata(metadata, metadata_path):
-            logger.error(f"Failed to upload metadata to {metadata_path}")
-            raise HTTPException(status_code=500, detail="Failed to upload metadata")
-
-        # Create README.md
-        logger.debug("Creating README.md...")
-        readme_content = f"""# {project_title}
-
-**Projekt-ID:** {project_id}
-**Datum:** {datetime.now().strftime('%d.%m.%Y %H:%M')}
-**Typ:** {'Nachreichung' if project_type == 'existing' else 'Neueinreichung'}
-
-## Kontaktinformationen
-- **Name:** {uploader_name if uploader_name else 'Nicht angegeben'}
-- **E-Mail:** {email}
-- **Institution:** {institution}
-
-## Projektdetails
-{project_details if project_details else 'Keine weiteren Details angegeben.'}
-
-## Hochgeladene Dateien
-"""
-        
-        for file_info in uploaded_files:
-            readme_content += f"- **{file_info['category']}:** {file_info['filename']}\n"
-
-        readme_path = f"{project_path}/README.md"
-        if not await nextcloud.upload_content(readme_content, readme_path):
-            logger.error(f"Failed to upload README.md to {readme_path}")
-            raise HTTPException(status_code=500, detail="Failed to upload README.md")
-        
-        # Send confirmation email to user
-        logger.info(f"Sending confirmation email to {email}...")
-        try:
-            await email_service.send_confirmation_email(
-                to_email=email,
-                project_id=project_id,
-                project_title=project_title,
-                uploader_name=uploader_name,
-                files=uploaded_files,
-                project_type=project_type
-            )
-            logger.info("Confirmation email sent successfully")
-        except Exception as e:
-            logger.error(f"Failed to send confirmation email: {e}", exc_info=True)
-            # Don't fail the upload if email fails
-        
-        # Trigger background audit and team notification
-        background_tasks.add_task(
-            perform_audit_and_notify,
-            project_id=project_id,
-            project_title=project_title,
+        return await process_submission(
+            background_tasks=background_tasks,
+            db=db,
             email=email,
-            file_names=[f["filename"] for f in uploaded_files]
-        )
-        
-        logger.info(f"Upload completed successfully for project: {project_id}. Background audit triggered.")
-        return UploadResponse(
-            success=True,
-            project_id=project_id,
-            timestamp=datetime.now(),
-            files_uploaded=len(files),
-            message="Documents uploaded successfully. Audit and team notification will follow."
+            uploader_name=uploader_name,
+            project_title=project_title,
+            institution=institution,
+            is_prospective_study=is_prospective_study,
+            project_details=project_details,
+            files=files,
+            categories_map=categories_map,
+            project_type=project_type
         )
         
     except HTTPException:
@@ -299,10 +534,19 @@ async def upload_documents(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @router.get("/upload/status/{project_id}", dependencies=[Depends(verify_token)])
-async def get_upload_status(project_id: str):
+async def get_upload_status(project_id: str, db: AsyncSession = Depends(get_db)):
     """
-    Get upload status for a project
+    Get upload status for a project.
+    Served from the project index; Nextcloud is only asked for projects that are not indexed.
     """
+    try:
+        project = await ProjectIndexService(db).get_project(project_id)
+    except Exception as e:
+        logger.error(f"Project index lookup failed for {project_id}: {e}")
+        project = None
+    if project is not None:
+        return {**project.details, "audit_status": project.audit_status}
+
     try:
         metadata = await nextcloud.get_metadata(project_id)
         return metadata
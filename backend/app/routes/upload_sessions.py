@@ -0,0 +1,140 @@
+from fastapi import APIRouter, UploadFile, HTTPException, Depends, BackgroundTasks, Request, Header, Response
+from fastapi.responses import JSONResponse
+from starlette.requests import ClientDisconnect
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.upload import UploadResponse, UploadSessionCreate, UploadSessionStatus, UploadSessionFileStatus
+from app.routes.upload import process_submission, validate_upload_file
+from app.services.upload_sessions import upload_session_store, UploadSessionError
+from app.database import get_db
+from app.utils.auth import verify_token
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Sessions currently being finalized, to reject a second concurrent finalize
+_finalizing = set()
+
+def session_error(e: UploadSessionError) -> HTTPException:
+    headers = {"Upload-Offset": str(e.offset)} if e.offset is not None else None
+    return HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+
+@router.post("/upload/sessions", response_model=UploadSessionStatus, status_code=201, dependencies=[Depends(verify_token)])
+async def create_upload_session(request: UploadSessionCreate):
+    """
+    Start a resumable upload. The manifest lists every file with its exact size.
+    """
+    filenames = [f.filename for f in request.files]
+    if len(set(filenames)) != len(filenames):
+        raise HTTPException(status_code=400, detail="Duplicate file names in upload session")
+    for f in request.files:
+        validate_upload_file(f.filename, f.size)
+
+    submission = request.model_dump(exclude={"files"})
+    try:
+        return upload_session_store.create(submission, [f.model_dump() for f in request.files])
+    except UploadSessionError as e:
+        raise session_error(e)
+
+@router.get("/upload/sessions/{session_id}", response_model=UploadSessionStatus, dependencies=[Depends(verify_token)])
+async def get_upload_session(session_id: str):
+    """
+    Current offset of every file, so a client can resume after a dropped connection.
+    """
+    try:
+        return upload_session_store.status(session_id)
+    except UploadSessionError as e:
+        raise session_error(e)
+
+@router.patch("/upload/sessions/{session_id}/files/{file_index}", response_model=UploadSessionFileStatus, dependencies=[Depends(verify_token)])
+async def upload_session_chunk(
+    session_id: str,
+    file_index: int,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset")
+):
+    """
+    Append the raw request body to a file, starting at Upload-Offset (must equal the current offset).
+    """
+    try:
+        offset = await upload_session_store.append(session_id, file_index, upload_offset, request.stream())
+    except ClientDisconnect:
+        logger.info(f"Client disconnected during upload to session {session_id}, file {file_index}")
+        return Response(status_code=400)
+    except UploadSessionError as e:
+        raise session_error(e)
+
+    file_info = upload_session_store.get(session_id)["files"][file_index]
+    return JSONResponse(
+        content={**file_info, "offset": offset},
+        headers={"Upload-Offset": str(offset)}
+    )
+
+@router.post("/upload/sessions/{session_id}/finalize", response_model=UploadResponse, dependencies=[Depends(verify_token)])
+async def finalize_upload_session(
+    session_id: str,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Hand a complete session to the regular upload flow (folder, files, metadata, README, email, audit).
+    The session is removed afterwards; on failure it is kept so finalize can be retried.
+    """
+    try:
+        status = upload_session_store.status(session_id)
+        session = upload_session_store.get(session_id)
+    except UploadSessionError as e:
+        raise session_error(e)
+    if not status["complete"]:
+        raise HTTPException(status_code=409, detail="Upload session is not complete")
+    if session_id in _finalizing:
+        raise HTTPException(status_code=409, detail="Upload session is already being finalized")
+
+    _finalizing.add(session_id)
+    files = []
+    try:
+        for index, f in enumerate(session["files"]):
+            files.append(UploadFile(
+                file=open(upload_session_store.part_path(session_id, index), 'rb'),
+                filename=f["filename"],
+                size=f["size"]
+            ))
+        submission = session["submission"]
+        response = await process_submission(
+            background_tasks=background_tasks,
+            db=db,
+            email=submission["email"],
+            uploader_name=submission["uploader_name"],
+            project_title=submission["project_title"],
+            institution=submission["institution"],
+            is_prospective_study=submission["is_prospective_study"],
+            project_details=submission["project_details"],
+            files=files,
+            categories_map={f["filename"]: f["category"] for f in session["files"]},
+            project_type=submission["project_type"]
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error finalizing upload session {session_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        for file in files:
+            file.file.close()
+        _finalizing.discard(session_id)
+
+    upload_session_store.delete(session_id)
+    return response
+
+@router.delete("/upload/sessions/{session_id}", status_code=204, dependencies=[Depends(verify_token)])
+async def delete_upload_session(session_id: str):
+    """
+    Abort a resumable upload and discard its partial data.
+    """
+    try:
+        upload_session_store.get(session_id)
+    except UploadSessionError as e:
+        raise session_error(e)
+    upload_session_store.delete(session_id)
+    return Response(status_code=204)
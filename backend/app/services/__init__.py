@@ -1,3 +1,4 @@
 from .nextcloud import NextcloudService as NextcloudService
 from .email_service import EmailService as EmailService
 from .ai_audit import AIAuditService as AIAuditService
+from .extraction import ExtractionEngine as ExtractionEngine
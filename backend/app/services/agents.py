@@ -0,0 +1,122 @@
+import httpx
+from app.config import settings
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Type
+import asyncio
+import logging
+
+from openai import AsyncOpenAI
+from pydantic_ai import Agent
+from pydantic_ai.models.openai import OpenAIModel
+
+try:
+    # Newer pydantic-ai versions take the client through a provider
+    from pydantic_ai.providers.openai import OpenAIProvider
+except ImportError:
+    OpenAIProvider = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AgentSpec:
+    system_prompt: str
+    result_type: Type
+
+
+class AgentRegistry:
+    """
+    Process-wide, pre-built pydantic-ai agents. All of them share one model object and one
+    pooled httpx.AsyncClient to the AI endpoint, configured from settings (no environment
+    variables). Services register their agents at import time and look them up by name;
+    the application lifespan builds and warms them at startup and closes the client on shutdown.
+    """
+    def __init__(self):
+        self._specs: Dict[str, AgentSpec] = {}
+        self._agents: Dict[str, Agent] = {}
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._model: Any = None
+
+    def register(self, name: str, system_prompt: str, result_type: Type):
+        """Declare an agent; an existing agent of that name is rebuilt on next use if the spec changed."""
+        spec = AgentSpec(system_prompt, result_type)
+        if self._specs.get(name) != spec:
+            self._agents.pop(name, None)
+        self._specs[name] = spec
+
+    def get(self, name: str) -> Agent:
+        agent = self._agents.get(name)
+        if agent is None:
+            spec = self._specs[name]
+            agent = Agent(
+                model=self.model(),
+                system_prompt=spec.system_prompt,
+                result_type=spec.result_type,
+            )
+            self._agents[name] = agent
+        return agent
+
+    def http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                proxy=settings.ai_proxy or None,
+                timeout=httpx.Timeout(settings.ai_timeout, connect=settings.ai_connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=settings.ai_max_connections,
+                    max_keepalive_connections=settings.ai_max_keepalive_connections,
+                    keepalive_expiry=settings.ai_keepalive_expiry,
+                ),
+            )
+            # Agents hold the model, which holds the old client
+            self._model = None
+            self._agents.clear()
+        return self._http_client
+
+    def model(self):
+        if self._model is None:
+            openai_client = AsyncOpenAI(
+                api_key=settings.ai_api_key,
+                base_url=settings.ai_api_base_url,
+                http_client=self.http_client(),
+            )
+            if OpenAIProvider is not None:
+                self._model = OpenAIModel(settings.ai_model_name, provider=OpenAIProvider(openai_client=openai_client))
+            else:
+                self._model = OpenAIModel(settings.ai_model_name, openai_client=openai_client)
+        return self._model
+
+    async def start(self):
+        """Build every registered agent and open a connection to the AI endpoint."""
+        for name in self._specs:
+            self.get(name)
+        logger.info(f"Built {len(self._agents)} AI agents for model {settings.ai_model_name}")
+        if settings.ai_warmup:
+            await self.warm()
+
+    async def warm(self):
+        """
+        Establish a pooled keep-alive connection (DNS, TCP, TLS) so the first real request does not pay for it.
+        Any HTTP answer is fine; failures only log a warning.
+        """
+        try:
+            response = await asyncio.wait_for(
+                self.http_client().get(
+                    f"{settings.ai_api_base_url.rstrip('/')}/models",
+                    headers={"Authorization": f"Bearer {settings.ai_api_key}"},
+                ),
+                timeout=settings.ai_connect_timeout,
+            )
+            logger.info(f"AI endpoint connection warmed (status {response.status_code})")
+        except Exception as e:
+            logger.warning(f"Could not warm the AI endpoint connection: {e}")
+
+    async def close(self):
+        """Close the shared HTTP client (called on application shutdown)."""
+        if self._http_client is not None and not self._http_client.is_closed:
+            await self._http_client.aclose()
+        self._http_client = None
+        self._model = None
+        self._agents.clear()
+
+
+agent_registry = AgentRegistry()
@@ -1,26 +1,24 @@
 import os
 import logging
 import asyncio
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Awaitable
 from datetime import datetime
 import json
-from pathlib import Path
-
-# Text extraction libraries
-import pypdf
-import docx
-import openpyxl
-from odf.opendocument import load as load_odf
-from odf.text import P
 
 # AI libraries
-from pydantic_ai import Agent, RunContext
+from pydantic_ai import Agent
 from pydantic import BaseModel, Field
 from app.config import settings
 from app.config.audit_criteria import DEFAULT_AUDIT_CRITERIA, CheckItem
 
 # Nextcloud service
 from app.services.nextcloud import NextcloudService
+from app.services.extraction import extraction_engine
+from app.services.audit_chunking import Chunk, chunk_documents
+from app.services.retrieval import select_passages
+from app.services.llm_cache import run_cached
+from app.services.agents import agent_registry
+from app.services.audit_queue import AUDITING
 
 logger = logging.getLogger(__name__)
 
@@ -32,60 +30,85 @@ class CheckResult(BaseModel):
     findings: str = Field(description="Detailed findings and observations")
     recommendation: Optional[str] = Field(description="Recommendation for improvement if applicable")
 
+class PartialAuditResult(BaseModel):
+    results: List[CheckResult] = Field(description="Results for each check item, UNKNOWN if the excerpt does not address it")
+
 class AuditResult(BaseModel):
     summary: str = Field(description="High-level executive summary of the audit")
     results: List[CheckResult] = Field(description="Detailed results for each check item")
     overall_status: str = Field(description="Overall status: 'PASS', 'NEEDS_IMPROVEMENT', 'FAIL'")
 
+agent_registry.register("audit", DEFAULT_AUDIT_CRITERIA.system_prompt, AuditResult)
+agent_registry.register("audit_map", DEFAULT_AUDIT_CRITERIA.system_prompt, PartialAuditResult)
+
 # --- Service Class ---
 
 class AIAuditService:
     def __init__(self):
         self.nextcloud = NextcloudService()
         self.criteria = DEFAULT_AUDIT_CRITERIA
-        
-        # Set OpenAI environment variables for Pydantic AI (which uses OpenAI SDK)
-        # This ensures that if the user configured a custom OpenAI-compatible endpoint, it is used.
-        if settings.ai_api_key:
-            os.environ["OPENAI_API_KEY"] = settings.ai_api_key
-        if settings.ai_api_base_url:
-            os.environ["OPENAI_BASE_URL"] = settings.ai_api_base_url
-        
-        # Configure proxy if provided (useful for corporate networks or tunneling)
-        if settings.ai_proxy:
-             # Standard proxy env vars for requests/aiohttp/httpx
-            os.environ["HTTP_PROXY"] = settings.ai_proxy
-            os.environ["HTTPS_PROXY"] = settings.ai_proxy
-            # OpenAI specific (though usually standard env vars are enough)
-            # os.environ["OPENAI_PROXY"] = settings.ai_proxy 
-        
-        self.agent = Agent(
-            model=settings.ai_model_name,
-            system_prompt=self.criteria.system_prompt,
-            result_type=AuditResult,
-        )
+        # Looked up in the registry on every use, since it rebuilds its agents after close();
+        # an assigned agent replaces the lookup
+        self._agent: Optional[Agent] = None
+        self._map_agent: Optional[Agent] = None
+
+    @property
+    def agent(self) -> Agent:
+        return self._agent if self._agent is not None else agent_registry.get("audit")
+
+    @agent.setter
+    def agent(self, agent: Agent):
+        self._agent = agent
+
+    @property
+    def map_agent(self) -> Agent:
+        """Partial evaluation of one chunk in the chunked audit; `agent` does the reduce step."""
+        return self._map_agent if self._map_agent is not None else agent_registry.get("audit_map")
+
+    @map_agent.setter
+    def map_agent(self, agent: Agent):
+        self._map_agent = agent
 
-    async def perform_audit(self, project_id: str, file_paths: List[str]) -> AuditResult:
+    async def perform_audit(
+        self,
+        project_id: str,
+        file_paths: List[str],
+        file_hashes: Optional[Dict[str, str]] = None,
+        refresh: bool = False,
+        on_stage: Optional[Callable[[str], Awaitable[None]]] = None,
+        raise_errors: bool = False
+    ) -> AuditResult:
         """
         Main entry point for the audit process.
         :param project_id: The ID of the project in Nextcloud
         :param file_paths: List of temporary local paths to the files (or downloaded files)
+        :param file_hashes: Optional filename -> SHA-256, used to reuse earlier extraction results
+        :param refresh: Ask the model again instead of reusing cached responses
+        :param on_stage: Optional callback, awaited with AUDITING once the text is extracted
+        :param raise_errors: Raise instead of returning a FAIL result, so the caller can retry
         """
         try:
             logger.info(f"Starting AI audit for project {project_id} with {len(file_paths)} files")
             
-            # 1. Extract text from all files
-            combined_text = ""
-            for file_path in file_paths:
-                text = self._extract_text(file_path)
+            # 1. Extract text from all files (in parallel worker processes).
+            # The chunked audit reads every document completely; the single prompt needs the budget.
+            file_hashes = file_hashes or {}
+            texts = await extraction_engine.extract_many(
+                file_paths,
+                [file_hashes.get(os.path.basename(file_path)) for file_path in file_paths],
+                max_chars=None if settings.audit_chunked else settings.extraction_char_budget
+            )
+            documents = []
+            failed_files = []
+            for file_path, text in zip(file_paths, texts):
                 filename = os.path.basename(file_path)
                 if text:
-                    combined_text += f"\n\n--- FILE: {filename} ---\n\n{text}"
+                    documents.append((filename, text))
                 else:
                     logger.warning(f"Could not extract text from {filename}")
-                    combined_text += f"\n\n--- FILE: {filename} (Text extraction failed or empty) ---\n\n"
+                    failed_files.append(filename)
 
-            if not combined_text.strip():
+            if not documents:
                 logger.error("No text could be extracted from any file.")
                 return AuditResult(
                     summary="Audit failed because no text could be extracted from the uploaded documents.",
@@ -94,30 +117,52 @@ class AIAuditService:
                 )
 
             # 2. Run AI Analysis
-            # We inject the check items into the prompt context if needed, or rely on system prompt.
-            # Ideally, pass them as context or part of the user prompt.
+            if on_stage is not None:
+                await on_stage(AUDITING)
+            if settings.audit_chunked:
+                chunks = chunk_documents(documents, settings.audit_chunk_tokens)
+                if len(chunks) > 1 and settings.audit_retrieval:
+                    # Too large for one prompt: keep only the passages relevant to some check item
+                    documents = select_passages(
+                        documents,
+                        self.criteria.check_items,
+                        settings.audit_retrieval_top_k,
+                        settings.audit_passage_tokens
+                    )
+                    retrieved = chunk_documents(documents, settings.audit_chunk_tokens)
+                    logger.info(f"Retrieval reduced {sum(c.tokens for c in chunks)} to {sum(c.tokens for c in retrieved)} estimated tokens")
+                    chunks = retrieved
+                if len(chunks) > 1:
+                    audit_result = await self._audit_chunked(chunks, failed_files, refresh)
+                    logger.info(f"AI analysis completed. Status: {audit_result.overall_status}")
+                    return audit_result
+                combined_text = chunks[0].text
+            else:
+                combined_text = "".join(f"\n\n--- FILE: {filename} ---\n\n{text}" for filename, text in documents)
+            combined_text += "".join(
+                f"\n\n--- FILE: {filename} (Text extraction failed or empty) ---\n\n" for filename in failed_files
+            )
             
             user_prompt = f"""
             Bitte prüfe die folgenden Dokumenteninhalte gegen die Checkliste.
             
             Checkliste:
-            {json.dumps([item.model_dump() for item in self.criteria.check_items], indent=2)}
+            {self._checklist_json()}
             
             Dokumenteninhalte:
-            {combined_text[:100000]} 
+            {combined_text} 
             """
-            # Truncate text if too long (simple protection, though model context might be larger)
-            # 100k chars is approx 25k tokens.
             
             logger.info("Running AI analysis...")
-            result = await self.agent.run(user_prompt)
-            audit_result = result.data
+            audit_result = await self._run(self.agent, user_prompt, AuditResult, refresh)
             
             logger.info(f"AI analysis completed. Status: {audit_result.overall_status}")
             
             return audit_result
 
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"Audit failed: {e}", exc_info=True)
             return AuditResult(
                 summary=f"An error occurred during the automated audit: {str(e)}",
@@ -125,62 +170,85 @@ class AIAuditService:
                 overall_status="FAIL"
             )
 
-    def _extract_text(self, file_path: str) -> str:
-        """Extract text based on file extension."""
-        ext = os.path.splitext(file_path)[1].lower()
+    async def _run(self, agent, user_prompt: str, result_type, refresh: bool):
+        return await run_cached(
+            agent, user_prompt, self.criteria.system_prompt, result_type,
+            version=self.criteria.version, refresh=refresh
+        )
+
+    def _checklist_json(self) -> str:
+        return json.dumps([item.model_dump() for item in self.criteria.check_items], indent=2)
+
+    async def _audit_chunked(self, chunks: List[Chunk], failed_files: List[str], refresh: bool = False) -> AuditResult:
+        """
+        Map: evaluate every chunk against the checklist (concurrently, capped).
+        Reduce: merge the partial results per check item into one AuditResult.
+        """
+        logger.info(f"Running chunked AI analysis over {len(chunks)} chunks...")
+        semaphore = asyncio.Semaphore(max(1, settings.audit_map_concurrency))
+        partials = await asyncio.gather(*(self._map_chunk(chunk, len(chunks), semaphore, refresh) for chunk in chunks))
+        partials = [partial for partial in partials if partial is not None]
+        failed_chunks = len(chunks) - len(partials)
+        if not partials:
+            raise RuntimeError(f"All {len(chunks)} partial evaluations failed")
+
+        merged = merge_partial_results(partials, [item.id for item in self.criteria.check_items])
+
+        notes = []
+        if failed_files:
+            notes.append(f"Kein Text extrahiert aus: {', '.join(failed_files)}")
+        if failed_chunks:
+            notes.append(f"{failed_chunks} von {len(chunks)} Abschnitten konnten nicht ausgewertet werden")
+
+        user_prompt = f"""
+            Die Dokumente wurden in {len(chunks)} Abschnitten einzeln gegen die Checkliste geprüft.
+            Fasse die Teilergebnisse zu einem Gesamtergebnis zusammen: genau ein Ergebnis pro Prüfpunkt.
+            Ein Prüfpunkt gilt als erfüllt, wenn er in irgendeinem Abschnitt erfüllt ist; widersprechen sich
+            Abschnitte, begründe die Entscheidung. UNKNOWN bleibt nur, wenn kein Abschnitt den Punkt behandelt.
+            
+            Checkliste:
+            {self._checklist_json()}
+            
+            Teilergebnisse pro Prüfpunkt:
+            {json.dumps([result.model_dump() for result in merged], indent=2, ensure_ascii=False)}
+            
+            Hinweise:
+            {chr(10).join(notes) if notes else "-"}
+            """
         try:
-            if ext == '.pdf':
-                return self._extract_from_pdf(file_path)
-            elif ext in ['.docx', '.doc']:
-                return self._extract_from_docx(file_path)
-            elif ext in ['.xlsx', '.xls']:
-                return self._extract_from_excel(file_path)
-            elif ext == '.odt':
-                return self._extract_from_odt(file_path)
-            elif ext in ['.txt', '.md']:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    return f.read()
-            else:
-                logger.warning(f"Unsupported file type for text extraction: {ext}")
-                return ""
+            return await self._run(self.agent, user_prompt, AuditResult, refresh)
         except Exception as e:
-            logger.error(f"Error extracting text from {file_path}: {e}")
-            return ""
-
-    def _extract_from_pdf(self, path: str) -> str:
-        text = ""
-        with open(path, 'rb') as f:
-            reader = pypdf.PdfReader(f)
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-        return text
-
-    def _extract_from_docx(self, path: str) -> str:
-        doc = docx.Document(path)
-        return "\n".join([p.text for p in doc.paragraphs])
-
-    def _extract_from_excel(self, path: str) -> str:
-        wb = openpyxl.load_workbook(path, data_only=True)
-        text = ""
-        for sheet in wb.sheetnames:
-            ws = wb[sheet]
-            text += f"\nSheet: {sheet}\n"
-            for row in ws.iter_rows(values_only=True):
-                row_text = " | ".join([str(cell) for cell in row if cell is not None])
-                if row_text:
-                    text += row_text + "\n"
-        return text
-
-    def _extract_from_odt(self, path: str) -> str:
-        doc = load_odf(path)
-        text = []
-        for p in doc.getElementsByType(P):
-            text.append(str(p)) # This might need refinement for ODT text extraction
-            # odfpy is a bit tricky, alternative is teletype
-        
-        # Better simple extraction for odfpy
-        from odf import teletype
-        return "\n".join([teletype.extractText(p) for p in doc.getElementsByType(P)])
+            logger.error(f"Reduce step failed, using merged partial results: {e}", exc_info=True)
+            return AuditResult(
+                summary=" ".join(["Zusammenfassung aus Teilergebnissen (automatische Zusammenführung)."] + notes),
+                results=merged,
+                overall_status=overall_status(merged)
+            )
+
+    async def _map_chunk(
+        self,
+        chunk: Chunk,
+        total: int,
+        semaphore: asyncio.Semaphore,
+        refresh: bool = False
+    ) -> Optional[PartialAuditResult]:
+        user_prompt = f"""
+            Bitte prüfe den folgenden Ausschnitt ({chunk.index + 1} von {total}) der Dokumente gegen die Checkliste.
+            Der Ausschnitt ist nur ein Teil der Unterlagen: Nutze den Status UNKNOWN für Prüfpunkte,
+            zu denen dieser Ausschnitt nichts enthält, statt sie als FAIL zu werten.
+            
+            Checkliste:
+            {self._checklist_json()}
+            
+            Dokumenteninhalte:
+            {chunk.text}
+            """
+        async with semaphore:
+            try:
+                return await self._run(self.map_agent, user_prompt, PartialAuditResult, refresh)
+            except Exception as e:
+                logger.error(f"Partial evaluation of chunk {chunk.index + 1}/{total} ({', '.join(chunk.files)}) failed: {e}")
+                return None
 
     async def generate_report(self, audit_result: AuditResult, output_path: str):
         """Generates a Markdown report and saves it."""
@@ -211,3 +279,51 @@ class AIAuditService:
             
         return md
 
+
+# Severity used when partial results of the same check item disagree
+STATUS_PRECEDENCE = {"FAIL": 3, "WARNING": 2, "PASS": 1, "UNKNOWN": 0}
+
+
+def merge_partial_results(partials: List[PartialAuditResult], check_ids: List[str]) -> List[CheckResult]:
+    """
+    Combine the per-chunk results into one result per check item without an AI call, with
+    the rule of the reduce prompt: a check item passes if any chunk shows it is fulfilled
+    (a chunk that does not cover it says nothing against it); otherwise the most severe
+    status found applies. Findings and recommendations of all chunks that addressed the item are kept.
+    """
+    grouped: Dict[str, List[CheckResult]] = {check_id: [] for check_id in check_ids}
+    for partial in partials:
+        for result in partial.results:
+            grouped.setdefault(result.check_id, []).append(result)
+
+    merged = []
+    for check_id, results in grouped.items():
+        addressed = [r for r in results if r.status.upper() != "UNKNOWN"]
+        if not addressed:
+            merged.append(CheckResult(
+                check_id=check_id,
+                status="UNKNOWN",
+                findings="In keinem Abschnitt der Dokumente behandelt.",
+                recommendation=None
+            ))
+            continue
+        statuses = [r.status.upper() for r in addressed]
+        status = "PASS" if "PASS" in statuses else max(statuses, key=lambda s: STATUS_PRECEDENCE.get(s, 0))
+        recommendations = list(dict.fromkeys(r.recommendation for r in addressed if r.recommendation))
+        merged.append(CheckResult(
+            check_id=check_id,
+            status=status,
+            findings="\n\n".join(f"[{r.status.upper()}] {r.findings}" for r in addressed),
+            recommendation="\n".join(recommendations) or None
+        ))
+    return merged
+
+
+def overall_status(results: List[CheckResult]) -> str:
+    statuses = {r.status.upper() for r in results}
+    if "FAIL" in statuses:
+        return "FAIL"
+    if statuses & {"WARNING", "UNKNOWN"}:
+        return "NEEDS_IMPROVEMENT"
+    return "PASS"
+
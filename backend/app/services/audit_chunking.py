@@ -0,0 +1,101 @@
+"""
+Splitting extracted documents into token-sized, section-aware chunks for the chunked audit.
+"""
+from dataclasses import dataclass, field
+from typing import List, Tuple
+import re
+
+# Lines that start a new section: Markdown and numbered headings, sheets, slides, archive members
+SECTION_START = re.compile(
+    r"^(#{1,6} \S|\d+(\.\d+)*\.?\s+[A-ZÄÖÜ]|Sheet: |Slide \d+|--- ARCHIVE MEMBER: |[A-ZÄÖÜ][A-ZÄÖÜ0-9 &/\-]{3,}$)"
+)
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for German and English prose)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+@dataclass
+class Chunk:
+    index: int
+    text: str
+    files: List[str] = field(default_factory=list)
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+def split_sections(text: str) -> List[str]:
+    """Split a document at section headings; text before the first heading is a section too."""
+    sections: List[List[str]] = [[]]
+    for line in text.splitlines(keepends=True):
+        if SECTION_START.match(line.strip()) and any(l.strip() for l in sections[-1]):
+            sections.append([])
+        sections[-1].append(line)
+    return ["".join(lines) for lines in sections if "".join(lines).strip()]
+
+
+def split_to_size(section: str, max_chars: int) -> List[str]:
+    """Split a section that does not fit into one chunk: by paragraphs, then lines, then hard."""
+    if len(section) <= max_chars:
+        return [section]
+    for separator in ("\n\n", "\n"):
+        parts = section.split(separator)
+        if len(parts) > 1:
+            pieces: List[str] = []
+            current = ""
+            for part in parts:
+                candidate = current + separator + part if current else part
+                if len(candidate) <= max_chars:
+                    current = candidate
+                    continue
+                if current:
+                    pieces.append(current)
+                current = part
+            if current:
+                pieces.append(current)
+            return [p for piece in pieces for p in split_to_size(piece, max_chars)]
+    return [section[i:i + max_chars] for i in range(0, len(section), max_chars)]
+
+
+def chunk_documents(documents: List[Tuple[str, str]], max_tokens: int) -> List[Chunk]:
+    """
+    Pack (filename, text) documents into chunks of at most `max_tokens` (estimated), cutting only
+    between sections where possible. Small documents share a chunk; every part of a document
+    is introduced by its file header, so each chunk is self-explanatory. Nothing is dropped.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks: List[Chunk] = []
+    parts: List[str] = []
+    files: List[str] = []
+    size = 0
+
+    def flush():
+        nonlocal parts, files, size
+        if parts:
+            chunks.append(Chunk(index=len(chunks), text="".join(parts), files=files))
+        parts, files, size = [], [], 0
+
+    for filename, text in documents:
+        header = f"\n--- FILE: {filename} ---\n\n"
+        continued = f"\n--- FILE: {filename} (Fortsetzung) ---\n\n"
+        room = max(max_chars - len(continued), 1)
+        pieces = [piece for section in split_sections(text) for piece in split_to_size(section, room)]
+        first = True
+        for piece in pieces:
+            needs_header = filename not in files
+            prefix = (header if first else continued) if needs_header else ""
+            if size + len(prefix) + len(piece) > max_chars and parts:
+                flush()
+                prefix = header if first else continued
+            parts.append(prefix + piece)
+            if filename not in files:
+                files.append(filename)
+            size += len(prefix) + len(piece)
+            first = False
+    flush()
+    return chunks
@@ -0,0 +1,322 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.db_models import AuditJobDB
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+DOWNLOADING = "downloading"
+EXTRACTING = "extracting"
+AUDITING = "auditing"
+REPORTING = "reporting"
+NOTIFYING = "notifying"
+DONE = "done"
+FAILED = "failed"
+
+ACTIVE_STATES = (DOWNLOADING, EXTRACTING, AUDITING, REPORTING, NOTIFYING)
+JOB_STATES = (QUEUED,) + ACTIVE_STATES + (DONE, FAILED)
+
+Progress = Callable[[str], Awaitable[None]]
+JobHandler = Callable[[AuditJobDB, Progress], Awaitable[Optional[str]]]
+FailureHandler = Callable[[AuditJobDB, str], Awaitable[None]]
+
+
+def utcnow() -> datetime:
+    # Naive UTC, stored and compared the same way on SQLite and PostgreSQL
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff after the given number of failed attempts."""
+    return min(settings.audit_job_retry_backoff * 2 ** max(attempts - 1, 0), settings.audit_job_retry_backoff_max)
+
+
+class AuditJobQueue:
+    """
+    Audit jobs in the database. Workers claim a job with a lease (compare-and-set UPDATE, so
+    several workers and processes can share the table) and renew it while they work; a job
+    whose lease expires, e.g. because the process died, is claimed again.
+    """
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def enqueue(
+        self,
+        project_id: str,
+        project_title: str,
+        email: str,
+        file_names: List[str],
+        file_hashes: Optional[Dict[str, str]] = None,
+    ) -> AuditJobDB:
+        job = AuditJobDB(
+            id=str(uuid.uuid4()),
+            project_id=project_id,
+            project_title=project_title,
+            email=email,
+            file_names=file_names,
+            file_hashes=file_hashes or {},
+            state=QUEUED,
+            attempts=0,
+            max_attempts=settings.audit_job_max_attempts,
+            run_after=utcnow(),
+        )
+        self.db.add(job)
+        try:
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        return job
+
+    @staticmethod
+    def _claimable(now: datetime):
+        return or_(
+            and_(AuditJobDB.state == QUEUED, AuditJobDB.run_after <= now),
+            and_(AuditJobDB.state.in_(ACTIVE_STATES), AuditJobDB.lease_expires_at < now),
+        )
+
+    async def claim(self, worker_id: str) -> Optional[AuditJobDB]:
+        """Reserve the next due job for `worker_id`, or return None if there is none."""
+        for _ in range(3):
+            now = utcnow()
+            job_id = (await self.db.execute(
+                select(AuditJobDB.id)
+                .where(self._claimable(now))
+                .order_by(AuditJobDB.run_after, AuditJobDB.created_at)
+                .limit(1)
+            )).scalar_one_or_none()
+            if job_id is None:
+                return None
+            result = await self.db.execute(
+                update(AuditJobDB)
+                .where(AuditJobDB.id == job_id, self._claimable(now))
+                .values(
+                    state=DOWNLOADING,
+                    attempts=AuditJobDB.attempts + 1,
+                    lease_owner=worker_id,
+                    lease_expires_at=now + timedelta(seconds=settings.audit_job_lease),
+                )
+            )
+            await self.db.commit()
+            if result.rowcount == 1:
+                return await self.db.get(AuditJobDB, job_id, populate_existing=True)
+            # Another worker was faster, try the next job
+        return None
+
+    async def set_state(self, job_id: str, worker_id: str, state: str) -> bool:
+        """Record progress and renew the lease. False if the job is no longer held by this worker."""
+        result = await self.db.execute(
+            update(AuditJobDB)
+            .where(AuditJobDB.id == job_id, AuditJobDB.lease_owner == worker_id)
+            .values(state=state, lease_expires_at=utcnow() + timedelta(seconds=settings.audit_job_lease))
+        )
+        await self.db.commit()
+        return result.rowcount == 1
+
+    async def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        result = await self.db.execute(
+            update(AuditJobDB)
+            .where(AuditJobDB.id == job_id, AuditJobDB.lease_owner == worker_id)
+            .values(lease_expires_at=utcnow() + timedelta(seconds=settings.audit_job_lease))
+        )
+        await self.db.commit()
+        return result.rowcount == 1
+
+    async def complete(self, job_id: str, worker_id: str, audit_status: Optional[str]):
+        await self.db.execute(
+            update(AuditJobDB)
+            .where(AuditJobDB.id == job_id, AuditJobDB.lease_owner == worker_id)
+            .values(state=DONE, audit_status=audit_status, lease_owner=None, lease_expires_at=None,
+                    last_error=None, finished_at=utcnow())
+        )
+        await self.db.commit()
+
+    async def fail(self, job: AuditJobDB, worker_id: str, error: str) -> bool:
+        """
+        Record a failed attempt: back to the queue with backoff, or failed after the last attempt.
+        Returns True if the job failed for good.
+        """
+        final = job.attempts >= job.max_attempts
+        values = dict(lease_owner=None, lease_expires_at=None, last_error=error[:2000])
+        if final:
+            values.update(state=FAILED, finished_at=utcnow())
+        else:
+            values.update(state=QUEUED, run_after=utcnow() + timedelta(seconds=retry_delay(job.attempts)))
+        await self.db.execute(
+            update(AuditJobDB)
+            .where(AuditJobDB.id == job.id, AuditJobDB.lease_owner == worker_id)
+            .values(**values)
+        )
+        await self.db.commit()
+        return final
+
+    async def release(self, job_id: str, worker_id: str):
+        """Put an interrupted job back (shutdown); the attempt does not count."""
+        await self.db.execute(
+            update(AuditJobDB)
+            .where(AuditJobDB.id == job_id, AuditJobDB.lease_owner == worker_id)
+            .values(state=QUEUED, attempts=AuditJobDB.attempts - 1, run_after=utcnow(),
+                    lease_owner=None, lease_expires_at=None)
+        )
+        await self.db.commit()
+
+    async def get(self, job_id: str) -> Optional[AuditJobDB]:
+        return await self.db.get(AuditJobDB, job_id)
+
+    async def list_jobs(
+        self,
+        state: Optional[str] = None,
+        project_id: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[AuditJobDB]:
+        """Newest first."""
+        query = select(AuditJobDB)
+        if state:
+            query = query.where(AuditJobDB.state == state)
+        if project_id:
+            query = query.where(AuditJobDB.project_id == project_id)
+        query = query.order_by(AuditJobDB.created_at.desc(), AuditJobDB.id.desc()).limit(limit)
+        return list((await self.db.execute(query)).scalars().all())
+
+    async def counts(self) -> Dict[str, int]:
+        result = await self.db.execute(select(AuditJobDB.state, func.count()).group_by(AuditJobDB.state))
+        counts = {state: 0 for state in JOB_STATES}
+        counts.update({state: count for state, count in result.all()})
+        return counts
+
+
+class AuditWorkerPool:
+    """
+    A fixed number of asyncio workers that claim and run audit jobs, so at most `workers`
+    audits run in this process at a time and uploads only pay for an INSERT.
+    """
+    def __init__(self, workers: int, poll_interval: float):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._handler: Optional[JobHandler] = None
+        self._on_failure: Optional[FailureHandler] = None
+        self.running: Dict[str, Tuple[str, str]] = {}  # worker id -> (job id, project id)
+
+    def start(self, handler: JobHandler, on_failure: Optional[FailureHandler] = None):
+        """
+        `handler(job, progress)` runs one attempt and returns the audit status; it raises to
+        fail the attempt. `on_failure(job, error)` is called once a job has failed for good.
+        """
+        self._handler = handler
+        self._on_failure = on_failure
+        self._wakeup = asyncio.Event()
+        for index in range(self.workers):
+            worker_id = f"{self.worker_prefix}:{index}"
+            self._tasks.append(asyncio.create_task(self._run(worker_id), name=f"audit-worker-{index}"))
+        if self.workers:
+            logger.info(f"Started {self.workers} audit workers")
+
+    def notify(self):
+        """Wake idle workers, e.g. right after a job was enqueued."""
+        self._wakeup.set()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, worker_id: str):
+        while True:
+            try:
+                async with SessionLocal() as db:
+                    job = await AuditJobQueue(db).claim(worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Audit worker {worker_id} could not claim a job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._process(worker_id, job)
+
+    async def _process(self, worker_id: str, job: AuditJobDB):
+        if job.attempts > job.max_attempts:
+            # The lease of the last attempt expired: the process died while working on it
+            error = job.last_error or "Worker stopped during the last attempt"
+            try:
+                async with SessionLocal() as db:
+                    await AuditJobQueue(db).fail(job, worker_id, error)
+                if self._on_failure is not None:
+                    await self._on_failure(job, error)
+            except Exception as e:
+                logger.error(f"Could not record failure of audit job {job.id}: {e}")
+            return
+
+        logger.info(f"Audit job {job.id} for project {job.project_id}: attempt {job.attempts}/{job.max_attempts}")
+        self.running[worker_id] = (job.id, job.project_id)
+
+        async def progress(state: str):
+            async with SessionLocal() as db:
+                if not await AuditJobQueue(db).set_state(job.id, worker_id, state):
+                    logger.warning(f"Audit job {job.id} lease lost while entering state {state}")
+
+        heartbeat = asyncio.create_task(self._heartbeat(worker_id, job.id))
+        try:
+            audit_status = await self._handler(job, progress)
+            async with SessionLocal() as db:
+                await AuditJobQueue(db).complete(job.id, worker_id, audit_status)
+            logger.info(f"Audit job {job.id} done: {audit_status}")
+        except asyncio.CancelledError:
+            logger.info(f"Audit job {job.id} interrupted, returning it to the queue")
+            try:
+                async with SessionLocal() as db:
+                    await AuditJobQueue(db).release(job.id, worker_id)
+            except Exception as e:
+                logger.error(f"Could not release audit job {job.id}, it is retried after its lease expires: {e}")
+            raise
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            logger.error(f"Audit job {job.id} attempt {job.attempts} failed: {error}", exc_info=True)
+            try:
+                async with SessionLocal() as db:
+                    final = await AuditJobQueue(db).fail(job, worker_id, error)
+                if final and self._on_failure is not None:
+                    await self._on_failure(job, error)
+            except Exception as report_error:
+                logger.error(f"Could not record failure of audit job {job.id}: {report_error}")
+        finally:
+            heartbeat.cancel()
+            self.running.pop(worker_id, None)
+
+    async def _heartbeat(self, worker_id: str, job_id: str):
+        interval = settings.audit_job_lease / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with SessionLocal() as db:
+                    await AuditJobQueue(db).heartbeat(job_id, worker_id)
+            except Exception as e:
+                logger.warning(f"Audit job {job_id} heartbeat failed: {e}")
+
+
+audit_workers = AuditWorkerPool(
+    workers=settings.audit_workers,
+    poll_interval=settings.audit_job_poll_interval,
+)
@@ -0,0 +1,11 @@
+from .registry import register_extractor as register_extractor
+from .registry import get_extractor as get_extractor
+from .registry import supported_extensions as supported_extensions
+from .registry import current_extractor_keys as current_extractor_keys
+from .cache import ExtractionCache as ExtractionCache
+from .cache import extraction_cache as extraction_cache
+from .ingest import IngestedDocument as IngestedDocument
+from .ingest import IngestError as IngestError
+from .ingest import ingest_upload as ingest_upload
+from .engine import ExtractionEngine as ExtractionEngine
+from .engine import extraction_engine as extraction_engine
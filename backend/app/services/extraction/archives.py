@@ -0,0 +1,80 @@
+"""
+ZIP bundles: the member list is read from the central directory and checked against the
+limits before anything is decompressed; each member is then streamed straight from the
+archive inside a worker process, so the bundle is never unpacked to disk as a whole.
+"""
+from typing import List, Optional
+import hashlib
+import os
+import tempfile
+import zipfile
+
+from app.config import settings
+from app.services.extraction.registry import Extractor, current_extractor_keys
+
+ARCHIVE_EXTENSIONS = ('.zip',)
+ARCHIVE_FORMAT_VERSION = 1
+# Members larger than this are spooled to a temporary file, extractors need random access
+SPOOL_MAX_MEMORY = 16 * 1024 * 1024
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class ArchiveError(Exception):
+    """Raised for archives that exceed the configured limits or cannot be read."""
+
+
+def is_archive(file_path: str) -> bool:
+    return os.path.splitext(file_path)[1].lower() in ARCHIVE_EXTENSIONS
+
+
+def archive_key() -> str:
+    """
+    Cache key of archive extraction; it changes with the version of any member extractor.
+    """
+    extractors = hashlib.sha256(",".join(current_extractor_keys()).encode('utf-8')).hexdigest()[:12]
+    return f"archive@{ARCHIVE_FORMAT_VERSION}+{extractors}"
+
+
+def list_archive_members(path: str) -> List[str]:
+    """
+    Names of the files in a ZIP archive, in archive order. Directories, macOS resource forks
+    and encrypted members are left out. Raises ArchiveError if the archive exceeds the
+    member count, total uncompressed size or compression ratio limits (zip bombs).
+    """
+    try:
+        with zipfile.ZipFile(path) as archive:
+            infos = archive.infolist()
+    except (zipfile.BadZipFile, OSError) as e:
+        raise ArchiveError(f"Cannot read archive: {e}") from e
+
+    members = [
+        info for info in infos
+        if not info.is_dir() and not info.filename.startswith('__MACOSX/') and not info.flag_bits & 0x1
+    ]
+    if len(members) > settings.extraction_zip_max_members:
+        raise ArchiveError(f"Archive has {len(members)} members, the limit is {settings.extraction_zip_max_members}")
+    total = sum(info.file_size for info in members)
+    if total > settings.extraction_zip_max_uncompressed:
+        raise ArchiveError(f"Archive expands to {total} bytes, the limit is {settings.extraction_zip_max_uncompressed}")
+    for info in members:
+        if info.file_size > settings.extraction_zip_max_ratio * max(info.compress_size, 1):
+            raise ArchiveError(f"Member {info.filename} exceeds the compression ratio limit of {settings.extraction_zip_max_ratio}")
+    return [info.filename for info in members]
+
+
+def extract_member(extractor: Extractor, archive_path: str, member_name: str, max_chars: Optional[int]) -> str:
+    """
+    Runs in a worker process: decompress one member into a spooled buffer (bounded memory)
+    and hand it to its extractor. The declared size is enforced while decompressing.
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        info = archive.getinfo(member_name)
+        with archive.open(info) as source, tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as spool:
+            copied = 0
+            for chunk in iter(lambda: source.read(COPY_BUFFER_SIZE), b""):
+                copied += len(chunk)
+                if copied > info.file_size:
+                    raise ArchiveError(f"Member {member_name} is larger than declared")
+                spool.write(chunk)
+            spool.seek(0)
+            return extractor(spool, max_chars)
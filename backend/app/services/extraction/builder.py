@@ -0,0 +1,29 @@
+from typing import List, Optional
+
+
+class TextBuilder:
+    """
+    Collects extracted text in parts (no repeated string concatenation) up to an optional
+    character budget. Extractors stop reading the document once `full` is set.
+    """
+    def __init__(self, max_chars: Optional[int] = None):
+        self.max_chars = max_chars
+        self.parts: List[str] = []
+        self.length = 0
+
+    @property
+    def full(self) -> bool:
+        return self.max_chars is not None and self.length >= self.max_chars
+
+    def append(self, text: str) -> bool:
+        """Add text, cut at the budget. Returns False once the budget is used up."""
+        if self.full:
+            return False
+        if self.max_chars is not None and self.length + len(text) > self.max_chars:
+            text = text[:self.max_chars - self.length]
+        self.parts.append(text)
+        self.length += len(text)
+        return not self.full
+
+    def build(self) -> str:
+        return "".join(self.parts)
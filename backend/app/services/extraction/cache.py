@@ -0,0 +1,204 @@
+from app.config import settings
+from collections import OrderedDict
+from typing import Optional, Dict, List, Tuple
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionCache:
+    """
+    Extracted document text keyed by content SHA-256 and extractor version.
+    Two tiers: an in-memory LRU bounded in characters, and a SQLite file bounded in bytes
+    (least recently used rows are evicted), so results survive restarts. Entries expire
+    `ttl` seconds after they were stored. Blocking; the extraction engine calls it from a thread.
+    Results cut at a character budget are stored as incomplete and only serve requests
+    for at most that many characters.
+    """
+    def __init__(self, path: str, max_bytes: int, memory_max_chars: int, ttl: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_max_chars = memory_max_chars
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # (sha256, extractor) -> (text, complete, created_at)
+        self._memory: "OrderedDict[Tuple[str, str], Tuple[str, bool, float]]" = OrderedDict()
+        self._memory_chars = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS extraction_cache (
+                sha256 TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL,
+                complete INTEGER NOT NULL DEFAULT 1,
+                created_at REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (sha256, extractor)
+            )
+        """)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(extraction_cache)")]
+        if "complete" not in columns:
+            self._conn.execute("ALTER TABLE extraction_cache ADD COLUMN complete INTEGER NOT NULL DEFAULT 1")
+        if "created_at" not in columns:
+            self._conn.execute("ALTER TABLE extraction_cache ADD COLUMN created_at REAL NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE extraction_cache SET created_at = accessed_at")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_extraction_cache_accessed ON extraction_cache (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _serves(text: str, complete: bool, max_chars: Optional[int]) -> bool:
+        return complete or (max_chars is not None and len(text) >= max_chars)
+
+    def get(self, sha256: str, extractor: str, max_chars: Optional[int] = None) -> Optional[str]:
+        """Cached text, cut to `max_chars`; None if there is no entry covering the request."""
+        key = (sha256, extractor)
+        with self._lock:
+            now = time.time()
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[2] > self.ttl:
+                self._memory_chars -= len(self._memory.pop(key)[0])
+                entry = None
+            if entry is not None and self._serves(entry[0], entry[1], max_chars):
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0][:max_chars]
+
+            row = self._conn.execute(
+                "SELECT text, complete, created_at FROM extraction_cache WHERE sha256 = ? AND extractor = ?", key
+            ).fetchone()
+            if row is not None and now - row[2] > self.ttl:
+                self._conn.execute("DELETE FROM extraction_cache WHERE sha256 = ? AND extractor = ?", key)
+                self._conn.commit()
+                row = None
+            if row is None or not self._serves(row[0], bool(row[1]), max_chars):
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE extraction_cache SET accessed_at = ? WHERE sha256 = ? AND extractor = ?",
+                (now, *key)
+            )
+            self._conn.commit()
+            self.disk_hits += 1
+            self._remember(key, row[0], bool(row[1]), row[2])
+            return row[0][:max_chars]
+
+    def put(self, sha256: str, extractor: str, text: str, complete: bool = True):
+        key = (sha256, extractor)
+        size = len(text.encode('utf-8'))
+        with self._lock:
+            now = time.time()
+            if not complete:
+                # Never replace a complete or longer result with a shorter partial one
+                row = self._conn.execute(
+                    "SELECT length(text), complete FROM extraction_cache WHERE sha256 = ? AND extractor = ?", key
+                ).fetchone()
+                if row is not None and (row[1] or row[0] >= len(text)):
+                    return
+            self._remember(key, text, complete, now)
+            if size > self.max_bytes:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extraction_cache (sha256, extractor, text, size, accessed_at, complete, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (sha256, extractor, text, size, now, int(complete), now)
+            )
+            self._evict_disk(now)
+            self._conn.commit()
+
+    def _remember(self, key: Tuple[str, str], text: str, complete: bool, created_at: float):
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_chars -= len(previous[0])
+        if len(text) > self.memory_max_chars:
+            return
+        self._memory[key] = (text, complete, created_at)
+        self._memory_chars += len(text)
+        while self._memory_chars > self.memory_max_chars:
+            _, (evicted, _, _) = self._memory.popitem(last=False)
+            self._memory_chars -= len(evicted)
+
+    def _evict_disk(self, now: float):
+        expired = self._conn.execute(
+            "DELETE FROM extraction_cache WHERE created_at < ?", (now - self.ttl,)
+        ).rowcount
+        if expired:
+            logger.debug(f"Removed {expired} expired entries from the extraction cache")
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM extraction_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        for sha256, extractor, size in self._conn.execute(
+            "SELECT sha256, extractor, size FROM extraction_cache ORDER BY accessed_at"
+        ).fetchall():
+            if total - freed <= self.max_bytes:
+                break
+            self._conn.execute(
+                "DELETE FROM extraction_cache WHERE sha256 = ? AND extractor = ?", (sha256, extractor)
+            )
+            freed += size
+        logger.debug(f"Evicted {freed} bytes from the extraction cache")
+
+    def invalidate(self, sha256: Optional[str] = None, extractor: Optional[str] = None) -> int:
+        """
+        Drop cached results for a document, an extractor (e.g. "extract_pdf@1"), or everything.
+        Returns the number of rows removed from disk.
+        """
+        clauses, params = [], []
+        if sha256:
+            clauses.append("sha256 = ?")
+            params.append(sha256)
+        if extractor:
+            clauses.append("extractor = ?")
+            params.append(extractor)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            for key in [k for k in self._memory if (not sha256 or k[0] == sha256) and (not extractor or k[1] == extractor)]:
+                self._memory_chars -= len(self._memory.pop(key)[0])
+            removed = self._conn.execute(f"DELETE FROM extraction_cache{where}", params).rowcount
+            self._conn.commit()
+        return removed
+
+    def purge_stale(self, current_extractors: List[str]) -> int:
+        """Remove results of extractor versions that are no longer registered."""
+        placeholders = ", ".join("?" for _ in current_extractors)
+        with self._lock:
+            for key in [k for k in self._memory if k[1] not in current_extractors]:
+                self._memory_chars -= len(self._memory.pop(key)[0])
+            removed = self._conn.execute(
+                f"DELETE FROM extraction_cache WHERE extractor NOT IN ({placeholders})", current_extractors
+            ).rowcount
+            self._conn.commit()
+        if removed:
+            logger.info(f"Removed {removed} extraction cache entries of outdated extractors")
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extraction_cache"
+            ).fetchone()
+            return {
+                "entries": entries,
+                "bytes": size,
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+extraction_cache = ExtractionCache(
+    path=settings.extraction_cache_path or os.path.join(settings.data_dir, "extraction_cache.sqlite3"),
+    max_bytes=settings.extraction_cache_max_bytes,
+    memory_max_chars=settings.extraction_cache_memory_chars,
+    ttl=settings.extraction_cache_ttl,
+)
@@ -0,0 +1,403 @@
+from app.config import settings
+from app.services.extraction.registry import (
+    DocumentError, EncryptedDocumentError, Extractor, get_extractor, extractor_key
+)
+from app.services.extraction.cache import ExtractionCache, extraction_cache
+from app.services.extraction.ingest import IngestedDocument, IngestError
+from app.services.extraction.archives import ArchiveError, archive_key, extract_member, is_archive, list_archive_members
+from app.services.extraction.ocr import (
+    extract_pdf_pages, is_image, join_pages, ocr_available, ocr_image, ocr_image_file, ocr_key
+)
+# Registers the built-in extractors, also inside spawned worker processes
+from app.services.extraction import formats, spreadsheets, opendocument  # noqa: F401
+from app.services.extraction.formats import extract_pdf
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker(memory_limit_mb: int):
+    """Cap the address space of a worker so a hostile or broken document cannot exhaust host memory."""
+    if not memory_limit_mb:
+        return
+    try:
+        import resource
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        logging.getLogger(__name__).warning(f"Could not set extraction memory limit: {e}")
+
+
+def _sha256_file(file_path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _extract_in_worker(extractor: Extractor, source: Union[str, bytes], max_chars: Optional[int]) -> str:
+    return extractor(io.BytesIO(source) if isinstance(source, bytes) else source, max_chars)
+
+
+def fair_shares(lengths: List[int], total: int) -> List[int]:
+    """
+    Max-min fair split of `total` characters: the shortest texts are served first and keep
+    their full length, the rest share what is left equally.
+    """
+    shares = [0] * len(lengths)
+    remaining = total
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    for position, i in enumerate(order):
+        shares[i] = min(lengths[i], remaining // (len(order) - position))
+        remaining -= shares[i]
+    return shares
+
+
+class _TrackingContext:
+    """
+    Spawn context that keeps a handle on every worker process it starts, so the workers
+    of a pool (including hung ones) can be terminated without reaching into the executor.
+    """
+    def __init__(self):
+        self._context = multiprocessing.get_context("spawn")
+        self.processes: List[multiprocessing.process.BaseProcess] = []
+
+    def Process(self, *args, **kwargs):
+        process = self._context.Process(*args, **kwargs)
+        self.processes.append(process)
+        return process
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._context, name)
+
+
+class WorkerPool:
+    """
+    Bounded process pool with a timeout per task. Tasks waiting for a free worker are
+    queued outside the pool, so the timeout only covers actual work; a worker that hangs
+    is killed by recycling the pool.
+    """
+    def __init__(self, max_workers: Optional[int], timeout: float, memory_limit_mb: int):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._contexts: Dict[ProcessPoolExecutor, _TrackingContext] = {}
+        self._slots = asyncio.Semaphore(max_workers or os.cpu_count() or 1)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            context = _TrackingContext()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.memory_limit_mb,),
+            )
+            self._contexts[self._executor] = context
+        return self._executor
+
+    def _recycle(self, executor: ProcessPoolExecutor):
+        """Terminate the workers of a pool (including hung ones) and start a fresh pool on next use."""
+        if self._executor is executor:
+            self._executor = None
+        context = self._contexts.pop(executor, None)
+        for process in context.processes if context else []:
+            if process.is_alive():
+                process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, label: str, func: Callable[..., Any], *args, default: Any = "") -> Any:
+        """
+        Run `func(*args)` in a worker; `label` names the document in log messages.
+        Returns `default` if the task fails, times out or its worker dies. A DocumentError
+        (the document itself is unreadable) is raised to the caller.
+        """
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            for attempt in range(2):
+                executor = self._get_executor()
+                try:
+                    future = loop.run_in_executor(executor, func, *args)
+                    return await asyncio.wait_for(future, timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    logger.error(f"Text extraction from {label} timed out after {self.timeout}s")
+                    self._recycle(executor)
+                    return default
+                except BrokenProcessPool:
+                    if executor is not self._executor and attempt == 0:
+                        # The pool was recycled because of another task; try once more on the new pool
+                        continue
+                    logger.error(f"Extraction worker died while processing {label}")
+                    self._recycle(executor)
+                    return default
+                except DocumentError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error extracting text from {label}: {e}")
+                    return default
+            return default
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._contexts.pop(self._executor, None)
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class ExtractionEngine:
+    """
+    Runs the registered text extractors in a bounded process pool, so parsing uses all
+    cores without blocking the event loop. Failed extractions return an empty string.
+    With a cache, documents whose content was extracted before are not parsed again.
+    ZIP archives are fanned out: each supported member is extracted by its own worker.
+    With OCR workers, images and PDF pages without a text layer are recognized in a
+    separate pool, page by page in parallel.
+    """
+    def __init__(
+        self,
+        max_workers: Optional[int],
+        timeout: float,
+        memory_limit_mb: int,
+        cache: Optional[ExtractionCache] = None,
+        ocr_workers: int = 0,
+        ocr_timeout: float = 60.0
+    ):
+        self.pool = WorkerPool(max_workers, timeout, memory_limit_mb)
+        self.cache = cache
+        self.ocr_workers = ocr_workers
+        self.ocr_timeout = ocr_timeout
+        self._ocr_pool: Optional[WorkerPool] = None
+        self._ocr_checked = False
+
+    @property
+    def ocr_pool(self) -> Optional[WorkerPool]:
+        """The OCR pool, or None if OCR is disabled or Tesseract is not installed (checked once)."""
+        if self.ocr_workers and not self._ocr_checked:
+            self._ocr_checked = True
+            if ocr_available():
+                self._ocr_pool = WorkerPool(self.ocr_workers, self.ocr_timeout, self.pool.memory_limit_mb)
+        return self._ocr_pool
+
+    async def extract(
+        self,
+        file_path: str,
+        sha256: Optional[str] = None,
+        max_chars: Optional[int] = None,
+        content: Optional[bytes] = None,
+        raise_unreadable: bool = False
+    ) -> str:
+        """
+        Extract the text of a local file, at most `max_chars` characters (parsing stops there).
+        `sha256` is the content hash if the caller already knows it; otherwise it is computed
+        for the cache lookup. With `content`, the document is read from memory and `file_path`
+        only names it (not supported for archives). A document that cannot be read at all
+        (e.g. an encrypted PDF) gives an empty string, or raises DocumentError with `raise_unreadable`.
+        """
+        filename = os.path.basename(file_path)
+        archive = is_archive(file_path)
+        extractor = None if archive else get_extractor(file_path)
+        ocr_pool = self.ocr_pool if (is_image(file_path) or extractor is extract_pdf) else None
+        if not archive and extractor is None and ocr_pool is None:
+            logger.warning(f"Unsupported file type for text extraction: {os.path.splitext(file_path)[1].lower()}")
+            return ""
+
+        if archive:
+            key = archive_key()
+        elif ocr_pool is not None:
+            key = f"{extractor_key(extractor) if extractor else 'image'}+{ocr_key(settings.ocr_languages)}"
+        else:
+            key = extractor_key(extractor)
+        if self.cache is not None:
+            if sha256 is None:
+                sha256 = hashlib.sha256(content).hexdigest() if content is not None else await asyncio.to_thread(_sha256_file, file_path)
+            text = await asyncio.to_thread(self.cache.get, sha256, key, max_chars)
+            if text is not None:
+                logger.debug(f"Reusing extracted text for {filename} ({sha256[:12]})")
+                return text
+
+        source = content if content is not None else file_path
+        if archive:
+            text, complete = await self._extract_archive(file_path, max_chars)
+        else:
+            try:
+                if ocr_pool is None:
+                    text = await self.pool.run(filename, _extract_in_worker, extractor, source, max_chars)
+                elif extractor is None:
+                    # Image upload
+                    if content is not None:
+                        text = await ocr_pool.run(filename, ocr_image, content, settings.ocr_languages)
+                    else:
+                        text = await ocr_pool.run(filename, ocr_image_file, file_path, settings.ocr_languages)
+                    text = text[:max_chars] if max_chars is not None else text
+                else:
+                    text = await self._extract_pdf_with_ocr(filename, source, max_chars, ocr_pool)
+            except DocumentError as e:
+                if raise_unreadable:
+                    raise
+                logger.warning(f"Cannot read {filename}: {e}")
+                return ""
+            complete = max_chars is None or len(text) < max_chars
+
+        # Failures (empty text) are not cached, they may be transient
+        if text and self.cache is not None:
+            await asyncio.to_thread(self.cache.put, sha256, key, text, complete)
+        return text
+
+    async def _extract_archive(self, file_path: str, max_chars: Optional[int]) -> Tuple[str, bool]:
+        """
+        Extract the supported members of a ZIP archive in parallel, sharing the budget between
+        them. Returns the text with one section per member, and whether nothing was cut.
+        """
+        filename = os.path.basename(file_path)
+        try:
+            names = await asyncio.to_thread(list_archive_members, file_path)
+        except ArchiveError as e:
+            logger.error(f"Rejected archive {filename}: {e}")
+            return "", True
+
+        members = [(name, get_extractor(name)) for name in names]
+        skipped = [name for name, extractor in members if extractor is None]
+        if skipped:
+            logger.info(f"Skipping {len(skipped)} unsupported members of {filename}: {', '.join(skipped[:10])}")
+        members = [(name, extractor) for name, extractor in members if extractor is not None]
+        if not members:
+            return "", True
+
+        async def extract_one(index: int, budget: Optional[int]) -> str:
+            name, extractor = members[index]
+            try:
+                return await self.pool.run(f"{filename}/{name}", extract_member, extractor, file_path, name, budget)
+            except DocumentError as e:
+                logger.warning(f"Cannot read {filename}/{name}: {e}")
+                return ""
+
+        texts, complete = await self._share_budget(len(members), extract_one, max_chars)
+        if not any(texts):
+            return "", complete
+        sections = []
+        for (name, _), text in zip(members, texts):
+            if text:
+                sections.append(f"\n\n--- ARCHIVE MEMBER: {name} ---\n\n{text}")
+            else:
+                sections.append(f"\n\n--- ARCHIVE MEMBER: {name} (Text extraction failed or empty) ---\n\n")
+        logger.info(f"Extracted {len(members)} members of {filename}")
+        return "".join(sections), complete
+
+    async def _extract_pdf_with_ocr(
+        self,
+        filename: str,
+        source: Union[str, bytes],
+        max_chars: Optional[int],
+        ocr_pool: WorkerPool
+    ) -> str:
+        """
+        Read the text layer of a PDF, then recognize up to `ocr_max_pages` pages without one,
+        in parallel in the OCR pool.
+        """
+        result = await self.pool.run(
+            filename, extract_pdf_pages, source, max_chars, settings.ocr_max_pages, default=None
+        )
+        if result is None:
+            return ""
+        pages, scans = result
+        if scans:
+            logger.info(f"Running OCR on {len(scans)} scanned pages of {filename}")
+            texts = await asyncio.gather(*(
+                ocr_pool.run(f"{filename} page {index + 1}", ocr_image, image, settings.ocr_languages)
+                for index, image in scans.items()
+            ))
+            for index, text in zip(scans, texts):
+                pages[index] = text + "\n" if text.strip() else ""
+        return join_pages(pages, max_chars)
+
+    @staticmethod
+    async def _share_budget(
+        count: int,
+        extract_one: Callable[[int, Optional[int]], Awaitable[str]],
+        max_chars: Optional[int]
+    ) -> Tuple[List[str], bool]:
+        """
+        Run `extract_one(index, budget)` for `count` documents in parallel, sharing `max_chars`
+        fairly: short documents keep all their text, and what they leave unused is split equally
+        among the longer ones. Every document is parsed once, up to the whole budget (no single
+        document can use more), and the shares are computed from the lengths of the results.
+        Returns the texts and whether none was cut.
+        """
+        if max_chars is None:
+            return list(await asyncio.gather(*(extract_one(i, None) for i in range(count)))), True
+
+        texts = list(await asyncio.gather(*(extract_one(i, max_chars) for i in range(count))))
+        shares = fair_shares([len(text) for text in texts], max_chars)
+        # A text as long as the budget was cut by its extractor
+        complete = all(len(text) < max_chars and len(text) <= share for text, share in zip(texts, shares))
+        return [text[:share] for text, share in zip(texts, shares)], complete
+
+    async def extract_many(
+        self,
+        file_paths: List[str],
+        hashes: Optional[List[Optional[str]]] = None,
+        max_chars: Optional[int] = None
+    ) -> List[str]:
+        """
+        Extract several files in parallel; results are in the order of `file_paths`.
+        A total `max_chars` budget is shared fairly between the files.
+        """
+        hashes = list(hashes or [None] * len(file_paths))
+        if not file_paths:
+            return []
+        texts, _ = await self._share_budget(
+            len(file_paths),
+            lambda i, budget: self.extract(file_paths[i], hashes[i], budget),
+            max_chars
+        )
+        return texts
+
+    async def extract_documents(self, documents: List[IngestedDocument], max_chars: Optional[int] = None) -> List[str]:
+        """
+        Like extract_many, for ingested uploads (in memory or spooled). Raises IngestError for
+        uploads that cannot be read at all, e.g. encrypted or corrupted PDFs; this is detected
+        by the parse that extracts the text.
+        """
+        async def extract_one(index: int, budget: Optional[int]) -> str:
+            document = documents[index]
+            try:
+                return await self.extract(
+                    document.path or document.filename,
+                    document.sha256,
+                    budget,
+                    content=document.content,
+                    raise_unreadable=True
+                )
+            except EncryptedDocumentError:
+                raise IngestError(400, f"File {document.filename} is encrypted. Please provide an unencrypted PDF.")
+            except DocumentError as e:
+                logger.warning(f"Failed to read {document.filename}: {e}")
+                raise IngestError(400, f"File {document.filename} appears to be corrupted or invalid.")
+
+        texts, _ = await self._share_budget(len(documents), extract_one, max_chars)
+        return texts
+
+    def shutdown(self):
+        self.pool.shutdown()
+        if self._ocr_pool is not None:
+            self._ocr_pool.shutdown()
+
+
+extraction_engine = ExtractionEngine(
+    max_workers=settings.extraction_workers,
+    timeout=settings.extraction_timeout,
+    memory_limit_mb=settings.extraction_memory_limit_mb,
+    cache=extraction_cache,
+    ocr_workers=settings.ocr_workers if settings.ocr_enabled else 0,
+    ocr_timeout=settings.ocr_timeout,
+)
@@ -0,0 +1,59 @@
+"""
+Built-in extractors for the formats accepted by the upload endpoints
+(spreadsheets are in `spreadsheets`, ODF text and presentations in `opendocument`).
+Each takes an optional character budget and stops reading the document once it is used up.
+"""
+from typing import Optional
+import io
+
+import pypdf
+import docx
+
+from app.services.extraction.builder import TextBuilder
+from app.services.extraction.registry import (
+    CorruptDocumentError, EncryptedDocumentError, Source, open_source, register_extractor
+)
+
+def open_pdf(f) -> pypdf.PdfReader:
+    """
+    Parse the trailer and cross-reference tables of a PDF. Raises EncryptedDocumentError
+    for encrypted and CorruptDocumentError for unreadable files.
+    """
+    try:
+        reader = pypdf.PdfReader(f)
+        encrypted = reader.is_encrypted
+    except Exception as e:
+        raise CorruptDocumentError(str(e)) from e
+    if encrypted:
+        raise EncryptedDocumentError("PDF is encrypted")
+    return reader
+
+@register_extractor('.pdf')
+def extract_pdf(source: Source, max_chars: Optional[int] = None) -> str:
+    # Pages are parsed lazily, so pages after the budget is reached are never decoded
+    builder = TextBuilder(max_chars)
+    with open_source(source) as f:
+        reader = open_pdf(f)
+        for page in reader.pages:
+            if not builder.append(page.extract_text() + "\n"):
+                break
+    return builder.build()
+
+@register_extractor('.docx', '.doc')
+def extract_docx(source: Source, max_chars: Optional[int] = None) -> str:
+    doc = docx.Document(source)
+    builder = TextBuilder(max_chars)
+    for i, p in enumerate(doc.paragraphs):
+        if not builder.append(("\n" if i else "") + p.text):
+            break
+    return builder.build()
+
+@register_extractor('.txt', '.md')
+def extract_plain_text(source: Source, max_chars: Optional[int] = None) -> str:
+    with open_source(source) as raw:
+        f = io.TextIOWrapper(raw, encoding='utf-8', errors='ignore')
+        try:
+            return f.read(max_chars) if max_chars is not None else f.read()
+        finally:
+            # Leave a caller-owned file object open
+            f.detach()
@@ -0,0 +1,126 @@
+"""
+Single-pass ingestion of uploaded documents for extraction: each upload is read once,
+while its size, extension and magic bytes are checked and its SHA-256 is computed
+(encrypted or corrupted PDFs are rejected by the extraction parse). Small files stay
+in memory; larger ones and archives are spooled to a temporary file, since worker
+processes need a path to read them.
+"""
+from dataclasses import dataclass
+from typing import Optional
+import asyncio
+import hashlib
+import os
+import tempfile
+import logging
+
+from fastapi import UploadFile
+
+from app.config import settings
+from app.services.extraction.archives import is_archive
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+ZIP_MAGIC = (b"PK\x03\x04", b"PK\x05\x06")
+
+# Extension -> accepted file signatures. Encrypted OOXML documents are OLE containers,
+# so they fail the ZIP signature check of .docx/.xlsx.
+MAGIC_NUMBERS = {
+    '.pdf': (b"%PDF-",),
+    '.docx': ZIP_MAGIC,
+    '.xlsx': ZIP_MAGIC,
+    '.odt': ZIP_MAGIC,
+    '.ods': ZIP_MAGIC,
+    '.odp': ZIP_MAGIC,
+    '.zip': ZIP_MAGIC,
+    '.doc': (OLE_MAGIC,),
+    '.xls': (OLE_MAGIC,),
+    '.png': (b"\x89PNG\r\n\x1a\n",),
+    '.jpg': (b"\xff\xd8\xff",),
+    '.jpeg': (b"\xff\xd8\xff",),
+}
+
+
+class IngestError(Exception):
+    """
+    Raised for uploads that are rejected; `status_code` is the HTTP status to answer with.
+    """
+    def __init__(self, status_code: int, message: str):
+        self.status_code = status_code
+        super().__init__(message)
+
+
+@dataclass
+class IngestedDocument:
+    filename: str
+    size: int
+    sha256: str
+    content: Optional[bytes] = None  # small files
+    path: Optional[str] = None  # spooled larger files and archives
+
+    def cleanup(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _check_signature(filename: str, ext: str, head: bytes):
+    signatures = MAGIC_NUMBERS.get(ext)
+    if signatures is None:
+        return
+    # PDF readers accept up to 1 KB of garbage before the header
+    window = head[:1024] if ext == '.pdf' else head[:8]
+    if not any((sig in window) if ext == '.pdf' else window.startswith(sig) for sig in signatures):
+        if ext in ('.docx', '.xlsx') and head.startswith(OLE_MAGIC):
+            raise IngestError(400, f"File {filename} is encrypted. Please provide an unencrypted document.")
+        raise IngestError(400, f"File {filename} is not a valid {ext} file.")
+
+
+async def ingest_upload(file: UploadFile) -> IngestedDocument:
+    """
+    Read an upload once and return it ready for extraction. Raises IngestError if it is rejected.
+    """
+    filename = os.path.basename(file.filename or "")
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in settings.allowed_file_types:
+        raise IngestError(400, f"File type {ext} not allowed.")
+
+    sha256 = hashlib.sha256()
+    size = 0
+    buffer = bytearray()
+    spool = None
+    try:
+        while True:
+            chunk = await file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > settings.max_file_size:
+                raise IngestError(400, f"File {filename} exceeds size limit.")
+            if size == len(chunk):
+                # First chunk: reject mismatching content before reading the rest
+                _check_signature(filename, ext, chunk[:1024])
+            sha256.update(chunk)
+
+            if spool is None:
+                buffer.extend(chunk)
+                if is_archive(filename) or len(buffer) > settings.extraction_spool_max_memory:
+                    spool = tempfile.NamedTemporaryFile(prefix="upload_", suffix=ext, delete=False)
+                    await asyncio.to_thread(spool.write, buffer)
+                    buffer = bytearray()
+            else:
+                await asyncio.to_thread(spool.write, chunk)
+
+        if size == 0:
+            raise IngestError(400, f"File {filename} is empty.")
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.remove(spool.name)
+        raise
+
+    if spool is not None:
+        spool.close()
+        return IngestedDocument(filename=filename, size=size, sha256=sha256.hexdigest(), path=spool.name)
+    return IngestedDocument(filename=filename, size=size, sha256=sha256.hexdigest(), content=bytes(buffer))
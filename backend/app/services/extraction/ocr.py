@@ -0,0 +1,95 @@
+"""
+Optional OCR for scanned documents, using a locally installed Tesseract via pytesseract.
+Only pages without a text layer and image uploads are recognized. The functions below
+run in worker processes; the engine dispatches them to a separate OCR pool.
+"""
+from typing import Dict, List, Optional, Tuple, Union
+import io
+import os
+import logging
+
+from app.services.extraction.builder import TextBuilder
+from app.services.extraction.formats import open_pdf
+from app.services.extraction.registry import open_source
+
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:  # OCR is optional
+    pytesseract = None
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+OCR_VERSION = 1
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def ocr_available() -> bool:
+    """True if pytesseract, Pillow and the tesseract binary are installed."""
+    if pytesseract is None:
+        logger.warning("OCR is enabled but pytesseract/Pillow are not installed")
+        return False
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        logger.warning(f"OCR is enabled but tesseract is not available: {e}")
+        return False
+    return True
+
+
+def ocr_key(languages: str) -> str:
+    return f"ocr@{OCR_VERSION}:{languages}"
+
+
+def is_image(file_path: str) -> bool:
+    return os.path.splitext(file_path)[1].lower() in IMAGE_EXTENSIONS
+
+
+def ocr_image(image: bytes, languages: str) -> str:
+    """Recognize the text of an encoded image (PNG, JPEG, ...)."""
+    with Image.open(io.BytesIO(image)) as img:
+        return pytesseract.image_to_string(img, lang=languages)
+
+
+def ocr_image_file(path: str, languages: str) -> str:
+    with open(path, 'rb') as f:
+        return ocr_image(f.read(), languages)
+
+
+def extract_pdf_pages(source: Union[str, bytes], max_chars: Optional[int], max_scans: int) -> Tuple[List[str], Dict[int, bytes]]:
+    """
+    Page texts of a PDF plus, for up to `max_scans` pages without a text layer, the largest
+    embedded image (a scanned page usually is one full-page image). Stops reading pages once
+    the text found so far fills `max_chars`.
+    """
+    pages: List[str] = []
+    scans: Dict[int, bytes] = {}
+    builder = TextBuilder(max_chars)
+    with open_source(io.BytesIO(source) if isinstance(source, bytes) else source) as f:
+        reader = open_pdf(f)
+        for index, page in enumerate(reader.pages):
+            text = page.extract_text() or ""
+            if text.strip():
+                pages.append(text + "\n")
+                if not builder.append(text + "\n"):
+                    break
+                continue
+            pages.append("")
+            if len(scans) < max_scans:
+                try:
+                    images = list(page.images)
+                except Exception as e:
+                    logger.debug(f"Could not read images of page {index + 1}: {e}")
+                    images = []
+                if images:
+                    scans[index] = max(images, key=lambda image: len(image.data)).data
+    return pages, scans
+
+
+def join_pages(pages: List[str], max_chars: Optional[int]) -> str:
+    builder = TextBuilder(max_chars)
+    for page in pages:
+        if not builder.append(page):
+            break
+    return builder.build()
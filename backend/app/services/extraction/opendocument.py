@@ -0,0 +1,121 @@
+"""
+Streaming text extraction for ODF text documents and presentations (.odt, .odp).
+content.xml is read straight from the zip container with an incremental parser in one pass:
+paragraphs, headings (as Markdown headings), list items, table rows and presentation pages.
+Finished blocks are detached from the tree, so memory stays bounded.
+"""
+from typing import List, Optional
+import xml.etree.ElementTree as ET
+import zipfile
+
+from app.config import settings
+from app.services.extraction.builder import TextBuilder
+from app.services.extraction.registry import Source, register_extractor
+from app.services.extraction.spreadsheets import compact_row
+
+TEXT_NS = "urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+TABLE_NS = "urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+DRAW_NS = "urn:oasis:names:tc:opendocument:xmlns:drawing:1.0"
+OFFICE_NS = "urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+
+PARAGRAPH = f"{{{TEXT_NS}}}p"
+HEADING = f"{{{TEXT_NS}}}h"
+HEADING_LEVEL = f"{{{TEXT_NS}}}outline-level"
+SPACE = f"{{{TEXT_NS}}}s"
+SPACE_COUNT = f"{{{TEXT_NS}}}c"
+TAB = f"{{{TEXT_NS}}}tab"
+LINE_BREAK = f"{{{TEXT_NS}}}line-break"
+NOTE = f"{{{TEXT_NS}}}note"
+TRACKED_CHANGES = f"{{{TEXT_NS}}}tracked-changes"
+TABLE_ROW = f"{{{TABLE_NS}}}table-row"
+TABLE_CELL = f"{{{TABLE_NS}}}table-cell"
+COVERED_CELL = f"{{{TABLE_NS}}}covered-table-cell"
+COLUMNS_REPEATED = f"{{{TABLE_NS}}}number-columns-repeated"
+PAGE = f"{{{DRAW_NS}}}page"
+PAGE_NAME = f"{{{DRAW_NS}}}name"
+ANNOTATION = f"{{{OFFICE_NS}}}annotation"
+
+# Content that is not part of the visible document text
+SKIPPED = (TRACKED_CHANGES, ANNOTATION)
+# Blocks whose text is complete at their end event and which can be dropped from the tree
+BLOCKS = (PARAGRAPH, HEADING, TABLE_ROW, PAGE)
+
+
+def _inline_text(elem: ET.Element) -> str:
+    """Text of a paragraph including spans and links; footnote bodies are emitted on their own."""
+    parts = [elem.text or ""]
+    for child in elem:
+        if child.tag == SPACE:
+            parts.append(" " * int(child.get(SPACE_COUNT, "1")))
+        elif child.tag == TAB:
+            parts.append("\t")
+        elif child.tag == LINE_BREAK:
+            parts.append("\n")
+        elif child.tag not in (NOTE,) + SKIPPED:
+            parts.append(_inline_text(child))
+        parts.append(child.tail or "")
+    return "".join(parts)
+
+
+@register_extractor('.odt', '.odp', version=2)
+def extract_odf_text(source: Source, max_chars: Optional[int] = None) -> str:
+    builder = TextBuilder(max_chars)
+    stack: List[ET.Element] = []
+    skip_depth = 0
+    rows: List[List[str]] = []  # cells of the open table rows (tables can be nested)
+    cells: List[List[str]] = []  # paragraphs of the open table cells
+    pages = 0
+
+    with zipfile.ZipFile(source) as archive, archive.open("content.xml") as content:
+        for event, elem in ET.iterparse(content, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                stack.append(elem)
+                if tag in SKIPPED:
+                    skip_depth += 1
+                elif skip_depth:
+                    continue
+                elif tag == TABLE_ROW:
+                    rows.append([])
+                elif tag in (TABLE_CELL, COVERED_CELL):
+                    cells.append([])
+                elif tag == PAGE:
+                    pages += 1
+                    if not builder.append(f"\nSlide {pages}: {elem.get(PAGE_NAME, '')}\n"):
+                        break
+                continue
+
+            stack.pop()
+            if tag in SKIPPED:
+                skip_depth -= 1
+            elif skip_depth:
+                continue
+            elif tag in (PARAGRAPH, HEADING):
+                text = _inline_text(elem).strip()
+                if cells:
+                    if text:
+                        cells[-1].append(text)
+                elif text:
+                    if tag == HEADING:
+                        text = "#" * min(int(elem.get(HEADING_LEVEL, "1")), 6) + " " + text
+                    if not builder.append(text + "\n"):
+                        break
+            elif tag in (TABLE_CELL, COVERED_CELL):
+                text = " ".join(cells.pop())
+                repeat = min(int(elem.get(COLUMNS_REPEATED, "1")), settings.extraction_sheet_max_cells)
+                if rows and (text or repeat == 1):
+                    rows[-1].extend([text] * (repeat if text else 1))
+            elif tag == TABLE_ROW:
+                row_text = compact_row(rows.pop())
+                if row_text:
+                    if cells:
+                        # Nested table: the row becomes a paragraph of the outer cell
+                        cells[-1].append(row_text)
+                    elif not builder.append(row_text + "\n"):
+                        break
+
+            if tag in BLOCKS:
+                elem.clear()
+                if stack:
+                    stack[-1].remove(elem)
+    return builder.build()
@@ -0,0 +1,57 @@
+import os
+from contextlib import nullcontext
+from typing import BinaryIO, Callable, ContextManager, Dict, List, Optional, Union
+
+# A local file path or a seekable binary file object (e.g. a member of a ZIP archive)
+Source = Union[str, BinaryIO]
+
+# Extractor: (source, optional character budget) -> extracted plain text
+Extractor = Callable[[Source, Optional[int]], str]
+
+_EXTRACTORS: Dict[str, Extractor] = {}
+
+
+class DocumentError(Exception):
+    """Raised by an extractor for a document that cannot be read at all."""
+
+
+class EncryptedDocumentError(DocumentError):
+    pass
+
+
+class CorruptDocumentError(DocumentError):
+    pass
+
+
+def register_extractor(*extensions: str, version: int = 1):
+    """
+    Decorator registering a text extractor for one or more file extensions (e.g. ".pdf").
+    Extractors are pickled by reference to run in worker processes, so they must be module-level functions.
+    An extractor receives a Source and an optional character budget (None for all text)
+    and should stop parsing once the budget is used up.
+    Bump `version` whenever the output of an extractor changes, so cached results are not reused.
+    """
+    def decorator(func: Extractor) -> Extractor:
+        func.extractor_version = version
+        for ext in extensions:
+            _EXTRACTORS[ext.lower()] = func
+        return func
+    return decorator
+
+def open_source(source: Source) -> ContextManager[BinaryIO]:
+    """Open a path for binary reading; file objects are passed through (and left open)."""
+    return open(source, 'rb') if isinstance(source, str) else nullcontext(source)
+
+def get_extractor(file_path: str) -> Optional[Extractor]:
+    ext = os.path.splitext(file_path)[1].lower()
+    return _EXTRACTORS.get(ext)
+
+def extractor_key(extractor: Extractor) -> str:
+    """Identifies an extractor and its version, e.g. "extract_pdf@1"."""
+    return f"{extractor.__name__}@{getattr(extractor, 'extractor_version', 1)}"
+
+def current_extractor_keys() -> List[str]:
+    return sorted({extractor_key(func) for func in _EXTRACTORS.values()})
+
+def supported_extensions() -> List[str]:
+    return sorted(_EXTRACTORS)
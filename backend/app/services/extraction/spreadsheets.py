@@ -0,0 +1,150 @@
+"""
+Streaming spreadsheet extractors. Workbooks are read row by row (openpyxl read-only mode,
+iterparse over the ODF content.xml), so memory stays bounded regardless of workbook size.
+Per sheet, at most `extraction_sheet_max_rows` non-empty rows are emitted and at most
+`extraction_sheet_max_cells` cells are read; empty rows are skipped.
+"""
+from datetime import date, datetime, time
+from typing import Iterable, Iterator, List, Optional, Tuple
+import xml.etree.ElementTree as ET
+import zipfile
+
+import openpyxl
+
+from app.config import settings
+from app.services.extraction.builder import TextBuilder
+from app.services.extraction.registry import Source, register_extractor
+
+TABLE_NS = "urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+TEXT_NS = "urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+
+ODS_TABLE = f"{{{TABLE_NS}}}table"
+ODS_ROW = f"{{{TABLE_NS}}}table-row"
+ODS_CELL = f"{{{TABLE_NS}}}table-cell"
+ODS_COVERED_CELL = f"{{{TABLE_NS}}}covered-table-cell"
+ODS_NAME = f"{{{TABLE_NS}}}name"
+ODS_ROWS_REPEATED = f"{{{TABLE_NS}}}number-rows-repeated"
+ODS_COLUMNS_REPEATED = f"{{{TABLE_NS}}}number-columns-repeated"
+ODS_PARAGRAPH = f"{{{TEXT_NS}}}p"
+
+
+def cell_text(value) -> str:
+    """Compact text for a cell value: no trailing ".0" on whole numbers, ISO dates."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == time(0) else value.isoformat(sep=" ")
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return str(value).strip()
+
+
+def compact_row(values: Iterable[str]) -> str:
+    """Join cells with " | ", dropping trailing empty cells; "" for an empty row."""
+    cells = list(values)
+    while cells and not cells[-1]:
+        cells.pop()
+    return " | ".join(cells)
+
+
+def write_sheets(sheets: Iterator[Tuple[str, Iterator[Tuple[List[str], int]]]], max_chars: Optional[int]) -> str:
+    """
+    Serialize (sheet name, rows) pairs within the row and cell budgets.
+    Each row is (cell texts, cells read to produce them).
+    """
+    builder = TextBuilder(max_chars)
+    for name, rows in sheets:
+        if not builder.append(f"\nSheet: {name}\n"):
+            break
+        emitted = 0
+        cells_read = 0
+        for cells, read in rows:
+            cells_read += read
+            if cells_read > settings.extraction_sheet_max_cells or emitted >= settings.extraction_sheet_max_rows:
+                builder.append("[... remaining rows of this sheet skipped]\n")
+                break
+            row_text = compact_row(cells)
+            if not row_text:
+                continue
+            emitted += 1
+            if not builder.append(row_text + "\n"):
+                break
+        if builder.full:
+            break
+    return builder.build()
+
+
+@register_extractor('.xlsx', '.xls', version=2)
+def extract_excel(source: Source, max_chars: Optional[int] = None) -> str:
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        def rows(ws):
+            for row in ws.iter_rows(values_only=True):
+                yield [cell_text(value) for value in row], len(row)
+
+        return write_sheets(((ws.title, rows(ws)) for ws in wb.worksheets), max_chars)
+    finally:
+        # Read-only workbooks keep the archive open until closed
+        wb.close()
+
+
+def _ods_sheets(content) -> Iterator[Tuple[str, Iterator[Tuple[List[str], int]]]]:
+    """
+    Stream the tables of an ODS content.xml. Finished rows are detached from the tree,
+    and runs of repeated empty cells or rows are never materialized.
+    """
+    events = ET.iterparse(content, events=("start", "end"))
+    stack = []
+
+    def rows() -> Iterator[Tuple[List[str], int]]:
+        cells: List[str] = []
+        pending_empty = 0
+        for event, elem in events:
+            if event == "start":
+                stack.append(elem)
+                continue
+            stack.pop()
+            if elem.tag in (ODS_CELL, ODS_COVERED_CELL):
+                text = "\n".join("".join(p.itertext()) for p in elem.iter(ODS_PARAGRAPH)).strip()
+                repeat = int(elem.get(ODS_COLUMNS_REPEATED, "1"))
+                if text:
+                    cells.extend([""] * pending_empty)
+                    cells.extend([text] * min(repeat, settings.extraction_sheet_max_cells))
+                    pending_empty = 0
+                else:
+                    pending_empty += repeat
+                elem.clear()
+            elif elem.tag == ODS_ROW:
+                repeat = int(elem.get(ODS_ROWS_REPEATED, "1"))
+                if cells:
+                    for _ in range(min(repeat, settings.extraction_sheet_max_rows)):
+                        yield cells, len(cells)
+                else:
+                    yield [], 0
+                cells, pending_empty = [], 0
+                elem.clear()
+                if stack:
+                    stack[-1].remove(elem)
+            elif elem.tag == ODS_TABLE:
+                elem.clear()
+                return
+
+    for event, elem in events:
+        if event == "start":
+            stack.append(elem)
+            if elem.tag == ODS_TABLE:
+                sheet_rows = rows()
+                yield elem.get(ODS_NAME, ""), sheet_rows
+                # Skip whatever the budget left unread of this table
+                for _ in sheet_rows:
+                    pass
+        else:
+            stack.pop()
+
+
+@register_extractor('.ods')
+def extract_ods(source: Source, max_chars: Optional[int] = None) -> str:
+    with zipfile.ZipFile(source) as archive, archive.open("content.xml") as content:
+        return write_sheets(_ods_sheets(content), max_chars)
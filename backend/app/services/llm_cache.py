@@ -0,0 +1,205 @@
+from app.config import settings
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple, Type
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+from pydantic import BaseModel
+
+from app.services.audit_chunking import estimate_tokens
+from app.services.llm_throttle import BACKGROUND, run_throttled
+
+logger = logging.getLogger(__name__)
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Validated AI responses keyed by model, system prompt, user prompt, output type and a
+    version string (e.g. of the audit criteria), so byte-identical requests are answered
+    without calling the model again. Stored in SQLite with a TTL and bounded in bytes
+    (least recently used rows are evicted). Blocking; async code uses `run_cached`.
+    """
+    def __init__(self, path: str, max_bytes: int, ttl: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, user_prompt: str, kind: str, version: str = "") -> str:
+        return _sha256("\0".join([model, _sha256(system_prompt), _sha256(user_prompt), kind, version]))
+
+    def get(self, key: str, kind: str) -> Optional[str]:
+        """The cached JSON response, or None if there is none or it has expired."""
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses[kind] += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits[kind] += 1
+            return row[0]
+
+    def put(self, key: str, kind: str, response: str):
+        size = len(response.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, kind, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, response, size, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at").fetchall():
+            if total - freed <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            freed += size
+        logger.debug(f"Evicted {freed} bytes from the LLM response cache")
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM llm_cache").rowcount
+            self._conn.commit()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+            return {
+                "entries": entries,
+                "bytes": size,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+                "by_kind": {
+                    kind: {"hits": self.hits[kind], "misses": self.misses[kind]}
+                    for kind in sorted(set(self.hits) | set(self.misses))
+                },
+            }
+
+
+def _dump(data: Any) -> str:
+    return data.model_dump_json() if isinstance(data, BaseModel) else json.dumps(data)
+
+
+def _load(response: str, result_type: Type) -> Any:
+    if isinstance(result_type, type) and issubclass(result_type, BaseModel):
+        return result_type.model_validate_json(response)
+    return json.loads(response)
+
+
+def response_key(system_prompt: str, user_prompt: str, result_type: Type, version: str = "") -> Tuple[str, str]:
+    """(cache key, kind) of an agent request; kind is the output type name used in the statistics."""
+    kind = getattr(result_type, "__name__", str(result_type))
+    return LLMResponseCache.make_key(settings.ai_model_name, system_prompt, user_prompt, kind, version), kind
+
+
+async def cached_response(key: str, kind: str, result_type: Type) -> Optional[Any]:
+    """The validated cached response, or None (also when the cache is disabled or unreadable)."""
+    if llm_cache is None:
+        return None
+    try:
+        cached = await asyncio.to_thread(llm_cache.get, key, kind)
+        if cached is not None:
+            logger.debug(f"LLM response cache hit ({kind})")
+            return _load(cached, result_type)
+    except Exception as e:
+        logger.warning(f"LLM response cache lookup failed: {e}")
+    return None
+
+
+async def store_response(key: str, kind: str, data: Any):
+    if llm_cache is None:
+        return
+    try:
+        await asyncio.to_thread(llm_cache.put, key, kind, _dump(data))
+    except Exception as e:
+        logger.warning(f"Could not store LLM response: {e}")
+
+
+def estimate_request_tokens(system_prompt: str, user_prompt: str) -> int:
+    return estimate_tokens(system_prompt) + estimate_tokens(user_prompt) + settings.llm_output_token_estimate
+
+
+async def run_cached(
+    agent,
+    user_prompt: str,
+    system_prompt: str,
+    result_type: Type,
+    version: str = "",
+    refresh: bool = False,
+    priority: int = BACKGROUND,
+) -> Any:
+    """
+    `agent.run(user_prompt).data`, answered from the response cache when the same model,
+    prompts, output type and version were seen before. `refresh` skips the lookup
+    (the new response replaces the cached one). Failed runs are not cached.
+    Model calls go through the rate limiter with the given priority.
+    """
+    key, kind = response_key(system_prompt, user_prompt, result_type, version)
+    if not refresh:
+        cached = await cached_response(key, kind, result_type)
+        if cached is not None:
+            return cached
+
+    result = await run_throttled(
+        lambda: agent.run(user_prompt),
+        estimate_request_tokens(system_prompt, user_prompt),
+        priority,
+    )
+    data = result.data
+    await store_response(key, kind, data)
+    return data
+
+
+llm_cache = LLMResponseCache(
+    path=settings.llm_cache_path or os.path.join(settings.data_dir, "llm_cache.sqlite3"),
+    max_bytes=settings.llm_cache_max_bytes,
+    ttl=settings.llm_cache_ttl,
+) if settings.llm_cache_enabled else None
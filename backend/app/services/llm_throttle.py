@@ -0,0 +1,217 @@
+from app.config import settings
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+import asyncio
+import heapq
+import itertools
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Lower value is served first
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+
+class LLMThrottleTimeout(Exception):
+    """Raised when a request could not be scheduled before its deadline."""
+    def __init__(self, waited: float):
+        self.waited = waited
+        super().__init__(f"AI request not scheduled within {waited:.0f} s, the request quota is exhausted")
+
+
+class TokenBucket:
+    """Continuously refilled bucket; `capacity` per minute, 0 means unlimited."""
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)."""
+        if self.unlimited or self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        if not self.unlimited:
+            self.level -= amount
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class LLMScheduler:
+    """
+    Client-side rate limiter in front of every model call: a request bucket (RPM) and a token
+    bucket (TPM) sized to the provider's quota. Requests wait in a priority queue, interactive
+    ones before background audits, until both buckets allow them or their deadline passes.
+    A 429 from the provider pauses all requests for its Retry-After instead of letting the
+    other waiters run into the same limit.
+    """
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._changed: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._paused_until = 0.0
+        self.granted: Dict[int, int] = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.wait_seconds: Dict[int, float] = {INTERACTIVE: 0.0, BACKGROUND: 0.0}
+        self.timeouts = 0
+        self.rate_limited = 0
+
+    async def acquire(self, tokens: int, priority: int = BACKGROUND, timeout: Optional[float] = None):
+        """Wait until the request may be sent. Raises LLMThrottleTimeout after `timeout` seconds."""
+        if self.requests.unlimited and self.tokens.unlimited and time.monotonic() >= self._paused_until:
+            self.granted[priority] += 1
+            return
+        # A single request larger than the whole bucket is sent once the bucket is full
+        if not self.tokens.unlimited:
+            tokens = min(tokens, int(self.tokens.capacity))
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, next(self._seq), tokens, loop.create_future())
+        heapq.heappush(self._waiters, waiter)
+        self._wake()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted in the same instant; keep it
+                pass
+            else:
+                waiter.future.cancel()
+                self.timeouts += 1
+                raise LLMThrottleTimeout(time.monotonic() - started)
+        except asyncio.CancelledError:
+            if not waiter.future.done():
+                waiter.future.cancel()
+            raise
+        finally:
+            self._wake()
+        self.granted[priority] += 1
+        self.wait_seconds[priority] += time.monotonic() - started
+
+    def pause(self, seconds: float):
+        """Hold back all requests, e.g. after the provider answered 429."""
+        self.rate_limited += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        # The provider's window is full; start the buckets empty so requests resume gradually
+        self.requests.level = min(self.requests.level, 0.0)
+        self.tokens.level = min(self.tokens.level, 0.0)
+        self._wake()
+
+    def _wake(self):
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is None or self._dispatcher.done() or self._dispatcher.get_loop() is not loop:
+            self._changed = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch())
+        self._changed.set()
+
+    async def _dispatch(self):
+        while True:
+            while self._waiters and self._waiters[0].future.done():
+                heapq.heappop(self._waiters)
+            if not self._waiters:
+                return
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            head = self._waiters[0]
+            wait = max(
+                self._paused_until - now,
+                self.requests.wait_time(1),
+                self.tokens.wait_time(head.tokens),
+            )
+            if wait <= 0:
+                heapq.heappop(self._waiters)
+                self.requests.take(1)
+                self.tokens.take(head.tokens)
+                head.future.set_result(None)
+                continue
+            # Sleep until the head fits, or until a waiter arrives or leaves
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        waiting = [w for w in self._waiters if not w.future.done()]
+        return {
+            "requests_per_minute": int(self.requests.capacity),
+            "tokens_per_minute": int(self.tokens.capacity),
+            "waiting": {name: sum(1 for w in waiting if w.priority == p) for p, name in PRIORITY_NAMES.items()},
+            "granted": {PRIORITY_NAMES[p]: n for p, n in self.granted.items()},
+            "avg_wait_seconds": {
+                PRIORITY_NAMES[p]: round(self.wait_seconds[p] / self.granted[p], 3) if self.granted[p] else 0.0
+                for p in PRIORITY_NAMES
+            },
+            "timeouts": self.timeouts,
+            "rate_limited": self.rate_limited,
+        }
+
+
+def rate_limit_delay(error: Exception) -> Optional[float]:
+    """Seconds to back off if `error` is a 429 from the provider, else None."""
+    status = getattr(error, "status_code", None)
+    response = getattr(error, "response", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    if status != 429:
+        return None
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return max(float(headers.get("retry-after", "")), 1.0)
+    except ValueError:
+        return settings.llm_rate_limit_backoff
+
+
+def max_wait(priority: int) -> float:
+    return settings.llm_interactive_max_wait if priority == INTERACTIVE else settings.llm_background_max_wait
+
+
+async def run_throttled(call: Callable[[], Awaitable[T]], tokens: int, priority: int = BACKGROUND) -> T:
+    """
+    Await `call()` once the scheduler admits a request of `tokens` estimated tokens.
+    Provider 429s pause the scheduler and the call is retried until the deadline.
+    """
+    deadline = time.monotonic() + max_wait(priority)
+    while True:
+        await llm_scheduler.acquire(tokens, priority, timeout=max(deadline - time.monotonic(), 0.0))
+        try:
+            return await call()
+        except Exception as e:
+            delay = rate_limit_delay(e)
+            if delay is None:
+                raise
+            logger.warning(f"AI provider rate limit hit, pausing requests for {delay:.0f} s")
+            llm_scheduler.pause(delay)
+            if time.monotonic() + delay >= deadline:
+                raise
+
+
+llm_scheduler = LLMScheduler(
+    requests_per_minute=settings.llm_requests_per_minute,
+    tokens_per_minute=settings.llm_tokens_per_minute,
+)
@@ -1,213 +1,389 @@
-from webdav3.client import Client
 from app.config import settings
+from app.services.webdav import AsyncWebDAVClient, WebDAVError, get_http_client, response_etag
+import copy
 import json
-from typing import Dict, Any, Tuple
-from fastapi import UploadFile
-import tempfile
 import os
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Tuple, AsyncIterator, Awaitable, Callable, Optional
+from fastapi import UploadFile
 import logging
 
 logger = logging.getLogger(__name__)
 
+class FolderCache:
+    """
+    Process-wide TTL cache of Nextcloud folders that are known to exist.
+    """
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._expires: Dict[str, float] = {}
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return '/' + path.strip('/')
+
+    def contains(self, path: str) -> bool:
+        expires = self._expires.get(self._key(path))
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del self._expires[self._key(path)]
+            return False
+        return True
+
+    def add(self, path: str):
+        """Mark a folder and all of its parents as existing."""
+        expires = time.monotonic() + self.ttl
+        parts = path.strip('/').split('/')
+        for i in range(1, len(parts) + 1):
+            self._expires[self._key('/'.join(parts[:i]))] = expires
+
+    def invalidate(self, path: str):
+        """Forget a folder and everything below it."""
+        key = self._key(path)
+        for cached in [p for p in self._expires if p == key or p.startswith(key + '/')]:
+            del self._expires[cached]
+
+    def clear(self):
+        self._expires.clear()
+
+
+class MetadataCache:
+    """
+    Bounded LRU cache of parsed metadata.json documents with their ETag / Last-Modified,
+    used to revalidate with conditional GETs instead of downloading on every status poll.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Optional[str], Optional[str], Dict[Any, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, project_id: str) -> Optional[Tuple[Optional[str], Optional[str], Dict[Any, Any]]]:
+        entry = self._entries.get(project_id)
+        if entry is not None:
+            self._entries.move_to_end(project_id)
+        return entry
+
+    def put(self, project_id: str, etag: Optional[str], last_modified: Optional[str], metadata: Dict[Any, Any]):
+        if not etag and not last_modified:
+            # Nothing to revalidate against
+            self.invalidate(project_id)
+            return
+        self._entries[project_id] = (etag, last_modified, copy.deepcopy(metadata))
+        self._entries.move_to_end(project_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, project_id: str):
+        self._entries.pop(project_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+folder_cache = FolderCache(ttl=settings.nextcloud_folder_cache_ttl)
+metadata_cache = MetadataCache(max_entries=settings.nextcloud_metadata_cache_size)
+
+
+def project_id_from_metadata_path(remote_path: str) -> Optional[str]:
+    """Return the project id for `<base>/<project_id>/metadata.json` paths."""
+    parts = remote_path.strip('/').split('/')
+    if len(parts) >= 2 and parts[-1] == "metadata.json":
+        return parts[-2]
+    return None
+
+
 class NextcloudService:
-    def __init__(self):
-        self.client = Client({
-            'webdav_hostname': settings.nextcloud_url,
-            'webdav_login': settings.nextcloud_username,
-            'webdav_password': settings.nextcloud_password,
-            'webdav_timeout': 30
-        })
-    
-    def test_connection(self) -> Tuple[bool, str]:
+    def __init__(self, client: Optional[AsyncWebDAVClient] = None):
+        self._client = client
+        self._shared_client: Optional[AsyncWebDAVClient] = None
+
+    @property
+    def client(self) -> AsyncWebDAVClient:
+        """
+        The WebDAV client. All instances share one pooled keep-alive HTTP client, resolved on
+        use, so long-lived instances pick up a new one after close_http_client().
+        """
+        if self._client is not None:
+            return self._client
+        http_client = get_http_client()
+        if self._shared_client is None or self._shared_client.http is not http_client:
+            self._shared_client = AsyncWebDAVClient(http_client, settings.nextcloud_url, settings.nextcloud_username)
+        return self._shared_client
+
+    @client.setter
+    def client(self, client: AsyncWebDAVClient):
+        self._client = client
+
+    async def test_connection(self) -> Tuple[bool, str]:
         """
         Test the connection to Nextcloud and verify credentials.
         Returns (success: bool, message: str)
         """
         try:
             # Try to list the root directory to verify connection
-            self.client.list('/')
+            await self.client.list('/')
             logger.info("Nextcloud connection test successful")
             return True, "Connection successful"
         except Exception as e:
             error_msg = f"Failed to connect to Nextcloud: {e}"
             logger.error(error_msg, exc_info=True)
             return False, error_msg
-    
-    def create_folder(self, path: str) -> bool:
+
+    async def create_folder(self, path: str) -> bool:
         """
         Create a folder in Nextcloud, including all parent directories if needed.
+        Optimistic: MKCOL the leaf first and only walk up the parents if Nextcloud answers 409.
+        Folders known to exist are cached process-wide (see FolderCache).
         """
         try:
-            # Normalize path: remove leading/trailing slashes and split
             normalized_path = path.strip('/')
             if not normalized_path:
                 logger.error("Empty path provided for folder creation")
                 return False
-            
-            path_parts = normalized_path.split('/')
-            
-            # Create each directory in the path hierarchy
-            current_path = ""
-            for part in path_parts:
-                if not part:
-                    continue
-                    
-                if current_path:
-                    current_path = f"{current_path}/{part}"
-                else:
-                    current_path = part
-                
-                # Ensure path starts with / for WebDAV
-                full_path = f"/{current_path}"
-                
-                try:
-                    if not self.client.check(full_path):
-                        logger.debug(f"Creating folder: {full_path}")
-                        self.client.mkdir(full_path)
-                        logger.debug(f"Successfully created folder: {full_path}")
-                    else:
-                        logger.debug(f"Folder already exists: {full_path}")
-                except Exception as e:
-                    logger.error(f"Error creating intermediate folder {full_path}: {e}", exc_info=True)
-                    raise
-            
+
+            # Ensure path starts with / for WebDAV
+            full_path = f"/{normalized_path}"
+            if folder_cache.contains(full_path):
+                logger.debug(f"Folder known to exist (cached): {full_path}")
+                return True
+
+            await self._ensure_folder(full_path)
             logger.info(f"Successfully ensured folder structure exists: {path}")
             return True
         except Exception as e:
             logger.error(f"Error creating folder {path}: {e}", exc_info=True)
-            return False 
-    
-    async def upload_file(self, file: UploadFile, remote_path: str) -> bool:
+            return False
+
+    async def _ensure_folder(self, full_path: str):
+        """
+        MKCOL a folder. 201 = created, 405 = already exists, 409 = parent missing.
+        """
+        if folder_cache.contains(full_path):
+            return
+
+        response = await self.client.mkdir(full_path)
+        if response.status_code == 409:
+            parent = full_path.rsplit('/', 1)[0]
+            if not parent:
+                raise Exception(f"MKCOL {full_path} returned 409 for a top-level folder")
+            logger.debug(f"Parent of {full_path} missing, creating {parent} first")
+            # The parent may be cached but deleted on the server since.
+            folder_cache.invalidate(parent)
+            await self._ensure_folder(parent)
+            response = await self.client.mkdir(full_path)
+
+        if response.status_code == 201:
+            logger.debug(f"Successfully created folder: {full_path}")
+        elif response.status_code == 405:
+            logger.debug(f"Folder already exists: {full_path}")
+        else:
+            raise Exception(f"MKCOL {full_path} returned {response.status_code}")
+
+        folder_cache.add(full_path)
+
+    async def upload_file(
+        self,
+        file: UploadFile,
+        remote_path: str,
+        on_chunk: Optional[Callable[[bytes], Awaitable[None]]] = None
+    ) -> Tuple[bool, Optional[str]]:
         """
-        Upload a file to Nextcloud
+        Stream a file to Nextcloud in bounded chunks.
+        Files larger than one chunk use Nextcloud's chunked upload protocol if available.
+        `on_chunk` sees every chunk as it is sent (e.g. to hash the file in the same pass).
+        Returns (success, ETag of the stored file as reported by the server).
         """
-        tmp_path = None
         try:
-            logger.debug(f"Uploading file {file.filename} ({file.size} bytes) to {remote_path}")
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-                content = await file.read()
-                tmp_file.write(content)
-                tmp_path = tmp_file.name
-                logger.debug(f"Saved file to temporary location: {tmp_path}")
-            
-            # Upload to Nextcloud
-            self.client.upload_sync(remote_path=remote_path, local_path=tmp_path)
+            size = self._file_size(file)
+            logger.debug(f"Uploading file {file.filename} ({size} bytes) to {remote_path}")
+            await file.seek(0)
+
+            if settings.nextcloud_chunked_upload and self.client.supports_chunking and size > settings.nextcloud_chunk_size:
+                response = await self.client.upload_chunked(
+                    remote_path,
+                    total_size=size,
+                    chunk_size=settings.nextcloud_chunk_size,
+                    chunk_stream=lambda length: self._stream_file(file, length, on_chunk)
+                )
+            else:
+                response = await self.client.upload(
+                    remote_path,
+                    self._stream_file(file, size, on_chunk),
+                    headers={"Content-Length": str(size)}
+                )
+
             logger.info(f"Successfully uploaded file {file.filename} to {remote_path}")
-            
-            # Clean up
-            if tmp_path and os.path.exists(tmp_path):
-                os.unlink(tmp_path)
-            
-            return True
+            return True, response_etag(response)
+        except WebDAVError as e:
+            if e.status_code in (404, 409):
+                # The target folder is gone; make the next create_folder recreate it.
+                folder_cache.invalidate(remote_path.rsplit('/', 1)[0])
+            logger.error(f"Error uploading file {file.filename} to {remote_path}: {e}", exc_info=True)
+            return False, None
         except Exception as e:
             logger.error(f"Error uploading file {file.filename} to {remote_path}: {e}", exc_info=True)
-            # Clean up on error
-            if tmp_path and os.path.exists(tmp_path):
-                try:
-                    os.unlink(tmp_path)
-                except OSError:
-                    pass
-            return False
-    
+            return False, None
+
+    @staticmethod
+    def _file_size(file: UploadFile) -> int:
+        """Size of an UploadFile, determined from the spool if the client did not send it."""
+        if file.size is not None:
+            return file.size
+        position = file.file.tell()
+        file.file.seek(0, os.SEEK_END)
+        size = file.file.tell()
+        file.file.seek(position)
+        return size
+
+    @staticmethod
+    async def _stream_file(
+        file: UploadFile,
+        length: int,
+        on_chunk: Optional[Callable[[bytes], Awaitable[None]]] = None
+    ) -> AsyncIterator[bytes]:
+        """Yield the next `length` bytes of an UploadFile in buffer-sized pieces."""
+        remaining = length
+        while remaining > 0:
+            data = await file.read(min(settings.nextcloud_stream_buffer_size, remaining))
+            if not data:
+                raise IOError(f"Unexpected end of file {file.filename} ({remaining} bytes missing)")
+            remaining -= len(data)
+            if on_chunk is not None:
+                await on_chunk(data)
+            yield data
+
     async def upload_metadata(self, metadata: Dict[Any, Any], remote_path: str) -> bool:
         """
         Upload metadata JSON to Nextcloud
         """
-        tmp_path = None
         try:
             logger.debug(f"Uploading metadata to {remote_path}")
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.json') as tmp_file:
-                json.dump(metadata, tmp_file, indent=2)
-                tmp_path = tmp_file.name
-            
-            self.client.upload_sync(remote_path=remote_path, local_path=tmp_path)
+            project_id = project_id_from_metadata_path(remote_path)
+            if project_id:
+                metadata_cache.invalidate(project_id)
+            response = await self.client.upload(
+                remote_path,
+                json.dumps(metadata, indent=2),
+                headers={"Content-Type": "application/json"}
+            )
+            # Prime the cache with the new version so the next status poll is a 304
+            if project_id:
+                metadata_cache.put(project_id, response.headers.get("ETag"), None, metadata)
             logger.info(f"Successfully uploaded metadata to {remote_path}")
-            
-            if tmp_path and os.path.exists(tmp_path):
-                os.unlink(tmp_path)
-            
             return True
         except Exception as e:
             logger.error(f"Error uploading metadata to {remote_path}: {e}", exc_info=True)
-            if tmp_path and os.path.exists(tmp_path):
-                try:
-                    os.unlink(tmp_path)
-                except OSError:
-                    pass
             return False
 
     async def upload_content(self, content: str, remote_path: str) -> bool:
         """
         Upload text content to Nextcloud
         """
-        tmp_path = None
         try:
             logger.debug(f"Uploading content ({len(content)} chars) to {remote_path}")
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, encoding='utf-8') as tmp_file:
-                tmp_file.write(content)
-                tmp_path = tmp_file.name
-            
-            self.client.upload_sync(remote_path=remote_path, local_path=tmp_path)
+            await self.client.upload(remote_path, content)
             logger.info(f"Successfully uploaded content to {remote_path}")
-            
-            if tmp_path and os.path.exists(tmp_path):
-                os.unlink(tmp_path)
-            
             return True
         except Exception as e:
             logger.error(f"Error uploading content to {remote_path}: {e}", exc_info=True)
-            if tmp_path and os.path.exists(tmp_path):
-                try:
-                    os.unlink(tmp_path)
-                except OSError:
-                    pass
             return False
-    
+
+    async def copy_file(self, source_path: str, remote_path: str, etag: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+        """
+        Copy a file inside Nextcloud (server-side, no data transfer through the API).
+        With `etag`, nothing is copied if the source was changed or replaced since.
+        Returns (success, ETag of the copy if the server reports it).
+        """
+        try:
+            logger.debug(f"Copying {source_path} to {remote_path}")
+            response = await self.client.copy(source_path, remote_path, if_match=etag)
+            logger.info(f"Successfully copied {source_path} to {remote_path}")
+            return True, response_etag(response)
+        except WebDAVError as e:
+            if e.status_code == 412:
+                logger.info(f"Not copying {source_path}: it was changed since it was stored")
+            else:
+                logger.warning(f"Error copying {source_path} to {remote_path}: {e}")
+            return False, None
+        except Exception as e:
+            logger.warning(f"Error copying {source_path} to {remote_path}: {e}")
+            return False, None
+
+    async def delete_file(self, remote_path: str) -> bool:
+        """
+        Delete a file from Nextcloud (missing files are ignored)
+        """
+        try:
+            logger.debug(f"Deleting {remote_path}")
+            await self.client.delete(remote_path)
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting {remote_path}: {e}", exc_info=True)
+            return False
+
+    async def download_file(self, remote_path: str, local_path: str) -> None:
+        """
+        Download a file from Nextcloud to a local path
+        """
+        logger.debug(f"Downloading {remote_path} to {local_path}")
+        await self.client.download_to(remote_path, local_path)
+
     async def get_metadata(self, project_id: str) -> Dict[Any, Any]:
         """
-        Retrieve project metadata from Nextcloud
+        Retrieve project metadata from Nextcloud.
+        Cached copies are revalidated with If-None-Match / If-Modified-Since; a 304 is a cache hit.
         """
-        tmp_path = None
         try:
             logger.debug(f"Retrieving metadata for project: {project_id}")
             path = f"{settings.nextcloud_base_path}/{project_id}/metadata.json"
-            if self.client.check(path):
-                logger.debug(f"Found metadata at: {path}")
-                with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-                    tmp_path = tmp_file.name
-                
-                self.client.download_sync(remote_path=path, local_path=tmp_path)
-                
-                with open(tmp_path, 'r') as f:
-                    metadata = json.load(f)
-                
-                if tmp_path and os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
-                
-                logger.info(f"Successfully retrieved metadata for project: {project_id}")
-                return metadata
-            
-            logger.warning(f"Project {project_id} not found")
-            raise FileNotFoundError(f"Project {project_id} not found")
+
+            cached = metadata_cache.get(project_id)
+            headers = {}
+            if cached:
+                etag, last_modified, _ = cached
+                if etag:
+                    headers["If-None-Match"] = etag
+                if last_modified:
+                    headers["If-Modified-Since"] = last_modified
+
+            try:
+                response = await self.client.download(path, headers=headers)
+            except FileNotFoundError:
+                metadata_cache.invalidate(project_id)
+                logger.warning(f"Project {project_id} not found")
+                raise FileNotFoundError(f"Project {project_id} not found")
+
+            if response.status_code == 304 and cached:
+                metadata_cache.hits += 1
+                logger.debug(f"Metadata for project {project_id} not modified (cache hit)")
+                return copy.deepcopy(cached[2])
+
+            metadata_cache.misses += 1
+            metadata = response.json()
+            metadata_cache.put(
+                project_id,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                metadata
+            )
+            logger.info(f"Successfully retrieved metadata for project: {project_id}")
+            return metadata
         except FileNotFoundError:
             raise
         except Exception as e:
             logger.error(f"Error retrieving metadata for project {project_id}: {e}", exc_info=True)
-            if tmp_path and os.path.exists(tmp_path):
-                try:
-                    os.unlink(tmp_path)
-                except OSError:
-                    pass
             raise
-    
-    def list_files(self, path: str) -> list:
+
+    async def list_files(self, path: str) -> list:
         """
         List files in a Nextcloud directory
         """
         try:
             logger.debug(f"Listing files in: {path}")
-            files = self.client.list(path)
+            files = await self.client.list(path)
             logger.debug(f"Found {len(files)} files in {path}")
             return files
         except Exception as e:
@@ -0,0 +1,151 @@
+from app.config import settings
+from app.services.nextcloud import NextcloudService
+from typing import Optional, Dict, Any, Literal
+from datetime import datetime
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+BreakerState = Literal["closed", "open", "half_open"]
+ConnectivityState = Literal["unknown", "healthy", "degraded", "down"]
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for `reset_timeout` seconds.
+    After that a single trial is let through (half-open); its outcome closes or re-opens the breaker.
+    Other calls keep failing fast while the trial runs. A trial that never reports back
+    frees its slot after another `reset_timeout`.
+    """
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_started_at: Optional[float] = None
+
+    @property
+    def state(self) -> BreakerState:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state != "half_open":
+            return state == "closed"
+        now = time.monotonic()
+        if self.trial_started_at is not None and now - self.trial_started_at < self.reset_timeout:
+            return False
+        self.trial_started_at = now
+        return True
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("Nextcloud circuit breaker closed")
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_started_at = None
+        if self.state == "half_open" or (self.opened_at is None and self.failures >= self.failure_threshold):
+            logger.warning(f"Nextcloud circuit breaker opened after {self.failures} consecutive failures")
+            self.opened_at = time.monotonic()
+
+
+class NextcloudMonitor:
+    """
+    Probes Nextcloud in the background and keeps the last known connectivity state,
+    so request handlers can check availability without a round-trip of their own.
+    """
+    def __init__(self, service: Optional[NextcloudService] = None):
+        self.service = service or NextcloudService()
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.nextcloud_breaker_failure_threshold,
+            reset_timeout=settings.nextcloud_breaker_reset_timeout,
+        )
+        self.state: ConnectivityState = "unknown"
+        self.last_latency_ms: Optional[float] = None
+        self.last_checked: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def is_available(self) -> bool:
+        """
+        False while the circuit breaker is open, or half-open with its trial call still running;
+        callers should fail fast with 503. A True in half-open state makes the caller the trial.
+        """
+        return self.breaker.allow()
+
+    def record_success(self):
+        """Report a successful Nextcloud operation from regular request traffic."""
+        self.breaker.record_success()
+        if self.state in ("unknown", "down"):
+            self.state = "healthy"
+
+    def record_failure(self, error: str):
+        """Report a failed Nextcloud operation from regular request traffic."""
+        self.last_error = error
+        self.breaker.record_failure()
+        if self.breaker.state == "open":
+            self.state = "down"
+
+    async def probe(self) -> bool:
+        """Run one cheap PROPFIND against the WebDAV root and update the cached state."""
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.service.client.check('/'), timeout=settings.nextcloud_timeout)
+            latency = time.perf_counter() - start
+            self.last_latency_ms = round(latency * 1000, 1)
+            self.last_error = None
+            self.breaker.record_success()
+            self.state = "degraded" if latency > settings.nextcloud_degraded_latency else "healthy"
+            if self.state == "degraded":
+                logger.warning(f"Nextcloud is slow: probe took {self.last_latency_ms} ms")
+            return True
+        except Exception as e:
+            self.last_latency_ms = round((time.perf_counter() - start) * 1000, 1)
+            self.last_error = f"{type(e).__name__}: {e}"
+            self.breaker.record_failure()
+            self.state = "down" if self.breaker.state == "open" else "degraded"
+            logger.error(f"Nextcloud probe failed: {self.last_error}")
+            return False
+        finally:
+            self.last_checked = datetime.now()
+
+    async def _run(self):
+        while True:
+            await self.probe()
+            await asyncio.sleep(settings.nextcloud_probe_interval)
+
+    def start(self):
+        """Start the background probe loop (called from the application lifespan)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "circuit": self.breaker.state,
+            "latency_ms": self.last_latency_ms,
+            "last_checked": self.last_checked.isoformat() if self.last_checked else None,
+            "last_error": self.last_error,
+        }
+
+
+nextcloud_monitor = NextcloudMonitor()
@@ -1,15 +1,15 @@
-import os
 import logging
 import json
-import pypdf
 import docx
-import openpyxl
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 from datetime import datetime
 
-from pydantic_ai import Agent
 from app.config import settings
 from app.models.privacy_concept import ExtractedStudyData
+from app.services.extraction import extraction_engine, IngestedDocument
+from app.services.agents import agent_registry
+from app.services.llm_cache import run_cached, response_key, cached_response, store_response, estimate_request_tokens
+from app.services.llm_throttle import INTERACTIVE, llm_scheduler, max_wait, rate_limit_delay
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
@@ -17,21 +17,7 @@ from app.models.db_models import PrivacyConceptDB
 
 logger = logging.getLogger(__name__)
 
-class PrivacyConceptService:
-    def __init__(self, db: Optional[AsyncSession] = None):
-        self.db = db
-        # Configure OpenAI env vars for Pydantic AI
-        if settings.ai_api_key:
-            os.environ["OPENAI_API_KEY"] = settings.ai_api_key
-        if settings.ai_api_base_url:
-            os.environ["OPENAI_BASE_URL"] = settings.ai_api_base_url
-        if settings.ai_proxy:
-            os.environ["HTTP_PROXY"] = settings.ai_proxy
-            os.environ["HTTPS_PROXY"] = settings.ai_proxy
-
-        self.extraction_agent = Agent(
-            model=settings.ai_model_name,
-            system_prompt="""Du bist ein Datenschutzexperte für medizinische Forschung an der Universitätsmedizin Frankfurt (UMF).
+EXTRACTION_SYSTEM_PROMPT = """Du bist ein Datenschutzexperte für medizinische Forschung an der Universitätsmedizin Frankfurt (UMF).
 Analysiere den vorliegenden Forschungsantrag präzise und extrahiere die für das Datenschutzkonzept relevanten Metadaten.
 
 WICHTIGE HINWEISE ZUR EXTRAKTION:
@@ -40,13 +26,9 @@ WICHTIGE HINWEISE ZUR EXTRAKTION:
 - Pseudonymisierung: Suche nach Hinweisen auf 'Treuhandstelle', 'ID-Liste', 'Code-Key'.
 - Institution: Falls nicht anders genannt, gehe von 'Universitätsmedizin Frankfurt' aus.
 
-Antworte AUSSCHLIESSLICH mit dem geforderten JSON-Objekt.""",
-            result_type=ExtractedStudyData,
-        )
+Antworte AUSSCHLIESSLICH mit dem geforderten JSON-Objekt."""
 
-        self.generation_agent = Agent(
-            model=settings.ai_model_name,
-            system_prompt="""Du bist der Datenschutzbeauftragte der Universitätsmedizin Frankfurt (UMF).
+GENERATION_SYSTEM_PROMPT = """Du bist der Datenschutzbeauftragte der Universitätsmedizin Frankfurt (UMF).
 Deine Aufgabe ist das Verfassen eines professionellen, behördenreifen Datenschutzkonzepts für einen Forschungsantrag.
 
 STIL & TON:
@@ -56,50 +38,34 @@ STIL & TON:
 
 FORMATIERUNG:
 - Nutze Markdown (# Überschriften).
-- Keine Platzhalter wie [Hier Datum einfügen] - fülle alles basierend auf den Daten oder sinnvollen Standards aus.""",
-            result_type=str,
-        )
+- Keine Platzhalter wie [Hier Datum einfügen] - fülle alles basierend auf den Daten oder sinnvollen Standards aus."""
+
+agent_registry.register("concept_extraction", EXTRACTION_SYSTEM_PROMPT, ExtractedStudyData)
+agent_registry.register("concept_generation", GENERATION_SYSTEM_PROMPT, str)
 
-    def extract_text_from_file(self, file_path: str) -> str:
+class PrivacyConceptService:
+    def __init__(self, db: Optional[AsyncSession] = None):
+        self.db = db
+        # Shared, pre-built agents; constructing a service per request is cheap
+        self.extraction_agent = agent_registry.get("concept_extraction")
+        self.generation_agent = agent_registry.get("concept_generation")
+
+    async def extract_text_from_file(self, file_path: str) -> str:
         """Extract text based on file extension."""
-        ext = os.path.splitext(file_path)[1].lower()
-        try:
-            if ext == '.pdf':
-                return self._extract_from_pdf(file_path)
-            elif ext in ['.docx', '.doc']:
-                return self._extract_from_docx(file_path)
-            elif ext in ['.txt', '.md']:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    return f.read()
-            else:
-                logger.warning(f"Unsupported file type for text extraction: {ext}")
-                return ""
-        except Exception as e:
-            logger.error(f"Error extracting text from {file_path}: {e}")
-            return ""
-
-    def _extract_from_pdf(self, path: str) -> str:
-        text = ""
-        with open(path, 'rb') as f:
-            reader = pypdf.PdfReader(f)
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-        return text
-
-    def _extract_from_docx(self, path: str) -> str:
-        doc = docx.Document(path)
-        return "\n".join([p.text for p in doc.paragraphs])
-
-    async def extract_data(self, file_paths: List[str], manual_text: Optional[str] = None) -> ExtractedStudyData:
+        return await extraction_engine.extract(file_path)
+
+    async def extract_data(self, documents: List[IngestedDocument], manual_text: Optional[str] = None, refresh: bool = False) -> ExtractedStudyData:
         combined_text = ""
         if manual_text:
             combined_text += f"\n\n--- MANUAL TEXT ---\n\n{manual_text}"
             
-        for file_path in file_paths:
-            text = self.extract_text_from_file(file_path)
-            filename = os.path.basename(file_path)
+        # Files share what is left of the prompt budget after the manual text
+        budget = max(settings.extraction_char_budget - len(combined_text), 0)
+        # Also run without budget left: the parse rejects encrypted or corrupted PDFs
+        texts = await extraction_engine.extract_documents(documents, max_chars=budget)
+        for document, text in zip(documents, texts):
             if text:
-                combined_text += f"\n\n--- FILE: {filename} ---\n\n{text}"
+                combined_text += f"\n\n--- FILE: {document.filename} ---\n\n{text}"
         
         if not combined_text.strip():
             raise ValueError("No text provided for extraction.")
@@ -107,14 +73,48 @@ FORMATIERUNG:
         prompt = f"""
         Analysiere den folgenden Forschungsantrag und extrahiere die relevanten Daten:
         
-        {combined_text[:100000]}
+        {combined_text[:settings.extraction_char_budget]}
         """
         
-        result = await self.extraction_agent.run(prompt)
-        return result.data
+        return await run_cached(self.extraction_agent, prompt, EXTRACTION_SYSTEM_PROMPT, ExtractedStudyData, refresh=refresh, priority=INTERACTIVE)
 
-    async def generate_concept(self, data: ExtractedStudyData) -> str:
-        prompt = f"""
+    async def generate_concept(self, data: ExtractedStudyData, refresh: bool = False) -> str:
+        return await run_cached(
+            self.generation_agent, self._concept_prompt(data), GENERATION_SYSTEM_PROMPT, str, refresh=refresh, priority=INTERACTIVE
+        )
+
+    async def stream_concept(self, data: ExtractedStudyData, refresh: bool = False) -> AsyncIterator[str]:
+        """
+        Yield the concept markdown in pieces as the model produces them.
+        A cached concept is yielded at once; a completely streamed one is cached.
+        Closing the generator early (client gone) closes the model stream.
+        """
+        prompt = self._concept_prompt(data)
+        key, kind = response_key(GENERATION_SYSTEM_PROMPT, prompt, str)
+        if not refresh:
+            cached = await cached_response(key, kind, str)
+            if cached is not None:
+                yield cached
+                return
+
+        await llm_scheduler.acquire(
+            estimate_request_tokens(GENERATION_SYSTEM_PROMPT, prompt), INTERACTIVE, timeout=max_wait(INTERACTIVE)
+        )
+        parts = []
+        try:
+            async with self.generation_agent.run_stream(prompt) as result:
+                async for delta in result.stream_text(delta=True):
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            delay = rate_limit_delay(e)
+            if delay is not None:
+                llm_scheduler.pause(delay)
+            raise
+        await store_response(key, kind, "".join(parts))
+
+    def _concept_prompt(self, data: ExtractedStudyData) -> str:
+        return f"""
         Erstelle ein detailliertes Datenschutzkonzept für folgende Studie:
         
         # STUDIENDATEN
@@ -180,9 +180,6 @@ FORMATIERUNG:
 
         Antworte NUR mit dem Markdown-Text. Beginne direkt mit der Überschrift "# Datenschutzkonzept".
         """
-        
-        result = await self.generation_agent.run(prompt)
-        return result.data
 
     def export_to_docx(self, markdown_text: str, output_path: str):
         doc = docx.Document()
@@ -0,0 +1,155 @@
+import base64
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.db_models import DocumentDB, ProjectDB
+from app.models.project import ProjectSummary
+
+logger = logging.getLogger(__name__)
+
+class ProjectIndexService:
+    """
+    Database index of submitted projects, so listings and status polls do not hit Nextcloud.
+    """
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def record_upload(self, metadata: Dict[str, Any]) -> ProjectDB:
+        """
+        Insert or update the index row for a submission in one transaction.
+        """
+        project = await self.db.get(ProjectDB, metadata["project_id"])
+        if project is None:
+            project = ProjectDB(id=metadata["project_id"])
+            self.db.add(project)
+
+        project.title = metadata["project_title"]
+        project.institution = metadata["institution"]
+        project.project_type = metadata["project_type"]
+        project.email = metadata["email"]
+        project.uploader_name = metadata.get("uploader_name")
+        project.is_prospective_study = bool(metadata.get("is_prospective_study"))
+        project.files = metadata["files"]
+        project.details = metadata
+        project.audit_status = "pending"
+        project.created_at = datetime.fromisoformat(metadata["upload_timestamp"])
+
+        # Content fingerprints of the stored files, replacing those of an earlier upload to the same folder
+        await self.db.execute(delete(DocumentDB).where(DocumentDB.project_id == project.id))
+        for file_info in metadata["files"]:
+            if file_info.get("sha256"):
+                self.db.add(DocumentDB(
+                    sha256=file_info["sha256"],
+                    project_id=project.id,
+                    filename=file_info["filename"],
+                    remote_path=file_info["path"],
+                    size=file_info.get("size"),
+                    etag=file_info.get("etag"),
+                    created_at=project.created_at,
+                ))
+
+        try:
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        return project
+
+    async def update_audit_status(self, project_id: str, audit_status: str) -> bool:
+        project = await self.db.get(ProjectDB, project_id)
+        if project is None:
+            return False
+        project.audit_status = audit_status
+        await self.db.commit()
+        return True
+
+    async def find_documents(self, hashes: List[str]) -> Dict[str, DocumentDB]:
+        """
+        Map each known SHA-256 to its most recent stored copy whose ETag is known
+        (needed to check that the copy still holds these bytes).
+        """
+        if not hashes:
+            return {}
+        result = await self.db.execute(
+            select(DocumentDB)
+            .where(DocumentDB.sha256.in_(set(hashes)), DocumentDB.etag.is_not(None))
+            .order_by(DocumentDB.created_at.desc(), DocumentDB.id.desc())
+        )
+        sources: Dict[str, DocumentDB] = {}
+        for document in result.scalars().all():
+            sources.setdefault(document.sha256, document)
+        return sources
+
+    async def get_project(self, project_id: str) -> Optional[ProjectDB]:
+        return await self.db.get(ProjectDB, project_id)
+
+    async def list_projects(
+        self,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        institution: Optional[str] = None,
+        project_type: Optional[str] = None,
+        audit_status: Optional[str] = None,
+    ) -> Tuple[List[ProjectDB], Optional[str]]:
+        """
+        Newest first, keyset-paginated on (created_at, id).
+        Returns the page and the cursor for the next page (None on the last page).
+        """
+        query = select(ProjectDB)
+        if institution:
+            query = query.where(ProjectDB.institution == institution)
+        if project_type:
+            query = query.where(ProjectDB.project_type == project_type)
+        if audit_status:
+            query = query.where(ProjectDB.audit_status == audit_status)
+        if cursor:
+            created_at, project_id = decode_cursor(cursor)
+            query = query.where(or_(
+                ProjectDB.created_at < created_at,
+                and_(ProjectDB.created_at == created_at, ProjectDB.id < project_id),
+            ))
+
+        query = query.order_by(ProjectDB.created_at.desc(), ProjectDB.id.desc()).limit(limit + 1)
+        result = await self.db.execute(query)
+        projects = list(result.scalars().all())
+
+        next_cursor = None
+        if len(projects) > limit:
+            projects = projects[:limit]
+            next_cursor = encode_cursor(projects[-1].created_at, projects[-1].id)
+        return projects, next_cursor
+
+
+def encode_cursor(created_at: datetime, project_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{project_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Raises ValueError for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created_at, project_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), project_id
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def to_summary(project: ProjectDB) -> ProjectSummary:
+    return ProjectSummary(
+        project_id=project.id,
+        project_title=project.title,
+        institution=project.institution,
+        project_type=project.project_type,
+        uploader_name=project.uploader_name,
+        email=project.email,
+        is_prospective_study=project.is_prospective_study,
+        files=project.files,
+        audit_status=project.audit_status,
+        created_at=project.created_at,
+        updated_at=project.updated_at,
+    )
@@ -0,0 +1,160 @@
+"""
+Lexical retrieval (BM25) over the extracted text of one submission, so the audit prompt
+contains only the passages relevant to the check items instead of every document in full.
+The index is built in-process per audit; nothing is persisted.
+"""
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Tuple
+import math
+import re
+
+from app.config.audit_criteria import CheckItem
+from app.services.audit_chunking import CHARS_PER_TOKEN, split_sections, split_to_size
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+", re.UNICODE)
+
+STOPWORDS = set("""
+aber alle als also am an auch auf aus bei bis da dann das dass dem den der des die dies diese dieser
+dieses doch dort durch ein eine einem einen einer eines er es falls für gibt hat ich ihr im in ist ja
+jede jeder jedes kann kein keine liegt man mit nach nicht noch nur ob oder sich sie sind so über um
+und uns von vor war wenn wer werden wie wird wo zu zum zur z b bzw ggf usw o ä welche welcher welches
+beschrieben vorgesehen angegeben genannt erwähnt
+a an and are as at be by for from has have if in is it its no not of on or that the this to was
+were which who will with yes
+""".split())
+
+# German compounds are split at a linking "s" after these suffixes ("verschlüsselungsmaßnahmen" -> "verschlüsselung maßnahmen")
+COMPOUND_SPLIT = re.compile(r"(ung|heit|keit|tion|tät)s(?=\w{4,})")
+# Longest suffix first
+SUFFIXES = sorted({
+    "ungen", "ung", "heit", "keit", "ern", "em", "en", "er", "es", "st", "e", "s", "t",  # German
+    "ations", "ation", "ion", "ing", "ed", "ies", "ly",  # English
+}, key=len, reverse=True)
+UMLAUTS = str.maketrans({"ä": "a", "ö": "o", "ü": "u", "ß": "ss"})
+
+
+def stem(token: str) -> str:
+    """Light suffix stripping for German and English; stems keep at least four characters."""
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            token = token[:-len(suffix)]
+            break
+    return token.translate(UMLAUTS)
+
+
+@lru_cache(maxsize=65536)
+def _word_terms(word: str) -> Tuple[str, ...]:
+    if word in STOPWORDS or len(word) < 2:
+        return ()
+    parts = COMPOUND_SPLIT.sub(r"\1 ", word).split() if len(word) > 12 else [word]
+    terms = [stem(part) for part in parts if part not in STOPWORDS]
+    if len(parts) > 1:
+        # Keep the whole compound as well, exact matches score higher
+        terms.insert(0, stem(word))
+    return tuple(terms)
+
+
+def tokenize(text: str) -> List[str]:
+    return [term for word in TOKEN_PATTERN.findall(text.lower()) for term in _word_terms(word)]
+
+
+@dataclass
+class Passage:
+    index: int
+    filename: str
+    position: int  # passage number within its file
+    text: str
+
+
+def split_passages(documents: List[Tuple[str, str]], max_tokens: int) -> List[Passage]:
+    """Cut each document into passages of at most `max_tokens`, merging short sections of the same file."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    passages: List[Passage] = []
+    for filename, text in documents:
+        current = ""
+        position = 0
+        for piece in (p for section in split_sections(text) for p in split_to_size(section, max_chars)):
+            if current and len(current) + len(piece) > max_chars:
+                passages.append(Passage(len(passages), filename, position, current))
+                position += 1
+                current = ""
+            current += piece
+        if current.strip():
+            passages.append(Passage(len(passages), filename, position, current))
+    return passages
+
+
+class BM25Index:
+    """Okapi BM25 over a list of passages with an inverted index."""
+    def __init__(self, passages: List[Passage], k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.lengths: List[int] = []
+        for passage in passages:
+            terms = tokenize(passage.text)
+            self.lengths.append(len(terms))
+            for term, count in Counter(terms).items():
+                self.postings[term].append((passage.index, count))
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.passages) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int) -> List[Tuple[float, Passage]]:
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for index, count in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / (self.avg_length or 1))
+                scores[index] += idf * count * (self.k1 + 1) / (count + norm)
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(score, self.passages[index]) for index, score in best]
+
+
+def check_item_query(item: CheckItem) -> str:
+    return f"{item.id.replace('_', ' ')} {item.category} {item.description}"
+
+
+def select_passages(
+    documents: List[Tuple[str, str]],
+    check_items: List[CheckItem],
+    top_k: int,
+    passage_tokens: int,
+) -> List[Tuple[str, str]]:
+    """
+    Reduce each document to the passages among the top-k of any check item, plus its first passage
+    so every file stays recognizable. Passages are kept in document order and labelled with the
+    check items they were retrieved for; gaps are marked with "[...]".
+    Returns (filename, excerpt) pairs in the shape of `documents`.
+    """
+    passages = split_passages(documents, passage_tokens)
+    index = BM25Index(passages)
+    matched: Dict[int, List[str]] = defaultdict(list)
+    for item in check_items:
+        for _, passage in index.search(check_item_query(item), top_k):
+            matched[passage.index].append(item.id)
+    for passage in passages:
+        if passage.position == 0:
+            matched.setdefault(passage.index, [])
+
+    excerpts: Dict[str, List[str]] = {filename: [] for filename, _ in documents}
+    previous: Dict[str, int] = {}
+    for passage in passages:
+        if passage.index not in matched:
+            continue
+        parts = excerpts[passage.filename]
+        if passage.filename in previous and passage.position != previous[passage.filename] + 1:
+            parts.append("[...]\n")
+        previous[passage.filename] = passage.position
+        check_ids = matched[passage.index]
+        label = f"[Textstelle {passage.position + 1}" + (f" · Prüfpunkte: {', '.join(check_ids)}]" if check_ids else "]")
+        parts.append(f"{label}\n{passage.text.strip()}\n\n")
+    return [(filename, "".join(parts)) for filename, parts in excerpts.items() if parts]
@@ -0,0 +1,203 @@
+from app.config import settings
+from collections import OrderedDict
+from typing import Optional, BinaryIO, Dict, Tuple
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+COPY_BUFFER_SIZE = 1024 * 1024  # 1 MB
+
+
+class StagingArea:
+    """
+    Local content-addressed store for uploaded files, so the background audit can read
+    the bytes the API just received instead of downloading them again from Nextcloud.
+    Files are stored under their SHA-256 digest and evicted by TTL and total size (LRU).
+    """
+    def __init__(self, root: str, max_bytes: int, ttl: float):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # digest -> (size, staged_at); ordered from least to most recently used
+        self._entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.root, exist_ok=True)
+        self._load_existing()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest)
+
+    def _load_existing(self):
+        """Re-index files left over from a previous process, oldest first."""
+        entries = []
+        for name in os.listdir(self.root):
+            path = self._path(name)
+            if len(name) != 64 or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        wall_offset = time.time() - time.monotonic()
+        for mtime, name, size in sorted(entries):
+            self._entries[name] = (size, mtime - wall_offset)
+            self._total_bytes += size
+        self._evict()
+
+    def open(self) -> "StagingStream":
+        """Start staging a file whose bytes are fed in chunks (see StagingStream)."""
+        return StagingStream(self)
+
+    def stage(self, fileobj: BinaryIO) -> str:
+        """
+        Copy a file object into the staging area in bounded chunks and return its SHA-256 digest.
+        Blocking; call from a thread pool in async code.
+        """
+        stream = self.open()
+        try:
+            for chunk in iter(lambda: fileobj.read(COPY_BUFFER_SIZE), b""):
+                stream.write(chunk)
+        except BaseException:
+            stream.discard()
+            raise
+        return stream.commit()
+
+    def _add(self, tmp_path: str, digest: str, size: int):
+        """Move a fully written temporary file into place under its digest."""
+        os.replace(tmp_path, self._path(digest))
+        with self._lock:
+            previous = self._entries.pop(digest, None)
+            if previous:
+                self._total_bytes -= previous[0]
+            self._entries[digest] = (size, time.monotonic())
+            self._total_bytes += size
+            self._evict()
+        logger.debug(f"Staged {size} bytes as {digest}")
+
+    def get(self, digest: str) -> Optional[str]:
+        """Return the local path of a staged file, or None if it is unknown or expired."""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or time.monotonic() - entry[1] > self.ttl or not os.path.exists(self._path(digest)):
+                if entry is not None:
+                    self._remove(digest)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return self._path(digest)
+
+    def link(self, digest: str, target_path: str) -> bool:
+        """
+        Make a staged file available at target_path (hard link, copy as fallback).
+        The link keeps the data readable even if the entry is evicted meanwhile.
+        """
+        path = self.get(digest)
+        if path is None:
+            return False
+        try:
+            os.link(path, target_path)
+        except OSError:
+            try:
+                shutil.copyfile(path, target_path)
+            except OSError as e:
+                logger.warning(f"Could not read staged file {digest}: {e}")
+                return False
+        return True
+
+    def _remove(self, digest: str):
+        size, _ = self._entries.pop(digest)
+        self._total_bytes -= size
+        try:
+            os.unlink(self._path(digest))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        now = time.monotonic()
+        for digest in [d for d, (_, staged_at) in self._entries.items() if now - staged_at > self.ttl]:
+            self._remove(digest)
+        while self._total_bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class StagingStream:
+    """
+    Hash a file and stage a copy of it in one pass while its bytes are read for something
+    else (e.g. streamed to Nextcloud). Staging is best effort: if the staging area cannot
+    be written, the file is still hashed. Blocking; call from a thread pool in async code.
+    """
+    def __init__(self, area: StagingArea):
+        self.area = area
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._out: Optional[BinaryIO] = None
+        self._tmp_path: Optional[str] = None
+        try:
+            fd, self._tmp_path = tempfile.mkstemp(dir=area.root, prefix=".staging_")
+            self._out = os.fdopen(fd, 'wb')
+        except OSError as e:
+            logger.warning(f"Cannot stage file locally, audit will download it: {e}")
+            self.discard()
+
+    def write(self, chunk: bytes):
+        self._sha256.update(chunk)
+        self.size += len(chunk)
+        if self._out is not None:
+            try:
+                self._out.write(chunk)
+            except OSError as e:
+                logger.warning(f"Staging file failed, audit will download it: {e}")
+                self.discard()
+
+    def commit(self) -> str:
+        """Finish the file and return its SHA-256 digest."""
+        digest = self._sha256.hexdigest()
+        if self._out is not None:
+            try:
+                self._out.close()
+                self._out = None
+                self.area._add(self._tmp_path, digest, self.size)
+                self._tmp_path = None
+            except OSError as e:
+                logger.warning(f"Staging file failed, audit will download it: {e}")
+                self.discard()
+        return digest
+
+    def discard(self):
+        """Drop the partially staged copy."""
+        if self._out is not None:
+            out, self._out = self._out, None
+            try:
+                out.close()
+            except OSError:
+                pass
+        if self._tmp_path is not None:
+            try:
+                os.unlink(self._tmp_path)
+            except FileNotFoundError:
+                pass
+            self._tmp_path = None
+
+
+staging_area = StagingArea(
+    root=settings.staging_dir or os.path.join(tempfile.gettempdir(), "datenschutzportal_staging"),
+    max_bytes=settings.staging_max_bytes,
+    ttl=settings.staging_ttl,
+)
@@ -0,0 +1,176 @@
+from app.config import settings
+from typing import Optional, Dict, Any, List, AsyncIterable
+from datetime import datetime, timedelta
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class UploadSessionError(Exception):
+    """
+    Raised for invalid session operations; `status_code` is the HTTP status to answer with.
+    """
+    def __init__(self, status_code: int, message: str, offset: Optional[int] = None):
+        self.status_code = status_code
+        self.offset = offset
+        super().__init__(message)
+
+
+class UploadSessionStore:
+    """
+    Local disk store for resumable uploads. Each session is a directory holding
+    `session.json` (submission fields and file manifest) and one `<index>.part` file per
+    document. The size of a `.part` file is its upload offset, so sessions survive restarts.
+    The total declared size of all open sessions is bounded, and idle sessions expire.
+    """
+    def __init__(self, root: str, max_bytes: int, ttl: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._locks: Dict[str, asyncio.Lock] = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    def _dir(self, session_id: str) -> str:
+        return os.path.join(self.root, session_id)
+
+    def _part_path(self, session_id: str, index: int) -> str:
+        return os.path.join(self._dir(session_id), f"{index}.part")
+
+    def _read(self, session_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self._dir(session_id), "session.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write(self, session_id: str, session: Dict[str, Any]):
+        path = os.path.join(self._dir(session_id), "session.json")
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(session, f)
+        os.replace(path + ".tmp", path)
+
+    def _touch(self, session_id: str, session: Dict[str, Any]):
+        session["expires_at"] = (datetime.now() + timedelta(seconds=self.ttl)).isoformat()
+        self._write(session_id, session)
+
+    def _open_sessions(self) -> List[Dict[str, Any]]:
+        sessions = []
+        for session_id in os.listdir(self.root):
+            session = self._read(session_id)
+            if session is not None:
+                sessions.append(session)
+        return sessions
+
+    def cleanup_expired(self) -> int:
+        """Delete expired sessions and their partial data. Returns the number removed."""
+        removed = 0
+        now = datetime.now()
+        for session_id in os.listdir(self.root):
+            session = self._read(session_id)
+            if session is None or datetime.fromisoformat(session["expires_at"]) < now:
+                self.delete(session_id)
+                removed += 1
+        if removed:
+            logger.info(f"Removed {removed} expired upload sessions")
+        return removed
+
+    def create(self, submission: Dict[str, Any], files: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Open a new session. `files` is the manifest: [{"filename", "size", "category"}, ...].
+        """
+        self.cleanup_expired()
+        requested = sum(f["size"] for f in files)
+        reserved = sum(f["size"] for s in self._open_sessions() for f in s["files"])
+        if reserved + requested > self.max_bytes:
+            raise UploadSessionError(507, "Upload session storage is full. Please try again later.")
+
+        session_id = uuid.uuid4().hex
+        os.makedirs(self._dir(session_id))
+        session = {
+            "session_id": session_id,
+            "submission": submission,
+            "files": files,
+            "created_at": datetime.now().isoformat(),
+        }
+        for index in range(len(files)):
+            open(self._part_path(session_id, index), 'wb').close()
+        self._touch(session_id, session)
+        logger.info(f"Created upload session {session_id} for {len(files)} files ({requested} bytes)")
+        return self.status(session_id)
+
+    def get(self, session_id: str) -> Dict[str, Any]:
+        session = self._read(session_id) if session_id.isalnum() else None
+        if session is None:
+            raise UploadSessionError(404, "Upload session not found")
+        if datetime.fromisoformat(session["expires_at"]) < datetime.now():
+            self.delete(session_id)
+            raise UploadSessionError(404, "Upload session expired")
+        return session
+
+    def offset(self, session_id: str, index: int) -> int:
+        return os.path.getsize(self._part_path(session_id, index))
+
+    def status(self, session_id: str) -> Dict[str, Any]:
+        session = self.get(session_id)
+        files = [
+            {**f, "offset": self.offset(session_id, index)}
+            for index, f in enumerate(session["files"])
+        ]
+        return {
+            "session_id": session_id,
+            "expires_at": session["expires_at"],
+            "files": files,
+            "complete": all(f["offset"] == f["size"] for f in files),
+        }
+
+    async def append(self, session_id: str, index: int, offset: int, chunks: AsyncIterable[bytes]) -> int:
+        """
+        Append request data to a file of the session, starting at `offset`, which must equal
+        the current offset. Data received before a dropped connection is kept. Returns the new offset.
+        """
+        session = self.get(session_id)
+        if index < 0 or index >= len(session["files"]):
+            raise UploadSessionError(404, f"File index {index} not in upload session")
+        size = session["files"][index]["size"]
+
+        lock = self._locks.setdefault(f"{session_id}/{index}", asyncio.Lock())
+        async with lock:
+            current = self.offset(session_id, index)
+            if offset != current:
+                raise UploadSessionError(409, f"Offset mismatch: expected {current}, got {offset}", offset=current)
+
+            written = current
+            with open(self._part_path(session_id, index), 'ab') as f:
+                try:
+                    async for chunk in chunks:
+                        if written + len(chunk) > size:
+                            f.truncate(current)
+                            raise UploadSessionError(413, f"Data exceeds declared file size of {size} bytes", offset=current)
+                        await asyncio.to_thread(f.write, chunk)
+                        written += len(chunk)
+                finally:
+                    f.flush()
+
+            self._touch(session_id, session)
+            return written
+
+    def part_path(self, session_id: str, index: int) -> str:
+        return self._part_path(session_id, index)
+
+    def delete(self, session_id: str):
+        shutil.rmtree(self._dir(session_id), ignore_errors=True)
+        for key in [k for k in self._locks if k.startswith(f"{session_id}/")]:
+            del self._locks[key]
+
+
+upload_session_store = UploadSessionStore(
+    root=settings.upload_session_dir or os.path.join(tempfile.gettempdir(), "datenschutzportal_sessions"),
+    max_bytes=settings.upload_session_max_bytes,
+    ttl=settings.upload_session_ttl,
+)
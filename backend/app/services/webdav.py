@@ -0,0 +1,227 @@
+import httpx
+from app.config import settings
+from typing import Optional, List, Dict, Union, AsyncIterable, AsyncIterator, Callable, Tuple
+from urllib.parse import quote, unquote, urlsplit
+import xml.etree.ElementTree as ET
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+DAV_NS = "{DAV:}"
+
+
+class WebDAVError(Exception):
+    """
+    Raised when the WebDAV server answers with an unexpected status code.
+    """
+    def __init__(self, method: str, path: str, status_code: int, message: str = ""):
+        self.method = method
+        self.path = path
+        self.status_code = status_code
+        super().__init__(f"{method} {path} failed with status {status_code}{': ' + message if message else ''}")
+
+
+class AsyncWebDAVClient:
+    """
+    Minimal asyncio-native WebDAV client on top of a pooled httpx.AsyncClient.
+    All paths are relative to the configured WebDAV root (settings.nextcloud_url).
+    """
+    def __init__(self, http_client: httpx.AsyncClient, base_url: str, username: Optional[str] = None):
+        self.http = http_client
+        self.base_url = base_url.rstrip('/')
+        self.base_path = urlsplit(self.base_url).path.rstrip('/')
+        self.uploads_url, self.files_url = nextcloud_dav_roots(self.base_url, username)
+
+    @property
+    def supports_chunking(self) -> bool:
+        """True if the server is a Nextcloud instance with a known chunked-upload endpoint."""
+        return self.uploads_url is not None
+
+    def url(self, path: str) -> str:
+        """Build the absolute URL for a remote path."""
+        return f"{self.base_url}/{quote(path.strip('/'))}"
+
+    async def request(self, method: str, path: str, expected: tuple = (), **kwargs) -> httpx.Response:
+        """
+        Send a request for a remote path. If `expected` is given, any other status raises WebDAVError.
+        """
+        response = await self.http.request(method, self.url(path), **kwargs)
+        if expected and response.status_code not in expected:
+            raise WebDAVError(method, path, response.status_code, response.reason_phrase)
+        return response
+
+    async def check(self, path: str) -> bool:
+        """Return True if the remote resource exists."""
+        response = await self.request("PROPFIND", path, headers={"Depth": "0"})
+        if response.status_code in (200, 207):
+            return True
+        if response.status_code == 404:
+            return False
+        raise WebDAVError("PROPFIND", path, response.status_code, response.reason_phrase)
+
+    async def mkdir(self, path: str) -> httpx.Response:
+        """Create a collection. 201 means created, 405 means it already exists."""
+        return await self.request("MKCOL", path)
+
+    async def upload(self, path: str, content: Union[bytes, str, AsyncIterable[bytes]],
+                     headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """PUT content (bytes, str or an async byte stream) to a remote path."""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        return await self.request("PUT", path, expected=(200, 201, 204), content=content, headers=headers)
+
+    async def upload_chunked(self, path: str, total_size: int, chunk_size: int,
+                             chunk_stream: Callable[[int], AsyncIterator[bytes]]) -> httpx.Response:
+        """
+        Upload a file with Nextcloud's chunked upload protocol (v2):
+        MKCOL an upload folder, PUT numbered chunks, then MOVE the assembled `.file` into place.
+        `chunk_stream(length)` must yield exactly `length` bytes of the next chunk.
+        Returns the response of the final MOVE, which carries the ETag of the assembled file.
+        """
+        if not self.supports_chunking:
+            raise WebDAVError("MKCOL", path, 501, "chunked upload not supported by this server")
+
+        upload_dir = f"{self.uploads_url}/datenschutzportal-{uuid.uuid4().hex}"
+        destination = f"{self.files_url}/{quote(path.strip('/'))}"
+        headers = {"Destination": destination}
+
+        response = await self.http.request("MKCOL", upload_dir, headers=headers)
+        if response.status_code != 201:
+            raise WebDAVError("MKCOL", upload_dir, response.status_code, response.reason_phrase)
+
+        try:
+            offset = 0
+            index = 1
+            while offset < total_size:
+                length = min(chunk_size, total_size - offset)
+                response = await self.http.request(
+                    "PUT",
+                    f"{upload_dir}/{index:05d}",
+                    content=chunk_stream(length),
+                    headers={**headers, "Content-Length": str(length)},
+                )
+                if response.status_code not in (201, 204):
+                    raise WebDAVError("PUT", f"{upload_dir}/{index:05d}", response.status_code, response.reason_phrase)
+                logger.debug(f"Uploaded chunk {index} ({offset + length}/{total_size} bytes) for {path}")
+                offset += length
+                index += 1
+
+            response = await self.http.request(
+                "MOVE",
+                f"{upload_dir}/.file",
+                headers={**headers, "OC-Total-Length": str(total_size), "Overwrite": "T"},
+            )
+            if response.status_code not in (201, 204):
+                raise WebDAVError("MOVE", path, response.status_code, response.reason_phrase)
+            return response
+        except Exception:
+            try:
+                await self.http.request("DELETE", upload_dir)
+            except Exception as e:
+                logger.warning(f"Failed to clean up chunked upload folder {upload_dir}: {e}")
+            raise
+
+    async def download(self, path: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """GET a remote file. 404 raises FileNotFoundError."""
+        response = await self.request("GET", path, headers=headers)
+        if response.status_code == 404:
+            raise FileNotFoundError(path)
+        if response.status_code not in (200, 304):
+            raise WebDAVError("GET", path, response.status_code, response.reason_phrase)
+        return response
+
+    async def download_to(self, path: str, local_path: str) -> None:
+        """Stream a remote file to a local path without holding it in memory."""
+        async with self.http.stream("GET", self.url(path)) as response:
+            if response.status_code == 404:
+                raise FileNotFoundError(path)
+            if response.status_code != 200:
+                raise WebDAVError("GET", path, response.status_code, response.reason_phrase)
+            with open(local_path, 'wb') as f:
+                async for chunk in response.aiter_bytes():
+                    f.write(chunk)
+
+    async def copy(self, source: str, destination: str, overwrite: bool = True,
+                   if_match: Optional[str] = None) -> httpx.Response:
+        """
+        Server-side COPY of a remote resource. With `if_match`, the copy only happens if the
+        source still has that ETag; otherwise the server answers 412 and WebDAVError is raised.
+        """
+        headers = {"Destination": self.url(destination), "Overwrite": "T" if overwrite else "F"}
+        if if_match:
+            headers["If-Match"] = if_match
+        return await self.request("COPY", source, expected=(201, 204), headers=headers)
+
+    async def delete(self, path: str) -> None:
+        """Delete a remote resource. Missing resources are ignored."""
+        await self.request("DELETE", path, expected=(200, 204, 404))
+
+    async def list(self, path: str) -> List[str]:
+        """
+        List the direct children of a collection (PROPFIND Depth: 1).
+        Collections are returned with a trailing slash, like webdav3's Client.list.
+        """
+        response = await self.request("PROPFIND", path, expected=(207,), headers={"Depth": "1"})
+        own_path = f"{self.base_path}/{path.strip('/')}".rstrip('/')
+        names = []
+        for href in ET.fromstring(response.content).iter(f"{DAV_NS}href"):
+            href_path = unquote(urlsplit(href.text or "").path)
+            is_dir = href_path.endswith('/')
+            href_path = href_path.rstrip('/')
+            if href_path == own_path:
+                continue
+            name = href_path.rsplit('/', 1)[-1]
+            names.append(f"{name}/" if is_dir else name)
+        return names
+
+
+def response_etag(response: httpx.Response) -> Optional[str]:
+    """ETag of the resource written by a PUT, MOVE or COPY, if the server reports it."""
+    return response.headers.get("ETag") or response.headers.get("OC-ETag")
+
+
+def nextcloud_dav_roots(base_url: str, username: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Derive the Nextcloud chunked-upload root and the matching files root from the WebDAV URL.
+    Works for both `/remote.php/webdav` and `/remote.php/dav/files/<user>` style URLs.
+    Returns (None, None) for servers that do not look like Nextcloud.
+    """
+    if not username or "/remote.php/" not in base_url:
+        return None, None
+    origin = base_url.split("/remote.php/", 1)[0]
+    user = quote(username, safe='')
+    return f"{origin}/remote.php/dav/uploads/{user}", f"{origin}/remote.php/dav/files/{user}"
+
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the process-wide pooled HTTP client for Nextcloud, creating it on first use.
+    Keep-alive connections are shared by every NextcloudService instance.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            auth=(settings.nextcloud_username, settings.nextcloud_password),
+            timeout=httpx.Timeout(
+                settings.nextcloud_timeout,
+                connect=settings.nextcloud_connect_timeout,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.nextcloud_max_connections,
+                max_keepalive_connections=settings.nextcloud_max_keepalive_connections,
+                keepalive_expiry=settings.nextcloud_keepalive_expiry,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared Nextcloud HTTP client (called on application shutdown)."""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
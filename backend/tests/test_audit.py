@@ -0,0 +1,163 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from app.config import settings
+from app.services.audit_chunking import chunk_documents, split_sections, estimate_tokens
+from app.services.retrieval import BM25Index, select_passages, split_passages, tokenize
+from app.config.audit_criteria import CheckItem
+from app.services.ai_audit import AIAuditService, AuditResult, CheckResult, PartialAuditResult, merge_partial_results
+from app.services import llm_cache as llm_cache_module
+from app.services.llm_cache import LLMResponseCache, run_cached
+
+@pytest.fixture
+def fresh_llm_cache(tmp_path, monkeypatch):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite3"), max_bytes=10 * 1024 * 1024, ttl=3600)
+    monkeypatch.setattr(llm_cache_module, "llm_cache", cache)
+    return cache
+
+def test_chunk_documents_keeps_all_content_and_cuts_at_sections():
+    sections = [f"# Abschnitt {i}\n" + f"Inhalt {i} " * 150 + "\n" for i in range(6)]
+    text = "".join(sections)
+    assert len(split_sections(text)) == 6
+
+    chunks = chunk_documents([("konzept.docx", text), ("vvt.txt", "kurz")], max_tokens=500)
+    assert len(chunks) > 1
+    assert all(chunk.tokens <= 500 for chunk in chunks)
+    # Every chunk starts with a file header and every section stays whole
+    assert all(chunk.text.lstrip().startswith("--- FILE:") for chunk in chunks)
+    joined = "".join(chunk.text for chunk in chunks)
+    for section in sections:
+        assert section in joined
+    assert "vvt.txt" in chunks[-1].files
+
+    # Sections larger than a chunk are split, nothing is lost
+    chunks = chunk_documents([("gross.txt", "Satz. " * 5000)], max_tokens=1000)
+    assert all(chunk.tokens <= 1000 for chunk in chunks)
+    assert sum(chunk.text.count("Satz.") for chunk in chunks) == 5000
+    assert estimate_tokens("abcd" * 10) == 10
+
+class FakeAgent:
+    def __init__(self, respond):
+        self.respond = respond
+        self.prompts = []
+        self.running = 0
+        self.max_running = 0
+
+    async def run(self, prompt):
+        self.prompts.append(prompt)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return SimpleNamespace(data=self.respond(prompt))
+
+@pytest.mark.asyncio
+async def test_chunked_audit_maps_every_chunk_and_merges(tmp_path, monkeypatch, fresh_llm_cache):
+    monkeypatch.setattr(settings, "audit_chunk_tokens", 300)
+    monkeypatch.setattr(settings, "audit_map_concurrency", 2)
+    monkeypatch.setattr(settings, "audit_retrieval", False)
+    path = tmp_path / "konzept.txt"
+    path.write_text("".join(f"# Teil {i}\n" + "Text " * 200 + "\n" for i in range(8)) + "# Ende\nGrundlage-Marker Art. 6 DSGVO\n")
+
+    def map_respond(prompt):
+        if "Grundlage-Marker" in prompt:
+            return PartialAuditResult(results=[CheckResult(check_id="vvt_legal_basis", status="PASS", findings="Art. 6 genannt", recommendation=None)])
+        if "Ausschnitt (1 von" in prompt:
+            raise RuntimeError("model error")
+        return PartialAuditResult(results=[CheckResult(check_id="vvt_legal_basis", status="UNKNOWN", findings="-", recommendation=None)])
+
+    service = AIAuditService()
+    service.map_agent = FakeAgent(map_respond)
+    service.agent = FakeAgent(lambda prompt: (_ for _ in ()).throw(RuntimeError("reduce down")))
+
+    result = await service.perform_audit("P1", [str(path)])
+    assert len(service.map_agent.prompts) > 2
+    assert service.map_agent.max_running <= 2
+    # The reduce step failed, so the deterministic merge is returned
+    by_id = {r.check_id: r for r in result.results}
+    assert by_id["vvt_legal_basis"].status == "PASS"
+    assert by_id["general_completeness"].status == "UNKNOWN"
+    assert result.overall_status == "NEEDS_IMPROVEMENT"
+    assert "1 von" in result.summary
+
+    service.agent = FakeAgent(lambda prompt: AuditResult(summary="ok", results=[], overall_status="PASS"))
+    map_calls = len(service.map_agent.prompts)
+    result = await service.perform_audit("P1", [str(path)])
+    assert result.summary == "ok"
+    assert "Art. 6 genannt" in service.agent.prompts[0]
+    # Successful partial evaluations were cached, only the failed chunk is asked again
+    assert len(service.map_agent.prompts) == map_calls + 1
+
+def test_merge_passes_item_fulfilled_in_any_chunk():
+    def partial(**statuses):
+        return PartialAuditResult(results=[
+            CheckResult(check_id=check_id, status=status, findings=f"{check_id} {status}", recommendation=None)
+            for check_id, status in statuses.items()
+        ])
+
+    merged = merge_partial_results(
+        [partial(a="PASS", b="FAIL"), partial(a="FAIL", b="WARNING"), partial(a="UNKNOWN", c="UNKNOWN")],
+        ["a", "b", "c"]
+    )
+    by_id = {r.check_id: r for r in merged}
+    # One chunk fulfils it, the chunk that does not mention it does not turn it into FAIL
+    assert by_id["a"].status == "PASS"
+    assert "[FAIL] a FAIL" in by_id["a"].findings
+    assert by_id["b"].status == "FAIL"
+    assert by_id["c"].status == "UNKNOWN"
+
+def test_bm25_selects_relevant_passages_per_check_item():
+    assert tokenize("Verschlüsselungsmaßnahmen") == ["verschlusselungsmassnahm", "verschlussel", "massnahm"]
+    assert "verschlussel" in tokenize("Die Verschlüsselung der Daten")
+
+    filler = "".join(f"# Kapitel {i}\nDie Studie untersucht Blutwerte und Fragebögen der Teilnehmenden. " * 3 + "\n" for i in range(40))
+    protocol = filler + "# Sicherheit\nAlle Daten werden mit AES-256 verschlüsselt gespeichert, die Verschlüsselung der Übertragung erfolgt per TLS.\n" + filler
+    consent = "# Einwilligung\nDie Patienteninformation und Einwilligungserklärung regelt den Widerruf jederzeit.\n" + filler
+    documents = [("protokoll.txt", protocol), ("einwilligung.txt", consent)]
+    items = [
+        CheckItem(id="toms_encryption", category="TOMs", description="Werden Verschlüsselungsmaßnahmen (Storage & Transport) explizit erwähnt?"),
+        CheckItem(id="med_consent", category="Medical Research", description="Liegt eine Patienteninformation und Einwilligungserklärung (Informed Consent) vor? Ist der Widerruf geregelt?"),
+    ]
+
+    index = BM25Index(split_passages(documents, 100))
+    assert "AES-256" in index.search(items[0].description, 1)[0][1].text
+    assert "Widerruf" in index.search(items[1].description, 1)[0][1].text
+
+    excerpts = dict(select_passages(documents, items, top_k=2, passage_tokens=100))
+    assert "AES-256" in excerpts["protokoll.txt"]
+    assert "toms_encryption" in excerpts["protokoll.txt"]
+    assert "Widerruf" in excerpts["einwilligung.txt"]
+    assert sum(len(text) for text in excerpts.values()) < (len(protocol) + len(consent)) / 4
+
+@pytest.mark.asyncio
+async def test_llm_response_cache_reuses_identical_prompts(fresh_llm_cache):
+    agent = FakeAgent(lambda prompt: AuditResult(summary=prompt, results=[], overall_status="PASS"))
+
+    first = await run_cached(agent, "prompt", "system", AuditResult, version="v1")
+    second = await run_cached(agent, "prompt", "system", AuditResult, version="v1")
+    assert isinstance(second, AuditResult) and second == first
+    assert len(agent.prompts) == 1
+
+    # Different criteria version, system prompt or output type, and the bypass flag, reach the model
+    await run_cached(agent, "prompt", "system", AuditResult, version="v2")
+    await run_cached(agent, "prompt", "other system", AuditResult, version="v1")
+    await run_cached(agent, "prompt", "system", AuditResult, version="v1", refresh=True)
+    assert len(agent.prompts) == 4
+
+    text_agent = FakeAgent(lambda prompt: "# Datenschutzkonzept")
+    assert await run_cached(text_agent, "prompt", "system", str) == "# Datenschutzkonzept"
+    assert await run_cached(text_agent, "prompt", "system", str) == "# Datenschutzkonzept"
+    assert len(text_agent.prompts) == 1
+
+    stats = fresh_llm_cache.stats()
+    assert stats["hits"] == 2 and stats["by_kind"]["str"] == {"hits": 1, "misses": 1}
+
+    # Expired entries are misses, oversized totals evict the least recently used rows
+    fresh_llm_cache.ttl = -1
+    assert fresh_llm_cache.get(LLMResponseCache.make_key(settings.ai_model_name, "system", "prompt", "str"), "str") is None
+    fresh_llm_cache.ttl = 3600
+    fresh_llm_cache.max_bytes = 100
+    for i in range(5):
+        fresh_llm_cache.put(f"key{i}", "str", "x" * 40)
+    assert fresh_llm_cache.stats()["bytes"] <= 100
+    assert fresh_llm_cache.get("key4", "str") is not None
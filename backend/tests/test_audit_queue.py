@@ -0,0 +1,102 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from datetime import timedelta
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from app.config import settings
+from app.database import Base
+from app.models.db_models import AuditJobDB
+from app.services import audit_queue
+from app.services.audit_queue import AuditJobQueue, AuditWorkerPool, utcnow
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(audit_queue, "SessionLocal", factory)
+    yield factory
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_audit_job_claim_lease_retry_and_failure(session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "audit_job_max_attempts", 2)
+    monkeypatch.setattr(settings, "audit_job_retry_backoff", 60.0)
+    async with session_factory() as db:
+        queue = AuditJobQueue(db)
+        job = await queue.enqueue("P1", "Projekt", "a@b.de", ["a.pdf"], {"a.pdf": "0" * 64})
+
+        claimed = await queue.claim("w1")
+        assert claimed.id == job.id and claimed.state == "downloading" and claimed.attempts == 1
+        # Leased: nobody else gets it
+        assert await queue.claim("w2") is None
+        assert await queue.set_state(job.id, "w1", "auditing")
+        assert not await queue.set_state(job.id, "w2", "reporting")
+
+        # A failed attempt is retried after the backoff
+        assert not await queue.fail(claimed, "w1", "Nextcloud down")
+        assert await queue.claim("w2") is None
+        retry = await queue.get(job.id)
+        assert retry.state == "queued" and retry.run_after > utcnow() + timedelta(seconds=50)
+
+        retry.run_after = utcnow() - timedelta(seconds=1)
+        await db.commit()
+        claimed = await queue.claim("w2")
+        assert claimed.attempts == 2
+
+        # The holder died: the expired lease makes the job claimable again
+        claimed.lease_expires_at = utcnow() - timedelta(seconds=1)
+        await db.commit()
+        claimed = await queue.claim("w3")
+        assert claimed.lease_owner == "w3" and claimed.attempts == 3
+        assert await queue.fail(claimed, "w3", "still broken")
+        failed = await queue.get(job.id)
+        assert failed.state == "failed" and failed.last_error == "still broken"
+        assert (await queue.counts())["failed"] == 1
+
+@pytest.mark.asyncio
+async def test_audit_worker_pool_bounds_concurrency_and_retries(session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "audit_job_retry_backoff", 0.0)
+    async with session_factory() as db:
+        for i in range(5):
+            await AuditJobQueue(db).enqueue(f"P{i}", "Projekt", "a@b.de", ["a.pdf"])
+
+    running = 0
+    max_running = 0
+    attempts = {}
+    failures = []
+
+    async def handler(job: AuditJobDB, progress):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        try:
+            await progress("auditing")
+            await asyncio.sleep(0.05)
+            attempts[job.project_id] = attempts.get(job.project_id, 0) + 1
+            if job.project_id == "P0" and attempts["P0"] == 1:
+                raise RuntimeError("AI endpoint unavailable")
+            return "PASS"
+        finally:
+            running -= 1
+
+    async def on_failure(job, error):
+        failures.append(job.project_id)
+
+    pool = AuditWorkerPool(workers=2, poll_interval=0.05)
+    pool.start(handler, on_failure)
+    try:
+        for _ in range(100):
+            async with session_factory() as db:
+                if (await AuditJobQueue(db).counts())["done"] == 5:
+                    break
+            await asyncio.sleep(0.05)
+    finally:
+        await pool.stop()
+
+    assert max_running == 2
+    assert attempts["P0"] == 2 and failures == []
+    async with session_factory() as db:
+        jobs = await AuditJobQueue(db).list_jobs(project_id="P0")
+        assert jobs[0].state == "done" and jobs[0].audit_status == "PASS" and jobs[0].attempts == 2
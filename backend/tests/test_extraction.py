@@ -0,0 +1,381 @@
+import pytest
+from typing import Optional
+import docx
+from app.services.extraction import ExtractionEngine, ExtractionCache, get_extractor, register_extractor
+from app.services.extraction.builder import TextBuilder
+
+@register_extractor('.slow')
+def extract_slow(path: str, max_chars: Optional[int] = None) -> str:
+    import time
+    time.sleep(30)
+    return "never"
+
+@pytest.mark.asyncio
+async def test_extraction_engine_parallel_formats(tmp_path):
+    txt_path = tmp_path / "notes.txt"
+    txt_path.write_text("Pseudonymisierung über die Treuhandstelle", encoding="utf-8")
+    docx_path = tmp_path / "antrag.docx"
+    document = docx.Document()
+    document.add_paragraph("Retrospektive Studie mit Daten aus Orbis")
+    document.save(docx_path)
+    unsupported = tmp_path / "image.bmp"
+    unsupported.write_bytes(b"BM")
+
+    engine = ExtractionEngine(max_workers=2, timeout=60, memory_limit_mb=0)
+    try:
+        texts = await engine.extract_many([str(txt_path), str(docx_path), str(unsupported)])
+    finally:
+        engine.shutdown()
+
+    assert texts[0] == "Pseudonymisierung über die Treuhandstelle"
+    assert "Orbis" in texts[1]
+    assert texts[2] == ""
+    assert get_extractor("x.PDF") is not None
+
+@pytest.mark.asyncio
+async def test_extraction_engine_kills_hung_worker(tmp_path):
+    slow_path = tmp_path / "hang.slow"
+    slow_path.write_text("x")
+    txt_path = tmp_path / "ok.txt"
+    txt_path.write_text("ok")
+
+    engine = ExtractionEngine(max_workers=1, timeout=5, memory_limit_mb=0)
+    try:
+        workers = engine.pool._contexts[engine.pool._get_executor()]
+        assert await engine.extract(str(slow_path)) == ""
+        # The hung worker is terminated, not just abandoned
+        for process in workers.processes:
+            process.join(timeout=5)
+            assert not process.is_alive()
+        # A fresh pool is started after the hung worker was terminated
+        assert await engine.extract(str(txt_path)) == "ok"
+    finally:
+        engine.shutdown()
+
+@pytest.mark.asyncio
+async def test_extraction_cache_skips_parsing_repeat_documents(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), max_bytes=1024 * 1024, memory_max_chars=1024, ttl=3600)
+    txt_path = tmp_path / "protokoll.txt"
+    txt_path.write_text("Version 1", encoding="utf-8")
+
+    engine = ExtractionEngine(max_workers=1, timeout=60, memory_limit_mb=0, cache=cache)
+    try:
+        assert await engine.extract(str(txt_path), sha256="a" * 64) == "Version 1"
+        # Same content hash: served from the cache without reading the file
+        txt_path.write_text("Version 2", encoding="utf-8")
+        assert await engine.extract(str(txt_path), sha256="a" * 64) == "Version 1"
+        # Without a known hash the engine hashes the file itself
+        assert await engine.extract(str(txt_path)) == "Version 2"
+        assert await engine.extract(str(txt_path)) == "Version 2"
+    finally:
+        engine.shutdown()
+
+    stats = cache.stats()
+    assert stats["memory_hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["entries"] == 2
+
+    # Disk tier survives a restart; outdated extractor versions are purged
+    reopened = ExtractionCache(str(tmp_path / "cache.sqlite3"), max_bytes=1024 * 1024, memory_max_chars=1024, ttl=3600)
+    assert reopened.get("a" * 64, "extract_plain_text@1") == "Version 1"
+    assert reopened.stats()["disk_hits"] == 1
+    assert reopened.invalidate(sha256="a" * 64) == 1
+    assert reopened.get("a" * 64, "extract_plain_text@1") is None
+    assert reopened.purge_stale(["extract_pdf@1"]) == 1
+    assert reopened.stats()["entries"] == 0
+
+def test_extraction_cache_size_eviction(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), max_bytes=25, memory_max_chars=0, ttl=3600)
+    cache.put("a" * 64, "extract_pdf@1", "x" * 10)
+    cache.put("b" * 64, "extract_pdf@1", "y" * 10)
+    cache.get("a" * 64, "extract_pdf@1")
+    cache.put("c" * 64, "extract_pdf@1", "z" * 10)
+
+    assert cache.get("b" * 64, "extract_pdf@1") is None  # least recently used
+    assert cache.get("a" * 64, "extract_pdf@1") == "x" * 10
+    assert cache.stats()["bytes"] == 20
+
+def test_extraction_cache_expires_entries(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), max_bytes=1024, memory_max_chars=1024, ttl=3600)
+    cache.put("a" * 64, "extract_pdf@1", "alt")
+    cache.put("b" * 64, "extract_pdf@1", "auch alt")
+    assert cache.get("a" * 64, "extract_pdf@1") == "alt"
+
+    # Expired entries are neither served from memory nor from disk, and purged on the next write
+    cache.ttl = -1
+    assert cache.get("a" * 64, "extract_pdf@1") is None
+    cache.put("c" * 64, "extract_pdf@1", "neu")
+    assert cache.stats()["entries"] == 0
+
+@pytest.mark.asyncio
+async def test_extraction_budget_shared_fairly(tmp_path):
+    short = tmp_path / "kurz.txt"
+    short.write_text("a" * 10)
+    long_a = tmp_path / "anhang_a.txt"
+    long_a.write_text("b" * 1000)
+    long_b = tmp_path / "anhang_b.txt"
+    long_b.write_text("c" * 1000)
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), max_bytes=1024 * 1024, memory_max_chars=1024 * 1024, ttl=3600)
+
+    engine = ExtractionEngine(max_workers=2, timeout=60, memory_limit_mb=0, cache=cache)
+    try:
+        texts = await engine.extract_many([str(short), str(long_a), str(long_b)], max_chars=300)
+        # The unused part of the short file's share goes to the two long files
+        assert [len(t) for t in texts] == [10, 145, 145]
+        # Cut results only serve smaller budgets; the full text needs a new parse
+        assert await engine.extract(str(long_a), max_chars=100) == "b" * 100
+        assert await engine.extract(str(long_a)) == "b" * 1000
+    finally:
+        engine.shutdown()
+
+    # Each document is parsed once; the shares come from the lengths of the results
+    calls = []
+
+    async def extract_one(index, budget):
+        calls.append((index, budget))
+        return ["a" * 10, "b" * 1000, "c" * 200][index][:budget]
+
+    texts, complete = await ExtractionEngine._share_budget(3, extract_one, 300)
+    assert sorted(calls) == [(0, 300), (1, 300), (2, 300)]
+    assert [len(t) for t in texts] == [10, 145, 145] and not complete
+    texts, complete = await ExtractionEngine._share_budget(2, extract_one, 300)
+    assert [len(t) for t in texts] == [10, 290] and not complete
+
+def test_text_builder_stops_at_budget():
+    builder = TextBuilder(max_chars=12)
+    assert builder.append("Seite 1\n")
+    assert not builder.append("Seite 2\n")
+    assert not builder.append("Seite 3\n")
+    assert builder.build() == "Seite 1\nSeit"
+    assert TextBuilder().append("x" * 10**6)
+
+ODS_CONTENT = """<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+    xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+    xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0">
+  <office:body><office:spreadsheet>
+    <table:table table:name="VVT">
+      <table:table-row>
+        <table:table-cell><text:p>Verarbeitung</text:p></table:table-cell>
+        <table:table-cell table:number-columns-repeated="2"/>
+        <table:table-cell><text:p>Rechtsgrundlage</text:p></table:table-cell>
+        <table:table-cell table:number-columns-repeated="16380"/>
+      </table:table-row>
+      <table:table-row table:number-rows-repeated="1048570">
+        <table:table-cell table:number-columns-repeated="16384"/>
+      </table:table-row>
+      <table:table-row>
+        <table:table-cell><text:p>Studie</text:p></table:table-cell>
+        <table:table-cell><text:p>Art. 9 DSGVO</text:p></table:table-cell>
+      </table:table-row>
+    </table:table>
+    <table:table table:name="Leer"/>
+  </office:spreadsheet></office:body>
+</office:document-content>
+"""
+
+def test_spreadsheet_extractors_stream_compact_rows(tmp_path, monkeypatch):
+    import datetime
+    import zipfile
+    import openpyxl
+    from app.config import settings
+    from app.services.extraction.spreadsheets import extract_excel, extract_ods
+
+    xlsx_path = tmp_path / "vvt.xlsx"
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "VVT"
+    ws.append(["Nr", "Verarbeitung", None, "Seit"])
+    ws.append([])
+    ws.append([1.0, "Studie", None, datetime.datetime(2024, 1, 31)])
+    for i in range(10):
+        ws.append([i + 2, "Zeile"])
+    wb.save(xlsx_path)
+
+    monkeypatch.setattr(settings, "extraction_sheet_max_rows", 3)
+    text = extract_excel(str(xlsx_path))
+    assert text.splitlines()[1:5] == [
+        "Sheet: VVT",
+        "Nr | Verarbeitung |  | Seit",
+        "1 | Studie |  | 2024-01-31",
+        "2 | Zeile",
+    ]
+    assert text.endswith("[... remaining rows of this sheet skipped]\n")
+
+    ods_path = tmp_path / "vvt.ods"
+    with zipfile.ZipFile(ods_path, "w") as archive:
+        archive.writestr("content.xml", ODS_CONTENT)
+    assert extract_ods(str(ods_path)) == (
+        "\nSheet: VVT\nVerarbeitung |  |  | Rechtsgrundlage\nStudie | Art. 9 DSGVO\n\nSheet: Leer\n"
+    )
+
+@pytest.mark.asyncio
+async def test_zip_members_extracted_in_parallel(tmp_path):
+    import zipfile
+    antrag = docx.Document()
+    antrag.add_paragraph("Ethikvotum liegt vor")
+    antrag.save(tmp_path / "antrag.docx")
+
+    bundle = tmp_path / "bundle.zip"
+    with zipfile.ZipFile(bundle, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.write(tmp_path / "antrag.docx", "unterlagen/antrag.docx")
+        archive.writestr("unterlagen/notiz.txt", "Treuhandstelle")
+        archive.writestr("unterlagen/foto.bmp", b"BM")
+        archive.writestr("__MACOSX/unterlagen/._notiz.txt", b"\x00")
+
+    bomb = tmp_path / "bomb.zip"
+    with zipfile.ZipFile(bomb, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("leer.txt", b"\x00" * 10 * 1024 * 1024)
+
+    engine = ExtractionEngine(max_workers=2, timeout=60, memory_limit_mb=0)
+    try:
+        text = await engine.extract(str(bundle))
+        assert await engine.extract(str(bomb)) == ""
+    finally:
+        engine.shutdown()
+
+    assert "--- ARCHIVE MEMBER: unterlagen/antrag.docx ---\n\nEthikvotum liegt vor" in text
+    assert "--- ARCHIVE MEMBER: unterlagen/notiz.txt ---\n\nTreuhandstelle" in text
+    assert "foto.bmp" not in text
+    assert "__MACOSX" not in text
+
+def test_pdf_pages_without_text_layer_are_collected_for_ocr(tmp_path):
+    import io
+    Image = pytest.importorskip("PIL.Image")
+    from app.services.extraction.ocr import extract_pdf_pages, join_pages
+
+    scan_path = tmp_path / "scan.pdf"
+    Image.new("RGB", (200, 100), "white").save(scan_path)
+
+    pages, scans = extract_pdf_pages(str(scan_path), max_chars=None, max_scans=5)
+    assert pages == [""]
+    assert list(scans) == [0]
+    assert Image.open(io.BytesIO(scans[0])).size == (200, 100)
+
+    pages[0] = "Erkannter Text\n"
+    assert join_pages(pages, max_chars=8) == "Erkannte"
+    assert extract_pdf_pages(str(scan_path), max_chars=None, max_scans=0)[1] == {}
+
+ODT_CONTENT = """<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+    xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+    xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+    xmlns:draw="urn:oasis:names:tc:opendocument:xmlns:drawing:1.0">
+  <office:body><office:text>
+    <text:tracked-changes><text:changed-region><text:deletion><text:p>Gelöscht</text:p></text:deletion></text:changed-region></text:tracked-changes>
+    <text:h text:outline-level="2">Datenfluss</text:h>
+    <text:p>Daten aus <text:span>Orbis</text:span><text:s text:c="2"/>werden pseudonymisiert.<office:annotation><text:p>Kommentar</text:p></office:annotation></text:p>
+    <text:list><text:list-item><text:p>Treuhandstelle</text:p></text:list-item></text:list>
+    <table:table>
+      <table:table-row>
+        <table:table-cell><text:p>Datenart</text:p></table:table-cell>
+        <table:table-cell><text:p>Speicherort</text:p></table:table-cell>
+      </table:table-row>
+      <table:table-row>
+        <table:table-cell><text:p>Befunde</text:p><text:p>Labor</text:p></table:table-cell>
+        <table:table-cell table:number-columns-repeated="3"/>
+      </table:table-row>
+    </table:table>
+  </office:text></office:body>
+</office:document-content>
+"""
+
+ODP_CONTENT = """<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+    xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+    xmlns:draw="urn:oasis:names:tc:opendocument:xmlns:drawing:1.0">
+  <office:body><office:presentation>
+    <draw:page draw:name="Titel"><draw:frame><draw:text-box><text:p>Studienvorstellung</text:p></draw:text-box></draw:frame></draw:page>
+    <draw:page draw:name="Ablauf"><draw:frame><draw:text-box><text:p>Rekrutierung</text:p></draw:text-box></draw:frame></draw:page>
+  </office:presentation></office:body>
+</office:document-content>
+"""
+
+def test_odf_text_and_presentation_streaming(tmp_path):
+    import zipfile
+    from app.services.extraction.opendocument import extract_odf_text
+
+    odt_path = tmp_path / "konzept.odt"
+    with zipfile.ZipFile(odt_path, "w") as archive:
+        archive.writestr("mimetype", "application/vnd.oasis.opendocument.text")
+        archive.writestr("content.xml", ODT_CONTENT)
+    assert extract_odf_text(str(odt_path)) == (
+        "## Datenfluss\n"
+        "Daten aus Orbis  werden pseudonymisiert.\n"
+        "Treuhandstelle\n"
+        "Datenart | Speicherort\n"
+        "Befunde Labor\n"
+    )
+    assert extract_odf_text(str(odt_path), max_chars=10) == "## Datenfl"
+
+    odp_path = tmp_path / "vortrag.odp"
+    with zipfile.ZipFile(odp_path, "w") as archive:
+        archive.writestr("content.xml", ODP_CONTENT)
+    assert extract_odf_text(str(odp_path)) == (
+        "\nSlide 1: Titel\nStudienvorstellung\n\nSlide 2: Ablauf\nRekrutierung\n"
+    )
+
+@pytest.mark.asyncio
+async def test_ingest_upload_validates_and_spools_once(tmp_path, monkeypatch):
+    import io
+    from fastapi import UploadFile
+    from app.config import settings
+    from app.services.extraction import IngestError, ingest_upload
+
+    buffer = io.BytesIO()
+    antrag = docx.Document()
+    antrag.add_paragraph("Prospektive Studie")
+    antrag.save(buffer)
+    docx_bytes = buffer.getvalue()
+
+    document = await ingest_upload(UploadFile(file=io.BytesIO(docx_bytes), filename="antrag.docx"))
+    assert document.content == docx_bytes and document.path is None
+    assert document.size == len(docx_bytes)
+
+    engine = ExtractionEngine(max_workers=1, timeout=60, memory_limit_mb=0)
+    try:
+        assert await engine.extract_documents([document]) == ["Prospektive Studie"]
+    finally:
+        engine.shutdown()
+
+    monkeypatch.setattr(settings, "extraction_spool_max_memory", 1024)
+    spooled = await ingest_upload(UploadFile(file=io.BytesIO(docx_bytes), filename="antrag.docx"))
+    assert spooled.content is None and open(spooled.path, "rb").read() == docx_bytes
+    assert spooled.sha256 == document.sha256
+    spooled.cleanup()
+
+    rejected = [
+        ("bild.pdf", b"\x89PNG\r\n\x1a\n" + b"\x00" * 100, "not a valid .pdf"),
+        ("geheim.docx", b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"\x00" * 100, "encrypted"),
+        ("skript.exe", b"MZ", "not allowed"),
+    ]
+    for filename, content, message in rejected:
+        with pytest.raises(IngestError, match=message):
+            await ingest_upload(UploadFile(file=io.BytesIO(content), filename=filename))
+
+@pytest.mark.asyncio
+async def test_encrypted_and_corrupted_pdfs_are_rejected_by_the_extraction_parse():
+    import io
+    import pypdf
+    from fastapi import UploadFile
+    from app.services.extraction import IngestError, ingest_upload
+
+    writer = pypdf.PdfWriter()
+    writer.add_blank_page(width=72, height=72)
+    writer.encrypt("geheim")
+    buffer = io.BytesIO()
+    writer.write(buffer)
+
+    engine = ExtractionEngine(max_workers=1, timeout=60, memory_limit_mb=0)
+    try:
+        for filename, content, message in [
+            ("geheim.pdf", buffer.getvalue(), "is encrypted"),
+            ("kaputt.pdf", b"%PDF-1.7\n" + b"\x00" * 200, "appears to be corrupted"),
+        ]:
+            document = await ingest_upload(UploadFile(file=io.BytesIO(content), filename=filename))
+            with pytest.raises(IngestError, match=message):
+                await engine.extract_documents([document], max_chars=1000)
+            # Audits keep going with the other files
+            assert await engine.extract(filename, content=content) == ""
+    finally:
+        engine.shutdown()
@@ -0,0 +1,77 @@
+import asyncio
+import time
+import pytest
+from app.config import settings
+from app.services import llm_throttle
+from app.services.llm_throttle import BACKGROUND, INTERACTIVE, LLMScheduler, LLMThrottleTimeout, rate_limit_delay, run_throttled
+
+@pytest.mark.asyncio
+async def test_scheduler_serves_interactive_requests_first():
+    # 60 requests per minute: the bucket starts full with 60, then one per second
+    scheduler = LLMScheduler(requests_per_minute=60, tokens_per_minute=0)
+    scheduler.requests.level = 0.0
+    order = []
+
+    async def request(name, priority):
+        await scheduler.acquire(100, priority, timeout=5)
+        order.append(name)
+
+    background = [asyncio.create_task(request(f"audit-{i}", BACKGROUND)) for i in range(2)]
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(request("concept", INTERACTIVE))
+    await asyncio.gather(interactive, *background)
+
+    assert order == ["concept", "audit-0", "audit-1"]
+    stats = scheduler.stats()
+    assert stats["granted"] == {"interactive": 1, "background": 2}
+    assert stats["waiting"] == {"interactive": 0, "background": 0}
+
+@pytest.mark.asyncio
+async def test_scheduler_token_budget_and_deadline():
+    scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=6000)
+    await scheduler.acquire(6000, timeout=1)
+    # The bucket refills 100 tokens per second: 5000 tokens are not available within 0.2 s
+    started = time.monotonic()
+    with pytest.raises(LLMThrottleTimeout):
+        await scheduler.acquire(5000, INTERACTIVE, timeout=0.2)
+    assert time.monotonic() - started < 1
+    assert scheduler.stats()["timeouts"] == 1
+    # A small request behind the timed-out one still gets through
+    await scheduler.acquire(10, timeout=1)
+
+class RateLimitError(Exception):
+    status_code = 429
+    def __init__(self, retry_after):
+        self.response = type("Response", (), {"status_code": 429, "headers": {"retry-after": retry_after}})()
+
+def test_rate_limit_delay(monkeypatch):
+    monkeypatch.setattr(settings, "llm_rate_limit_backoff", 7.0)
+    assert rate_limit_delay(RateLimitError("3")) == 3.0
+    assert rate_limit_delay(RateLimitError("")) == 7.0
+    assert rate_limit_delay(ValueError("kaputt")) is None
+
+@pytest.mark.asyncio
+async def test_run_throttled_pauses_and_retries_after_429(monkeypatch):
+    scheduler = LLMScheduler(requests_per_minute=600, tokens_per_minute=0)
+    monkeypatch.setattr(llm_throttle, "llm_scheduler", scheduler)
+    monkeypatch.setattr(llm_throttle, "rate_limit_delay", lambda e: 0.2 if isinstance(e, RateLimitError) else None)
+    calls = []
+
+    async def call():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise RateLimitError("0.2")
+        return "ok"
+
+    assert await run_throttled(call, 100, INTERACTIVE) == "ok"
+    assert len(calls) == 2
+    # The retry waited for the pause
+    assert calls[1] - calls[0] >= 0.2
+    assert scheduler.stats()["rate_limited"] == 1
+
+    # Other errors are not retried
+    async def broken():
+        raise ValueError("kaputt")
+
+    with pytest.raises(ValueError):
+        await run_throttled(broken, 100)
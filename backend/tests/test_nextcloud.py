@@ -10,5 +10,276 @@ async def test_nextcloud_service_initialization():
     try:
         service = NextcloudService()
         assert service.client is not None
+        assert service.client is service.client
     except Exception as e:
         pytest.fail(f"Failed to initialize NextcloudService: {e}")
+
+@pytest.mark.asyncio
+async def test_webdav_client_list_and_check():
+    """
+    Test that the async WebDAV client parses PROPFIND responses and maps 404 to False.
+    """
+    import httpx
+    from app.services.webdav import AsyncWebDAVClient
+
+    multistatus = b"""<?xml version="1.0"?>
+    <d:multistatus xmlns:d="DAV:">
+      <d:response><d:href>/remote.php/webdav/Datenschutzportal/</d:href></d:response>
+      <d:response><d:href>/remote.php/webdav/Datenschutzportal/Projekt%20A/</d:href></d:response>
+      <d:response><d:href>/remote.php/webdav/Datenschutzportal/metadata.json</d:href></d:response>
+    </d:multistatus>"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/missing"):
+            return httpx.Response(404)
+        return httpx.Response(207, content=multistatus)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        client = AsyncWebDAVClient(http, "http://nextcloud.test/remote.php/webdav/")
+        assert await client.list("/Datenschutzportal") == ["Projekt A/", "metadata.json"]
+        assert await client.check("/Datenschutzportal")
+        assert not await client.check("/missing")
+
+@pytest.mark.asyncio
+async def test_copy_is_conditional_on_the_stored_etag():
+    """
+    Test that a COPY with a stale ETag is refused (412) and the ETag of the copy is returned.
+    """
+    import httpx
+    from app.services.webdav import AsyncWebDAVClient
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "COPY":
+            if request.headers.get("If-Match") == '"e1"':
+                return httpx.Response(201, headers={"ETag": '"e2"'})
+            return httpx.Response(412)
+        return httpx.Response(500)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        service = NextcloudService()
+        service.client = AsyncWebDAVClient(http, "http://nextcloud.test/remote.php/webdav/")
+        assert await service.copy_file("/P1/same file.pdf", "/P2/same file.pdf", etag='"e1"') == (True, '"e2"')
+        assert await service.copy_file("/P1/same file.pdf", "/P2/same file.pdf", etag='"e0"') == (False, None)
+
+@pytest.mark.asyncio
+async def test_upload_file_uses_chunked_upload_for_large_files(monkeypatch):
+    """
+    Test that files larger than one chunk are sent via MKCOL, numbered chunk PUTs and a final MOVE.
+    """
+    import io
+    import httpx
+    from fastapi import UploadFile
+    from app.config import settings
+    from app.services.webdav import AsyncWebDAVClient
+
+    monkeypatch.setattr(settings, "nextcloud_chunk_size", 10)
+    monkeypatch.setattr(settings, "nextcloud_stream_buffer_size", 4)
+
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        requests.append((request.method, request.url.path, body, request.headers.get("Destination")))
+        return httpx.Response(201, headers={"OC-ETag": '"big"'} if request.method == "MOVE" else {})
+
+    seen = []
+
+    async def on_chunk(data: bytes):
+        seen.append(data)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        service = NextcloudService()
+        service.client = AsyncWebDAVClient(http, "http://nextcloud.test/remote.php/webdav", "user")
+        upload = UploadFile(file=io.BytesIO(b"x" * 25), filename="big.pdf", size=25)
+        assert await service.upload_file(upload, "/Datenschutzportal/P1/big.pdf", on_chunk=on_chunk) == (True, '"big"')
+
+    # Every byte is seen exactly once, in the same pass that sends it
+    assert b"".join(seen) == b"x" * 25
+
+    methods = [r[0] for r in requests]
+    assert methods == ["MKCOL", "PUT", "PUT", "PUT", "MOVE"]
+    assert [len(r[2]) for r in requests[1:4]] == [10, 10, 5]
+    assert requests[1][1].endswith("/00001")
+    assert requests[4][1].endswith("/.file")
+    assert requests[4][3] == "http://nextcloud.test/remote.php/dav/files/user/Datenschutzportal/P1/big.pdf"
+
+@pytest.mark.asyncio
+async def test_create_folder_is_optimistic_and_cached():
+    """
+    Test that create_folder MKCOLs the leaf first, walks up only on 409, and caches the result.
+    """
+    import httpx
+    from app.services.nextcloud import folder_cache
+    from app.services.webdav import AsyncWebDAVClient
+
+    folder_cache.clear()
+    existing = {"/remote.php/webdav/Datenschutzportal"}
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path.rstrip('/')
+        requests.append((request.method, path))
+        if path in existing:
+            return httpx.Response(405)
+        if path.rsplit('/', 1)[0] not in existing:
+            return httpx.Response(409)
+        existing.add(path)
+        return httpx.Response(201)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        service = NextcloudService()
+        service.client = AsyncWebDAVClient(http, "http://nextcloud.test/remote.php/webdav")
+        assert await service.create_folder("/Datenschutzportal/P1/sub")
+        assert await service.create_folder("/Datenschutzportal/P1")
+        assert await service.create_folder("/Datenschutzportal/P1/sub")
+
+    assert requests == [
+        ("MKCOL", "/remote.php/webdav/Datenschutzportal/P1/sub"),
+        ("MKCOL", "/remote.php/webdav/Datenschutzportal/P1"),
+        ("MKCOL", "/remote.php/webdav/Datenschutzportal/P1/sub"),
+    ]
+    folder_cache.clear()
+
+@pytest.mark.asyncio
+async def test_create_folder_recovers_from_deleted_cached_parent():
+    """
+    Test that a folder deleted on the server after being cached is recreated,
+    both when MKCOL of a child answers 409 and when a PUT into it answers 409.
+    """
+    import io
+    import httpx
+    from fastapi import UploadFile
+    from app.services.nextcloud import folder_cache
+    from app.services.webdav import AsyncWebDAVClient
+
+    folder_cache.clear()
+    existing = {"/remote.php/webdav/Datenschutzportal"}
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path.rstrip('/')
+        requests.append((request.method, path))
+        if path.rsplit('/', 1)[0] not in existing:
+            return httpx.Response(409)
+        if request.method == "PUT":
+            return httpx.Response(201)
+        if path in existing:
+            return httpx.Response(405)
+        existing.add(path)
+        return httpx.Response(201)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        service = NextcloudService()
+        service.client = AsyncWebDAVClient(http, "http://nextcloud.test/remote.php/webdav")
+        assert await service.create_folder("/Datenschutzportal/P1")
+
+        # P1 is deleted on the server while still cached
+        existing.discard("/remote.php/webdav/Datenschutzportal/P1")
+        assert await service.create_folder("/Datenschutzportal/P1/sub")
+        assert "/remote.php/webdav/Datenschutzportal/P1" in existing
+
+        existing.discard("/remote.php/webdav/Datenschutzportal/P1")
+        existing.discard("/remote.php/webdav/Datenschutzportal/P1/sub")
+        upload = UploadFile(file=io.BytesIO(b"data"), filename="a.pdf", size=4)
+        assert await service.upload_file(upload, "/Datenschutzportal/P1/sub/a.pdf") == (False, None)
+        assert not folder_cache.contains("/Datenschutzportal/P1/sub")
+        assert folder_cache.contains("/Datenschutzportal")
+        assert await service.create_folder("/Datenschutzportal/P1/sub")
+
+    assert requests[1:4] == [
+        ("MKCOL", "/remote.php/webdav/Datenschutzportal/P1/sub"),
+        ("MKCOL", "/remote.php/webdav/Datenschutzportal/P1"),
+        ("MKCOL", "/remote.php/webdav/Datenschutzportal/P1/sub"),
+    ]
+    assert "/remote.php/webdav/Datenschutzportal/P1/sub" in existing
+    folder_cache.clear()
+
+def test_circuit_breaker_opens_after_repeated_failures():
+    from app.services.nextcloud_monitor import CircuitBreaker
+
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    # After the reset timeout a single trial call is allowed, concurrent calls still fail fast
+    breaker.opened_at -= 61
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    # A failed trial re-opens the breaker
+    breaker.record_failure()
+    assert breaker.state == "open"
+    breaker.opened_at -= 61
+    assert breaker.allow()
+    assert not breaker.allow()
+    # A trial that never reports back frees its slot after another reset timeout
+    breaker.trial_started_at -= 61
+    assert breaker.allow()
+    # A success closes the breaker again
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+@pytest.mark.asyncio
+async def test_get_metadata_revalidates_with_etag():
+    """
+    Test that repeated get_metadata calls send If-None-Match and treat 304 as a cache hit.
+    """
+    import httpx
+    from app.services.nextcloud import metadata_cache
+    from app.services.webdav import AsyncWebDAVClient
+
+    metadata_cache.clear()
+    seen_headers = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen_headers.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, json={"project_id": "P1"}, headers={"ETag": '"v1"'})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        service = NextcloudService()
+        service.client = AsyncWebDAVClient(http, "http://nextcloud.test/remote.php/webdav")
+        assert await service.get_metadata("P1") == {"project_id": "P1"}
+        assert await service.get_metadata("P1") == {"project_id": "P1"}
+
+    assert seen_headers == [None, '"v1"']
+    assert metadata_cache.hits == 1
+    metadata_cache.clear()
+
+@pytest.mark.asyncio
+async def test_long_lived_service_uses_new_http_client_after_shutdown():
+    from app.services.webdav import close_http_client
+
+    service = NextcloudService()
+    old = service.client.http
+    await close_http_client()
+    assert old.is_closed
+    assert not service.client.http.is_closed
+
+
+@pytest.mark.asyncio
+async def test_health_hides_details_behind_token():
+    """
+    Test that /health only exposes status and latency, and the detailed snapshot requires the API token.
+    """
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.config import settings
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/api/health")
+        assert response.status_code == 200
+        assert set(response.json()) == {"status", "nextcloud_latency_ms"}
+
+        response = await client.get("/api/health/details")
+        assert response.status_code in [401, 403]
+
+        headers = {"Authorization": f"Bearer {settings.api_token}"}
+        response = await client.get("/api/health/details", headers=headers)
+        assert response.status_code == 200
+        assert "last_error" in response.json()["nextcloud"]
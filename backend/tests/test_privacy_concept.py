@@ -0,0 +1,131 @@
+import os
+import pytest
+from contextlib import asynccontextmanager
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.routes.privacy_concept import get_service
+from app.services.privacy_concept import PrivacyConceptService
+from app.services import llm_cache as llm_cache_module
+from app.services.llm_cache import LLMResponseCache
+
+STUDY_DATA = {
+    "study_title": "Teststudie",
+    "study_type": "retrospektiv",
+    "principal_investigator": "Dr. Test",
+    "institution": "Universitätsmedizin Frankfurt",
+    "study_goal": "Test",
+    "data_types": ["Diagnosen"],
+    "patient_count": "100",
+    "data_sources": ["Orbis"],
+    "processing_methods": "Statistik",
+    "pseudonymization_usage": True,
+    "external_data_sharing": False,
+}
+
+class FakeStreamAgent:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = 0
+        self.closed = False
+
+    @asynccontextmanager
+    async def run_stream(self, prompt):
+        self.calls += 1
+        agent = self
+
+        class Result:
+            async def stream_text(self, delta=False):
+                for chunk in agent.chunks:
+                    yield chunk
+
+        try:
+            yield Result()
+        finally:
+            self.closed = True
+
+@pytest.mark.asyncio
+async def test_generate_stream_sends_deltas_and_final_document(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache_module, "llm_cache", LLMResponseCache(str(tmp_path / "llm.sqlite3"), 1024 * 1024, 3600))
+    service = PrivacyConceptService()
+    service.generation_agent = FakeStreamAgent(["# Datenschutzkonzept\n", "## 1. Darstellung", " des Vorhabens\n"])
+    app.dependency_overrides[get_service] = lambda: service
+    try:
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/api/privacy-concept/generate/stream", json={"data": STUDY_DATA})
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            events = [block for block in response.text.split("\n\n") if block.startswith("event:")]
+            assert [e.split("\n")[0] for e in events] == ["event: delta"] * 3 + ["event: done"]
+            assert '"concept_markdown": "# Datenschutzkonzept\\n## 1. Darstellung des Vorhabens\\n"' in events[-1]
+
+            # The complete concept was cached, a repeated request does not reach the model
+            response = await client.post("/api/privacy-concept/generate/stream", json={"data": STUDY_DATA})
+            assert "event: done" in response.text
+            assert service.generation_agent.calls == 1
+    finally:
+        app.dependency_overrides.pop(get_service, None)
+
+@pytest.mark.asyncio
+async def test_stream_concept_closes_model_stream_when_abandoned(monkeypatch):
+    monkeypatch.setattr(llm_cache_module, "llm_cache", None)
+    service = PrivacyConceptService()
+    service.generation_agent = FakeStreamAgent(["a", "b", "c"])
+    from app.models.privacy_concept import ExtractedStudyData
+
+    stream = service.stream_concept(ExtractedStudyData(**STUDY_DATA))
+    assert await stream.__anext__() == "a"
+    await stream.aclose()
+    assert service.generation_agent.closed
+
+@pytest.mark.asyncio
+async def test_services_share_prebuilt_agents_and_http_client(monkeypatch):
+    from app.services.agents import agent_registry
+    from app.services.ai_audit import AIAuditService
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+    first, second = PrivacyConceptService(), PrivacyConceptService()
+    assert first.extraction_agent is second.extraction_agent
+    assert first.generation_agent is not first.extraction_agent
+    assert AIAuditService().agent.model is first.extraction_agent.model
+    client = agent_registry.http_client()
+    assert client is agent_registry.http_client()
+    # Configured from settings, the environment is left alone
+    assert "OPENAI_API_KEY" not in os.environ
+
+    audit = AIAuditService()
+    audit_agent = audit.agent
+    await agent_registry.close()
+    assert client.is_closed
+    assert PrivacyConceptService().extraction_agent is not first.extraction_agent
+    # A long-lived service (e.g. the module-level one in routes/upload.py) gets the rebuilt agent
+    assert audit.agent is not audit_agent
+    assert agent_registry.http_client() is not client
+
+@pytest.mark.asyncio
+async def test_extract_rejects_encrypted_and_corrupted_pdfs():
+    import io
+    import pypdf
+
+    writer = pypdf.PdfWriter()
+    writer.add_blank_page(width=72, height=72)
+    writer.encrypt("geheim")
+    encrypted = io.BytesIO()
+    writer.write(encrypted)
+
+    app.dependency_overrides[get_service] = lambda: PrivacyConceptService()
+    try:
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            for filename, content, message in [
+                ("geheim.pdf", encrypted.getvalue(), "is encrypted"),
+                ("kaputt.pdf", b"%PDF-1.7\n" + b"\x00" * 200, "appears to be corrupted"),
+            ]:
+                response = await client.post(
+                    "/api/privacy-concept/extract",
+                    files={"files": (filename, content, "application/pdf")}
+                )
+                assert response.status_code == 400
+                assert message in response.json()["detail"]
+    finally:
+        app.dependency_overrides.pop(get_service, None)
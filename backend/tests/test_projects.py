@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from app.database import Base
+from app.services.project_index import ProjectIndexService
+
+def make_metadata(project_id: str, timestamp: str, institution: str = "university"):
+    return {
+        "project_id": project_id,
+        "email": "test@uni-frankfurt.de",
+        "uploader_name": None,
+        "project_title": project_id.replace("_", " "),
+        "project_details": None,
+        "institution": institution,
+        "is_prospective_study": False,
+        "upload_timestamp": timestamp,
+        "files": [{"filename": "a.pdf", "category": "sonstiges", "path": f"/Datenschutzportal/{project_id}/a.pdf"}],
+        "project_type": "new"
+    }
+
+@pytest.mark.asyncio
+async def test_project_index_keyset_pagination_and_filters():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with session_factory() as db:
+        service = ProjectIndexService(db)
+        await service.record_upload(make_metadata("A_2024-01-01", "2024-01-01T10:00:00"))
+        await service.record_upload(make_metadata("B_2024-01-02", "2024-01-02T10:00:00", institution="clinic"))
+        await service.record_upload(make_metadata("C_2024-01-03", "2024-01-03T10:00:00"))
+        await service.update_audit_status("A_2024-01-01", "PASS")
+
+        page, cursor = await service.list_projects(limit=2)
+        assert [p.id for p in page] == ["C_2024-01-03", "B_2024-01-02"]
+        assert cursor is not None
+
+        page, cursor = await service.list_projects(limit=2, cursor=cursor)
+        assert [p.id for p in page] == ["A_2024-01-01"]
+        assert cursor is None
+
+        page, _ = await service.list_projects(institution="university")
+        assert [p.id for p in page] == ["C_2024-01-03", "A_2024-01-01"]
+
+        page, _ = await service.list_projects(audit_status="PASS")
+        assert [p.id for p in page] == ["A_2024-01-01"]
+
+    await engine.dispose()
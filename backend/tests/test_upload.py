@@ -1,20 +1,43 @@
 import pytest
+import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from app.main import app
+from app.database import Base, get_db
+from app.services import audit_queue
 from unittest.mock import MagicMock, patch, AsyncMock
 from app.config import settings
 import json
 
+@pytest_asyncio.fixture
+async def test_db(tmp_path_factory, monkeypatch):
+    """Route all database access of the app to a throwaway SQLite file."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path_factory.mktemp('db') / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_db():
+        async with factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    monkeypatch.setattr("app.routes.upload.SessionLocal", factory)
+    monkeypatch.setattr(audit_queue, "SessionLocal", factory)
+    yield factory
+    app.dependency_overrides.pop(get_db, None)
+    await engine.dispose()
+
 @pytest.mark.asyncio
-async def test_upload_documents():
+async def test_upload_documents(test_db):
     # Mock NextcloudService and EmailService
     with patch("app.routes.upload.nextcloud") as mock_nextcloud, \
          patch("app.routes.upload.email_service") as mock_email:
         
         # Setup mocks to be awaitable
-        mock_nextcloud.test_connection = MagicMock(return_value=(True, "Connection successful"))
-        mock_nextcloud.create_folder = MagicMock(return_value=True) # create_folder is sync in my impl
-        mock_nextcloud.upload_file = AsyncMock(return_value=True)
+        mock_nextcloud.test_connection = AsyncMock(return_value=(True, "Connection successful"))
+        mock_nextcloud.create_folder = AsyncMock(return_value=True)
+        mock_nextcloud.upload_file = AsyncMock(return_value=(True, '"e1"'))
         mock_nextcloud.upload_metadata = AsyncMock(return_value=True)
         mock_nextcloud.upload_content = AsyncMock(return_value=True)
         mock_nextcloud.get_metadata = AsyncMock(return_value={})
@@ -68,3 +91,207 @@ async def test_upload_documents():
             # Verify mock calls
             assert mock_nextcloud.create_folder.call_count >= 1
             assert mock_nextcloud.upload_file.call_count == 2
+
+@pytest.mark.asyncio
+async def test_upload_files_concurrently_cleans_up_on_failure():
+    from fastapi import HTTPException
+    from app.routes.upload import upload_files_concurrently
+
+    files = [MagicMock(filename=f"doc{i}.pdf") for i in range(3)]
+
+    async def fake_upload(file, path, on_chunk=None):
+        return file.filename != "doc2.pdf", None
+
+    with patch("app.routes.upload.nextcloud") as mock_nextcloud:
+        mock_nextcloud.upload_file = AsyncMock(side_effect=fake_upload)
+        mock_nextcloud.delete_file = AsyncMock(return_value=True)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await upload_files_concurrently(files, "/Datenschutzportal/P1", {})
+
+        assert exc_info.value.status_code == 500
+        assert "doc2.pdf" in exc_info.value.detail
+        deleted = {call.args[0] for call in mock_nextcloud.delete_file.call_args_list}
+        assert deleted == {f"/Datenschutzportal/P1/doc{i}.pdf" for i in range(3)}
+
+def test_staging_area_is_content_addressed_and_size_bounded(tmp_path):
+    import io
+    import hashlib
+    from app.services.staging import StagingArea
+
+    staging = StagingArea(root=str(tmp_path), max_bytes=10, ttl=3600)
+    first = staging.stage(io.BytesIO(b"123456"))
+    assert first == hashlib.sha256(b"123456").hexdigest()
+
+    target = tmp_path / "audit_copy.pdf"
+    assert staging.link(first, str(target))
+    assert target.read_bytes() == b"123456"
+
+    # Staging a second file exceeds max_bytes and evicts the least recently used one
+    second = staging.stage(io.BytesIO(b"abcdef"))
+    assert staging.get(first) is None
+    assert staging.get(second) is not None
+
+def test_validate_upload_file_rejects_only_path_components():
+    from fastapi import HTTPException
+    from app.routes.upload import validate_upload_file
+
+    for filename in ("Protokoll_v1..2.pdf", "..Entwurf.pdf", "concept.pdf"):
+        validate_upload_file(filename, 10)
+    for filename in ("", ".", "..", "../concept.pdf", "sub/concept.pdf", "sub\\concept.pdf", "/concept.pdf"):
+        with pytest.raises(HTTPException):
+            validate_upload_file(filename, 10)
+
+async def _chunks(data: bytes):
+    yield data
+
+@pytest.mark.asyncio
+async def test_resumable_upload_session(tmp_path, test_db):
+    from app.services.upload_sessions import UploadSessionStore
+
+    store = UploadSessionStore(root=str(tmp_path), max_bytes=1000, ttl=3600)
+
+    with patch("app.routes.upload_sessions.upload_session_store", store), \
+         patch("app.routes.upload.nextcloud") as mock_nextcloud, \
+         patch("app.routes.upload.email_service") as mock_email, \
+         patch("app.routes.upload.nextcloud_monitor") as mock_monitor:
+
+        mock_monitor.is_available = MagicMock(return_value=True)
+        mock_nextcloud.create_folder = AsyncMock(return_value=True)
+        mock_nextcloud.upload_file = AsyncMock(return_value=(True, '"e1"'))
+        mock_nextcloud.upload_metadata = AsyncMock(return_value=True)
+        mock_nextcloud.upload_content = AsyncMock(return_value=True)
+        mock_email.send_confirmation_email = AsyncMock(return_value=True)
+        mock_email.send_team_notification = AsyncMock(return_value=True)
+
+        headers = {"Authorization": f"Bearer {settings.api_token}"}
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/api/upload/sessions", headers=headers, json={
+                "email": "test@uni-frankfurt.de",
+                "project_title": "Resumable Project",
+                "institution": "clinic",
+                "files": [{"filename": "concept.pdf", "size": 10, "category": "datenschutzkonzept"}]
+            })
+            assert response.status_code == 201
+            session_id = response.json()["session_id"]
+
+            # Manifest names end up in Nextcloud and local paths
+            for filename in ("../concept.pdf", "sub/concept.pdf", "sub\\concept.pdf"):
+                response = await client.post("/api/upload/sessions", headers=headers, json={
+                    "email": "test@uni-frankfurt.de",
+                    "project_title": "Resumable Project",
+                    "institution": "clinic",
+                    "files": [{"filename": filename, "size": 10}]
+                })
+                assert response.status_code == 400
+
+            url = f"/api/upload/sessions/{session_id}/files/0"
+            response = await client.patch(url, content=b"01234", headers={**headers, "Upload-Offset": "0"})
+            assert response.json()["offset"] == 5
+
+            # Finalizing an incomplete session is rejected
+            response = await client.post(f"/api/upload/sessions/{session_id}/finalize", headers=headers)
+            assert response.status_code == 409
+
+            # A chunk with a stale offset is rejected with the current offset
+            response = await client.patch(url, content=b"56789", headers={**headers, "Upload-Offset": "0"})
+            assert response.status_code == 409
+            assert response.headers["Upload-Offset"] == "5"
+
+            response = await client.patch(url, content=b"56789", headers={**headers, "Upload-Offset": "5"})
+            assert response.json()["offset"] == 10
+
+            response = await client.post(f"/api/upload/sessions/{session_id}/finalize", headers=headers)
+            assert response.status_code == 200
+            assert response.json()["files_uploaded"] == 1
+
+            uploaded = mock_nextcloud.upload_file.call_args.args[0]
+            assert uploaded.filename == "concept.pdf"
+            response = await client.get(f"/api/upload/sessions/{session_id}", headers=headers)
+            assert response.status_code == 404
+
+    # Expired sessions are removed together with their locks
+    expired = store.create({}, [{"filename": "a.pdf", "size": 3, "category": "sonstiges"}])["session_id"]
+    await store.append(expired, 0, 0, _chunks(b"abc"))
+    assert f"{expired}/0" in store._locks
+    session = store._read(expired)
+    session["expires_at"] = "2000-01-01T00:00:00"
+    store._write(expired, session)
+    assert store.cleanup_expired() == 1
+    assert not store._locks
+
+@pytest.mark.asyncio
+async def test_upload_files_concurrently_hashes_while_streaming(tmp_path):
+    import io
+    import hashlib
+    from fastapi import UploadFile
+    from app.routes.upload import upload_files_concurrently
+    from app.services.staging import StagingArea
+
+    staging = StagingArea(root=str(tmp_path), max_bytes=1000, ttl=3600)
+    files = [UploadFile(file=io.BytesIO(b"content"), filename="new.pdf", size=7)]
+
+    async def fake_upload(file, path, on_chunk=None):
+        # The file is read once, for the PUT; hashing and staging see the same chunks
+        await file.seek(0)
+        await on_chunk(await file.read())
+        return True, '"e1"'
+
+    with patch("app.routes.upload.nextcloud") as mock_nextcloud, \
+         patch("app.routes.upload.staging_area", staging):
+        mock_nextcloud.upload_file = AsyncMock(side_effect=fake_upload)
+        uploaded = await upload_files_concurrently(files, "/Datenschutzportal/P1", {})
+
+    digest = hashlib.sha256(b"content").hexdigest()
+    assert uploaded[0]["sha256"] == digest
+    assert uploaded[0]["etag"] == '"e1"'
+    assert staging.get(digest) is not None
+
+@pytest.mark.asyncio
+async def test_upload_files_concurrently_copies_known_documents(tmp_path):
+    import io
+    import hashlib
+    from fastapi import UploadFile
+    from app.routes.upload import upload_files_concurrently
+    from app.models.db_models import DocumentDB
+    from app.services.staging import StagingArea
+
+    def make_files():
+        return [
+            UploadFile(file=io.BytesIO(b"same"), filename="same.pdf", size=4),
+            UploadFile(file=io.BytesIO(b"new!"), filename="new.pdf", size=4),
+        ]
+
+    same = hashlib.sha256(b"same").hexdigest()
+    stored = DocumentDB(sha256=same, remote_path="/Datenschutzportal/P1/same.pdf", size=4, etag='"e1"')
+
+    async def find_document(sha256):
+        return stored if sha256 == same else None
+
+    with patch("app.routes.upload.nextcloud") as mock_nextcloud, \
+         patch("app.routes.upload.staging_area", StagingArea(root=str(tmp_path), max_bytes=1000, ttl=3600)):
+        mock_nextcloud.upload_file = AsyncMock(return_value=(True, '"n1"'))
+        mock_nextcloud.copy_file = AsyncMock(return_value=(True, '"c1"'))
+
+        uploaded = await upload_files_concurrently(
+            make_files(), "/Datenschutzportal/RE_P1", {}, find_document=find_document
+        )
+
+        mock_nextcloud.copy_file.assert_awaited_once_with(
+            "/Datenschutzportal/P1/same.pdf", "/Datenschutzportal/RE_P1/same.pdf", etag='"e1"'
+        )
+        assert mock_nextcloud.upload_file.call_args.args[0].filename == "new.pdf"
+        assert [f["deduplicated_from"] for f in uploaded] == ["/Datenschutzportal/P1/same.pdf", None]
+        assert [f["etag"] for f in uploaded] == ['"c1"', '"n1"']
+        assert uploaded[1]["sha256"] == hashlib.sha256(b"new!").hexdigest()
+
+        # The stored copy was changed since (the conditional COPY fails): the file is uploaded
+        mock_nextcloud.copy_file = AsyncMock(return_value=(False, None))
+        mock_nextcloud.upload_file.reset_mock()
+        uploaded = await upload_files_concurrently(
+            make_files()[:1], "/Datenschutzportal/RE_P2", {}, find_document=find_document
+        )
+        assert mock_nextcloud.upload_file.await_count == 1
+        assert uploaded[0]["deduplicated_from"] is None
+        assert uploaded[0]["sha256"] == same
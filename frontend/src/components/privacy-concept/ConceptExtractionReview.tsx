@@ -1,6 +1,6 @@
-import React, { useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { ExtractedStudyData } from '../../types/privacy-concept';
-import { generateConcept } from '../../services/privacyConceptApi';
+import { generateConceptStream } from '../../services/privacyConceptApi';
 import { Loader2, ArrowRight } from 'lucide-react';
 import { toast } from 'sonner';
 
@@ -13,6 +13,11 @@ interface ConceptExtractionReviewProps {
 
 export function ConceptExtractionReview({ data, onUpdate, onGenerate, onBack }: ConceptExtractionReviewProps) {
     const [isLoading, setIsLoading] = useState(false);
+    const [preview, setPreview] = useState('');
+    const abortRef = useRef<AbortController | null>(null);
+
+    // Cancel a running generation when the user leaves this step
+    useEffect(() => () => abortRef.current?.abort(), []);
     
     // Helper for input fields
     const handleChange = (key: keyof ExtractedStudyData, value: any) => {
@@ -21,12 +26,22 @@ export function ConceptExtractionReview({ data, onUpdate, onGenerate, onBack }:
 
     const handleGenerate = async () => {
         setIsLoading(true);
+        setPreview('');
+        const controller = new AbortController();
+        abortRef.current = controller;
         try {
-            const result = await generateConcept(data);
+            const result = await generateConceptStream(
+                data,
+                (text) => setPreview((current) => current + text),
+                controller.signal,
+            );
             onGenerate(result.concept_markdown);
         } catch (error) {
-            toast.error("Fehler bei der Generierung: " + (error as Error).message);
+            if (!controller.signal.aborted) {
+                toast.error("Fehler bei der Generierung: " + (error as Error).message);
+            }
         } finally {
+            abortRef.current = null;
             setIsLoading(false);
         }
     };
@@ -50,6 +65,12 @@ export function ConceptExtractionReview({ data, onUpdate, onGenerate, onBack }:
             
             <p className="text-gray-500">Bitte überprüfen Sie die automatisch extrahierten Daten. Sie können Felder direkt bearbeiten.</p>
 
+            {isLoading && preview && (
+                <pre className="max-h-64 overflow-y-auto whitespace-pre-wrap rounded-lg border border-gray-200 bg-gray-50 p-4 text-sm text-gray-700">
+                    {preview}
+                </pre>
+            )}
+
             <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
                 {/* Dynamically render cards for main fields */}
                 <Card title="Studientitel" value={data.study_title} onChange={(v) => handleChange('study_title', v)} multiline />
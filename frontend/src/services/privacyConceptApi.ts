@@ -33,6 +33,50 @@ export async function generateConcept(data: ExtractedStudyData): Promise<{ conce
   return response.json();
 }
 
+/**
+ * Streams the concept via Server-Sent Events; onDelta receives the markdown as it is written.
+ * Resolves with the complete document. Aborting the signal cancels the generation on the server.
+ */
+export async function generateConceptStream(
+  data: ExtractedStudyData,
+  onDelta: (text: string) => void,
+  signal?: AbortSignal,
+): Promise<{ concept_markdown: string }> {
+  const response = await fetch(`${API_BASE}/generate/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+    body: JSON.stringify({ data }),
+    signal,
+  });
+
+  if (!response.ok || !response.body) {
+       const errorText = await response.text();
+       throw new Error(`Generation failed: ${errorText}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      const event = block.match(/^event: (.*)$/m)?.[1];
+      const payload = block.match(/^data: (.*)$/m)?.[1];
+      if (!event || !payload) continue;
+      const parsed = JSON.parse(payload);
+      if (event === 'delta') onDelta(parsed.text);
+      else if (event === 'done') return parsed;
+      else if (event === 'error') throw new Error(`Generation failed: ${parsed.detail}`);
+    }
+  }
+  throw new Error('Generation failed: stream ended unexpectedly');
+}
+
 export async function saveConcept(data: ExtractedStudyData, markdown: string): Promise<SaveConceptResponse> {
     const response = await fetch(`${API_BASE}/save`, {
         method: 'POST',